@@ -8,9 +8,23 @@ El modulo tambien proporciona herramientas para la poda de arboles de decision s
 estructura del arbol para mejorar la generalizacion del modelo.
 """
 
-from typing import Optional
+from typing import Callable, Optional, Sequence
+import heapq
+import itertools
+import random
+import time
+import tracemalloc
+from array import array
+from collections import deque
 from clasificacion import clasificar
+from conjuntos import Dataset, arregloIndices, esFaltante, esNumerico
+from arbol_decision import NodoBinario
+import muestreo
+import poda
 from math import log2
+import entropia_ganancia
+import instrumentacion
+from entropia_ganancia import ENTROPIA, TOLERANCIA, Criterio, entropiaConteos, informacionDivision
 
 def dividirConjunto(filas: list[list[any]], columna: int, valor: any) -> tuple[list[list[any]],list[list[any]]]: 
     """
@@ -61,10 +75,26 @@ def ganancia_informacion(atributo: int, datos_entrenamiento: list[list[any]]) ->
 
     return entropia_total - entropia_atributo
 
-class ArbolDecision:
+# Tuplas de clases de las hojas, compartidas entre todas las hojas que tienen las mismas clases en el mismo orden.
+# Se acota para que las claves que no se repiten (las medias de las hojas de regresión) no crezcan sin límite.
+_CLASES_HOJAS: dict[tuple, tuple] = {}
+MAX_CLASES_HOJAS = 4096
+
+class ArbolDecision(NodoBinario):
+    __slots__ = ('col', 'valor', 'clases', 'conteos', '__weakref__')
+
+    # Las ramas son los hijos del núcleo binario con el nombre de siempre: los mismos descriptores de slot, así que
+    # leerlas cuesta lo mismo que leer un atributo propio
+    ramaVerdadera = NodoBinario.izquierdo
+    ramaFalsa = NodoBinario.derecho
+
     def __init__(self, col = -1, valor = None, ramaVerdadera = None, ramaFalsa = None, resultados = None):
         """
-        Clase que representa un árbol de decisión.
+        Clase que representa un árbol de decisión, sobre el nodo binario de arbol_decision (NodoBinario): se puede
+        recorrer como ArbolBinario.de(arbol) y copiar con cambios compartiendo los subárboles que no cambian
+        (conHijos, reemplazar, mapear; ver poda). Usa __slots__ (sin __dict__ por nodo); __weakref__ queda para
+        los caches por árbol de clasificacion. Una hoja guarda sus conteos como dos tuplas en orden fijo, 'clases'
+        (compartida entre hojas) y 'conteos', en lugar de un diccionario por hoja.
         """
         self.col = col
         self.valor = valor
@@ -72,61 +102,650 @@ class ArbolDecision:
         self.ramaFalsa = ramaFalsa
         self.resultados = resultados  # None para nodos, no None para hojas
 
-def crearArbolDecisionDesde(filas: list[list[any]], max_profundidad = Optional[int], min_ganancia = Optional[float], min_muestras_nodo = 1) -> "ArbolDecision":
+    @property
+    def resultados(self) -> Optional[dict]:
+        """
+        {clase: conteo} de una hoja (en el orden en que se guardó), o None en los nodos internos.
+        """
+        if self.conteos is None:
+            return None
+        return dict(zip(self.clases, self.conteos))
+
+    @resultados.setter
+    def resultados(self, resultados: Optional[dict]) -> None:
+        if resultados is None:
+            self.clases = self.conteos = None
+            return
+        clases = tuple(resultados)
+        compartida = _CLASES_HOJAS.get(clases)
+        if compartida is None:
+            compartida = clases
+            if len(_CLASES_HOJAS) < MAX_CLASES_HOJAS:
+                _CLASES_HOJAS[clases] = clases
+        self.clases = compartida
+        self.conteos = tuple(resultados.values())
+
+    @property
+    def dato(self) -> any:
+        """
+        El dato del nodo visto como ArbolBinario: (col, valor) en los nodos internos y los resultados en las hojas.
+        """
+        return (self.col, self.valor) if self.conteos is None else self.resultados
+
+def crearArbolDecisionDesde(filas: "list[list[any]] | Dataset", max_profundidad: Optional[int] = None, min_ganancia: float = 0.0, min_muestras_nodo = 1, indices: Optional[Sequence[int]] = None, max_bins: Optional[int] = None, pesos: Optional[Sequence[int]] = None, max_features: "str | int | float | None" = None, rng: Optional[random.Random] = None, regresion: bool = False, criterio: "str | Criterio" = 'entropia', orden: Optional[str] = None, max_hojas: Optional[int] = None, max_segundos: Optional[float] = None, max_memoria: Optional[int] = None) -> "ArbolDecision":
     """
     Crea y devuelve un árbol de decisión binario.
-    """
 
-    filas = imputacionValoresFaltantes(filas) # Manejamos valores faltantes antes de construir el arbol de desicion
-    ordenarValoresUnicos(filas)  # Ordenamos valores unicos (para atributos continuos #C4.5)
+    Acepta una lista de filas (la ultima columna es la clase) o un Dataset. Las filas se convierten una sola vez
+    a formato columnar y el árbol se construye sobre un único arreglo de índices que se particiona en el lugar,
+    de modo que ningun nodo copia filas. 'indices' permite entrenar con un subconjunto (con repeticiones, por
+    ejemplo una muestra bootstrap) de las filas del Dataset.
+
+    'pesos' es la multiplicidad de cada fila del Dataset (por ejemplo muestreo.bootstrap_multiplicidades): cada fila
+    cuenta tantas veces como su peso en los conteos, la ganancia y min_muestras_nodo, y las filas con peso 0 quedan
+    afuera. Es equivalente a pasar los índices repetidos, pero cada nodo recorre cada fila una sola vez.
+
+    Con max_features ('sqrt', 'log2', un entero o una fracción, ver muestreo.cantidad_caracteristicas) cada nodo
+    busca la división solo entre un subconjunto de atributos sorteado de nuevo en ese nodo con 'rng'.
+
+    'criterio' es el criterio de división de los árboles de clasificación: 'entropia' (ganancia de información),
+    'gini' o 'ratio' (gain ratio de C4.5), o un entropia_ganancia.Criterio.
 
-    if len(filas) == 0: 
+    Con regresion=True (o con un Dataset de regresión) la última columna es un valor numérico: las divisiones se
+    eligen por reducción de varianza y cada hoja guarda {media: cantidad de filas}. El modo discretizado no está
+    disponible en regresión.
+
+    Con max_bins los atributos continuos se cuantizan en a lo sumo max_bins bins (Dataset.discretizar) y cada nodo
+    elige umbrales en los bordes de los bins a partir de histogramas de clases por bin, en lugar de ordenar la
+    columna y probar cada valor distinto.
+
+    Los valores faltantes (None o NaN) se tratan como en C4.5: la ganancia de una prueba se calcula con las filas
+    que tienen el valor y se multiplica por la proporción de esas filas, y al dividir un nodo las filas sin el
+    valor bajan por las dos ramas con un peso fraccionario proporcional al peso de cada rama. Para imputarlos en
+    cambio, construir el árbol con Dataset.imputar().
+
+    La construcción es iterativa (no tiene límite de profundidad por la recursión). 'orden' es el orden en que se
+    expanden los nodos: 'profundidad' (primero en profundidad, por defecto), 'anchura' o 'mejor' (primero el nodo
+    cuya división tiene mayor ganancia total; es el orden por defecto con max_hojas). max_hojas limita la cantidad
+    de hojas del árbol; max_segundos y max_memoria (bytes, medidos con tracemalloc) son un presupuesto de tiempo y
+    de memoria: al agotarse, los nodos que faltaba expandir quedan como hojas.
+
+    Con una instrumentacion.Instrumentacion activa, la construcción registra el tiempo de cada fase, las divisiones
+    candidatas y los nodos por profundidad.
+    """
+    if not isinstance(filas, Dataset) and len(filas) == 0:
         return ArbolDecision()
+    if orden is None:
+        orden = 'mejor' if max_hojas is not None else 'profundidad'
+    registro = instrumentacion.nuevoRegistro('arbol')
+    if registro is not None:
+        t = registro.reloj()
+    if isinstance(filas, Dataset):
+        datos = filas
+    else:
+        datos = Dataset.desdeFilas(filas, regresion=regresion) # los faltantes quedan marcados una sola vez, acá
+
+    tipo = 'i' if len(datos) < 2 ** 31 else 'q'
+    if indices is None and pesos is not None:
+        indices = array(tipo, itertools.compress(range(len(datos)), pesos))
+    elif indices is None:
+        indices = arregloIndices(len(datos))
+    else:
+        indices = array(tipo, indices)
+    histogramas = None
+    if max_bins is not None:
+        if datos.regresion:
+            raise ValueError('max_bins no está disponible para árboles de regresión')
+        datos.discretizar(max_bins)
+        histogramas = histogramasBins(datos, indices, pesos)
+    if registro is not None:
+        registro.fase('preparacion', t)
+    elegirAtributos = None
+    cantidad = muestreo.cantidad_caracteristicas(max_features, datos.n_columnas)
+    if cantidad < datos.n_columnas:
+        generador = rng if rng is not None else random.Random()
+        todos = range(datos.n_columnas)
+        elegirAtributos = lambda: sorted(generador.sample(todos, cantidad))
+    arbol = _construirArbol(datos, indices, max_profundidad, min_ganancia, min_muestras_nodo, histogramas, pesos, elegirAtributos, entropia_ganancia.criterio(criterio), orden, max_hojas, max_segundos, max_memoria, registro)
+    if registro is not None:
+        registro.terminar()
+    return arbol
+
+###### CONSTRUCCION ITERATIVA ######
+
+ORDENES = ('profundidad', 'anchura', 'mejor')
+
+class _Pendiente:
+    __slots__ = ('nodo', 'indices', 'inicio', 'fin', 'nivel', 'histogramas', 'fracciones', 'pesos', 'division', 'prioridad')
+
+    def __init__(self, nodo: "ArbolDecision", indices: array, inicio: int, fin: int, nivel: int, histogramas: Optional[dict], fracciones: Optional[dict]):
+        """
+        Nodo por expandir del constructor iterativo: su rango indices[inicio:fin], su profundidad ('nivel'), sus
+        histogramas (modo discretizado) y las fracciones de las filas con faltantes que le llegan. Una vez evaluado
+        guarda también los pesos de sus filas, su mejor división y la prioridad para el orden 'mejor'.
+        """
+        self.nodo = nodo
+        self.indices = indices
+        self.inicio = inicio
+        self.fin = fin
+        self.nivel = nivel
+        self.histogramas = histogramas
+        self.fracciones = fracciones
+        self.pesos = None
+        self.division = None
+        self.prioridad = 0.0
+
+def _construirArbol(datos: Dataset, indices: array, max_profundidad: Optional[int], min_ganancia: float, min_muestras_nodo: int, histogramas: Optional[dict] = None, pesos: Optional[Sequence[int]] = None, elegirAtributos: Optional[Callable[[], list[int]]] = None, criterio: Optional[Criterio] = None, orden: str = 'profundidad', max_hojas: Optional[int] = None, max_segundos: Optional[float] = None, max_memoria: Optional[int] = None, registro: "Optional[instrumentacion.Registro]" = None) -> "ArbolDecision":
+    """
+    Construye el árbol de las filas 'indices' sin recursión: los nodos por expandir se guardan en una pila
+    (orden 'profundidad', el mismo orden de la construcción recursiva), una cola ('anchura') o un heap ordenado por
+    la ganancia total de su mejor división, la ganancia por el peso del nodo ('mejor').
+    Con max_hojas se deja de dividir al llegar a esa cantidad de hojas, y con max_segundos o max_memoria (bytes
+    medidos con tracemalloc) se deja de dividir al agotar el presupuesto: en los dos casos los nodos pendientes
+    quedan como hojas.
+    """
+    if orden not in ORDENES:
+        raise ValueError(f"orden invalido: {orden!r} (se espera uno de {list(ORDENES)})")
+    pesosBase = pesos
+    inicioReloj = time.perf_counter()
+    iniciada = max_memoria is not None and not tracemalloc.is_tracing()
+    if iniciada:
+        tracemalloc.start()
+
+    def agotado() -> bool:
+        return ((max_segundos is not None and time.perf_counter() - inicioReloj > max_segundos) or
+                (max_memoria is not None and tracemalloc.get_traced_memory()[0] > max_memoria))
+
+    def pendiente(nodo, indicesNodo, inicio, fin, nivel, histogramasNodo, fracciones) -> _Pendiente:
+        if registro is not None:
+            registro.nodo(nivel, fin - inicio)
+        return _Pendiente(nodo, indicesNodo, inicio, fin, nivel, histogramasNodo, fracciones)
+
+    def pesosDe(p: _Pendiente) -> Optional[Sequence[float]]:
+        if p.pesos is None and p.fracciones:
+            p.pesos = _pesosFraccionarios(memoryview(p.indices)[p.inicio:p.fin], pesosBase, p.fracciones)
+        return pesosBase if p.pesos is None else p.pesos
+
+    def hacerHoja(p: _Pendiente) -> None:
+        if p.fin > p.inicio:
+            p.nodo.resultados = datos.conteos(memoryview(p.indices)[p.inicio:p.fin], pesosDe(p))
+        p.histogramas = None
+
+    def evaluar(p: _Pendiente) -> bool:
+        """
+        Decide si el nodo es una hoja (y la completa) o busca su mejor división. Devuelve True si hay que dividirlo.
+        """
+        if p.fin == p.inicio:
+            return False
+        segmento = memoryview(p.indices)[p.inicio:p.fin]
+        pesosNodo = pesosDe(p)
+        peso = p.fin - p.inicio if pesosNodo is None else sum(map(pesosNodo.__getitem__, segmento))
+        if peso < min_muestras_nodo or nodoPuro(datos, segmento) or (max_profundidad is not None and p.nivel >= max_profundidad):
+            hacerHoja(p)
+            return False
+        ganancia, mejor = mejorDivision(datos, segmento, min_ganancia, p.histogramas, pesosNodo, elegirAtributos() if elegirAtributos is not None else None, criterio, registro, conGanancia=True)
+        if mejor is None:
+            hacerHoja(p)
+            return False
+        p.division = mejor
+        p.prioridad = ganancia * peso
+        return True
 
-    if len(filas) < min_muestras_nodo:
-        return ArbolDecision(resultados=conteosUnicos(filas))
+    def dividir(p: _Pendiente) -> list[_Pendiente]:
+        """
+        Divide un nodo evaluado con su mejor división y devuelve los pendientes de la rama verdadera y la falsa.
+        """
+        col, valor = p.division
+        pesosNodo = pesosDe(p)
+        nodo, nivel, histogramasNodo = p.nodo, p.nivel + 1, p.histogramas
+        p.histogramas = None
+        nodo.col, nodo.valor = col, datos.decodificar(col, valor)
+        nodo.ramaVerdadera, nodo.ramaFalsa = ArbolDecision(), ArbolDecision()
+        hijos = None
+        if datos.tieneFaltantes(col):
+            if registro is not None:
+                t = registro.reloj()
+            hijos = _dividirFraccionando(datos, memoryview(p.indices)[p.inicio:p.fin], col, valor, pesosNodo, p.fracciones)
+            if registro is not None:
+                registro.fase('dividirFraccionando', t)
+        if hijos is not None:
+            pendientes = []
+            for rama, (indicesHijo, fraccionesHijo) in zip((nodo.ramaVerdadera, nodo.ramaFalsa), hijos):
+                histogramasHijo = None
+                if histogramasNodo is not None:
+                    histogramasHijo = histogramasBins(datos, indicesHijo, _pesosFraccionarios(indicesHijo, pesosBase, fraccionesHijo))
+                pendientes.append(pendiente(rama, indicesHijo, 0, len(indicesHijo), nivel, histogramasHijo, fraccionesHijo))
+            return pendientes
+        inicio, fin, indicesNodo = p.inicio, p.fin, p.indices
+        if registro is not None:
+            t = registro.reloj()
+        corte = particionar(datos, indicesNodo, inicio, fin, col, valor)
+        if registro is not None:
+            registro.fase('particionar', t)
+            t = registro.reloj()
+        histogramasV = histogramasF = None
+        if histogramasNodo is not None:
+            # Solo se recorre el hijo mas chico; el histograma del otro es el del padre menos el del hermano
+            if corte - inicio <= fin - corte:
+                histogramasV = histogramasBins(datos, memoryview(indicesNodo)[inicio:corte], pesosNodo)
+                histogramasF = restarHistogramas(histogramasNodo, histogramasV)
+            else:
+                histogramasF = histogramasBins(datos, memoryview(indicesNodo)[corte:fin], pesosNodo)
+                histogramasV = restarHistogramas(histogramasNodo, histogramasF)
+            if registro is not None:
+                registro.fase('histogramas', t)
+        return [pendiente(nodo.ramaVerdadera, indicesNodo, inicio, corte, nivel, histogramasV, p.fracciones),
+                pendiente(nodo.ramaFalsa, indicesNodo, corte, fin, nivel, histogramasF, p.fracciones)]
+
+    raiz = ArbolDecision()
+    primero = pendiente(raiz, indices, 0, len(indices), 0, histogramas, None)
+    hojas, detenido = 1, False
+    try:
+        if orden == 'mejor':
+            frontera, contador = [], itertools.count()
+            if evaluar(primero):
+                frontera.append((-primero.prioridad, next(contador), primero))
+            while frontera:
+                p = heapq.heappop(frontera)[2]
+                detenido = detenido or agotado()
+                if detenido or (max_hojas is not None and hojas >= max_hojas):
+                    hacerHoja(p)
+                    continue
+                hojas += 1
+                for hijo in dividir(p):
+                    if evaluar(hijo):
+                        heapq.heappush(frontera, (-hijo.prioridad, next(contador), hijo))
+        else:
+            frontera = deque([primero])
+            sacar = frontera.pop if orden == 'profundidad' else frontera.popleft
+            while frontera:
+                p = sacar()
+                detenido = detenido or agotado()
+                if detenido:
+                    hacerHoja(p)
+                    continue
+                if not evaluar(p):
+                    continue
+                if max_hojas is not None and hojas >= max_hojas:
+                    hacerHoja(p)
+                    continue
+                hojas += 1
+                verdadera, falsa = dividir(p)
+                if orden == 'profundidad':
+                    frontera.append(falsa)   # la rama verdadera se expande primero, como en la recursión
+                    frontera.append(verdadera)
+                else:
+                    frontera.append(verdadera)
+                    frontera.append(falsa)
+    finally:
+        if iniciada:
+            tracemalloc.stop()
+    return raiz
+
+def _pesosFraccionarios(indices: Sequence[int], pesos: Optional[Sequence[int]], fracciones: dict) -> dict:
+    """
+    Peso de cada fila indicada dentro de un subárbol: su multiplicidad por la fracción que le llega.
+    """
+    if pesos is None:
+        return {i: fracciones.get(i, 1.0) for i in indices}
+    return {i: pesos[i] * fracciones.get(i, 1.0) for i in indices}
 
-    if nodo_puro(filas):
-        return ArbolDecision(resultados=conteosUnicos(filas))
+def _dividirFraccionando(datos: Dataset, indices: Sequence[int], col: int, valor: any, pesos: Optional[Sequence[int]], fracciones: Optional[dict]) -> Optional[list[tuple[array, dict]]]:
+    """
+    Divide las filas de un nodo cuya prueba usa un atributo con faltantes. Las filas con el valor van a su rama y las
+    que no lo tienen van a las dos, con su fracción multiplicada por la proporción del peso de cada rama.
+    Devuelve [(índices, fracciones)] de la rama verdadera y la falsa, o None si ninguna fila del nodo tiene faltante.
+    """
+    columna = datos.columnas[col]
+    numerica = datos.esNumerica(col)
+    verdaderos, falsos, faltantes = [], [], []
+    pesoV = pesoF = 0
+    for i in indices:
+        x = columna[i]
+        peso = 1 if pesos is None else pesos[i]
+        if datos.esFaltante(col, x):
+            verdaderos.append(i)
+            falsos.append(i)
+            faltantes.append(i)
+        elif (x >= valor) if numerica else (x == valor):
+            verdaderos.append(i)
+            pesoV += peso
+        else:
+            falsos.append(i)
+            pesoF += peso
+    if not faltantes:
+        return None
+    tipo = 'i' if len(datos) < 2 ** 31 else 'q'
+    hijos = []
+    for filas, proporcion in ((verdaderos, pesoV / (pesoV + pesoF)), (falsos, pesoF / (pesoV + pesoF))):
+        fraccionesHijo = {i: fracciones[i] for i in filas if i in fracciones} if fracciones else {}
+        for i in faltantes:
+            fraccionesHijo[i] = fraccionesHijo.get(i, 1.0) * proporcion
+        hijos.append((array(tipo, filas), fraccionesHijo))
+    return hijos
+
+###### BUSQUEDA DE LA MEJOR DIVISION ######
+
+def nodoPuro(datos: Dataset, indices: Sequence[int]) -> bool:
+    """
+    Indica si todas las filas indicadas tienen la misma clase.
+    """
+    objetivo = datos.objetivo
+    clase = objetivo[indices[0]]
+    return all(objetivo[i] == clase for i in indices)
 
-    if max_profundidad is not None and max_profundidad <= 0:
-        return ArbolDecision(resultados=conteosUnicos(filas))  
-    
-    
-    puntuacionActual = entropia(filas)
+def particionar(datos: Dataset, indices: array, inicio: int, fin: int, col: int, valor: any) -> int:
+    """
+    Reordena en el lugar indices[inicio:fin] dejando primero las filas que cumplen la prueba del nodo
+    ('x >= valor' para atributos continuos, 'x == valor' para categoricos, igual que clasificacion.clasificar)
+    y despues las que no. Es estable, asi cada lado conserva el orden original. Devuelve la posicion del corte.
+    """
+    columna = datos.columnas[col]
+    segmento = indices[inicio:fin]
+    if datos.esNumerica(col):
+        verdaderos = [i for i in segmento if columna[i] >= valor]
+        falsos = [i for i in segmento if columna[i] < valor]
+    else:
+        verdaderos = [i for i in segmento if columna[i] == valor]
+        falsos = [i for i in segmento if columna[i] != valor]
+    corte = inicio + len(verdaderos)
+    indices[inicio:corte] = array(indices.typecode, verdaderos)
+    indices[corte:fin] = array(indices.typecode, falsos)
+    return corte
+
+def _barridoCategorico(columna: Sequence, objetivo: Sequence[int], indices: Sequence[int], totales: dict, puntuacionActual: float, pesos: Optional[Sequence[int]] = None, criterio: Criterio = ENTROPIA) -> dict:
+    """
+    Agrupa la columna por valor con un histograma de clases por valor y puntua cada prueba 'x == valor' en una pasada.
+    Devuelve {valor: ganancia} en orden de primera aparicion.
+    """
+    histogramas = {}  # valor -> {clase: conteo}, clases en orden de primera aparicion
+    primeras = {}     # clase -> primeras posiciones con dos valores distintos de la columna
+    for pos, i in enumerate(indices):
+        valor, clase = columna[i], objetivo[i]
+        hist = histogramas.get(valor)
+        if hist is None:
+            hist = histogramas[valor] = {}
+        hist[clase] = hist.get(clase, 0) + (1 if pesos is None else pesos[i])
+        apariciones = primeras.get(clase)
+        if apariciones is None:
+            primeras[clase] = [(pos, valor)]
+        elif len(apariciones) == 1 and apariciones[0][1] != valor:
+            apariciones.append((pos, valor))
+
+    total = sum(totales.values())
+    ganancias = {}
+    for valor, hist in histogramas.items():
+        n1 = sum(hist.values())
+        if n1 == total:
+            continue
+        # Conteos del resto en el mismo orden en que entropia() los recorreria, para obtener exactamente la misma ganancia
+        resto = []
+        for clase, apariciones in primeras.items():
+            if apariciones[0][1] != valor:
+                resto.append((apariciones[0][0], totales[clase] - hist.get(clase, 0)))
+            elif len(apariciones) > 1:
+                resto.append((apariciones[1][0], totales[clase] - hist.get(clase, 0)))
+        resto.sort()
+        ganancias[valor] = criterio.ganancia(puntuacionActual, hist.values(), n1, [c for _, c in resto], total - n1)
+    return ganancias
+
+def _barridoNumerico(columna: Sequence, objetivo: Sequence[int], indices: Sequence[int], totales: dict, pesos: Optional[Sequence[int]] = None, criterio: Criterio = ENTROPIA) -> dict:
+    """
+    Ordena la columna una sola vez y barre de mayor a menor pasando las filas, de a una, a la rama 'x >= umbral'
+    con un barrido incremental del criterio, que puntua cada umbral candidato en O(1).
+    Devuelve {umbral: ganancia} en orden de primera aparicion.
+    """
+    ordenados = sorted(indices, key=columna.__getitem__)
+    barrido = criterio.barrido(_vectorTotales(totales))
+    mover = barrido.mover
+    porUmbral = {}
+    i = len(ordenados) - 1
+    while i > 0:
+        umbral = columna[ordenados[i]]
+        while i >= 0 and columna[ordenados[i]] == umbral:
+            mover(objetivo[ordenados[i]], 1 if pesos is None else pesos[ordenados[i]])
+            i -= 1
+        if i < 0:
+            break
+        porUmbral[umbral] = barrido.ganancia()
+
+    # Mismo orden de desempate que el recorrido original (primera aparicion en las filas)
+    ganancias = {}
+    for i in indices:
+        umbral = columna[i]
+        if umbral in porUmbral and umbral not in ganancias:
+            ganancias[umbral] = porUmbral[umbral]
+    return ganancias
+
+def histogramasBins(datos: Dataset, indices: Sequence[int], pesos: Optional[Sequence[int]] = None) -> dict:
+    """
+    Calcula, para cada atributo discretizado, el histograma de clases por bin de las filas indicadas:
+    {columna: lista plana de n_bins x n_clases conteos}, ponderados por 'pesos' si se indican.
+    """
+    objetivo = datos.objetivo
+    numClases = len(datos.clases)
+    histogramas = {}
+    for col, bins in enumerate(datos.bins):
+        if bins is None:
+            continue
+        hist = [0] * ((len(datos.bordes[col]) + 2) * numClases) # el último bin es el de los faltantes
+        if pesos is None:
+            for i in indices:
+                hist[bins[i] * numClases + objetivo[i]] += 1
+        else:
+            for i in indices:
+                hist[bins[i] * numClases + objetivo[i]] += pesos[i]
+        histogramas[col] = hist
+    return histogramas
+
+def restarHistogramas(padre: dict, hijo: dict) -> dict:
+    """
+    Histogramas del hermano: los del padre menos los del hijo.
+    """
+    return {col: [p - h for p, h in zip(hist, hijo[col])] for col, hist in padre.items()}
+
+def _barridoHistograma(hist: list[int], bordes: list[float], numClases: int, totales: dict, criterio: Criterio = ENTROPIA) -> dict:
+    """
+    Barre los bins de mayor a menor pasando cada bin a la rama 'x >= bordes[b - 1]' con el barrido del criterio
+    y puntua cada borde. Devuelve {umbral: ganancia} en orden de umbral creciente.
+    """
+    barrido = criterio.barrido([totales.get(c, 0) for c in range(numClases)])
+    total = barrido.nDerecha
+    candidatos = []
+    for b in range(len(bordes), 0, -1):
+        fila = hist[b * numClases:(b + 1) * numClases]
+        if not any(fila):
+            continue
+        for clase, cantidad in enumerate(fila):
+            if cantidad:
+                barrido.mover(clase, cantidad)
+        if barrido.nDerecha <= TOLERANCIA * total: # con pesos fraccionarios la resta puede no dar exactamente 0
+            break
+        candidatos.append((bordes[b - 1], barrido.ganancia()))
+    return dict(reversed(candidatos))
+
+def _totalesClase(objetivo: Sequence[int], indices: Sequence[int], pesos: Optional[Sequence[int]] = None) -> dict:
+    """
+    Conteos (ponderados) por código de clase de las filas indicadas, en orden de primera aparición.
+    """
+    totales = {}
+    for i in indices:
+        totales[objetivo[i]] = totales.get(objetivo[i], 0) + (1 if pesos is None else pesos[i])
+    return totales
+
+def _vectorTotales(totales: dict) -> list:
+    """
+    Pasa los conteos por código de clase de un diccionario a un vector indexado por código.
+    """
+    vector = [0] * (max(totales) + 1 if totales else 0)
+    for clase, conteo in totales.items():
+        vector[clase] = conteo
+    return vector
+
+def mejorDivision(datos: Dataset, indices: Sequence[int], min_ganancia: float = 0.0, histogramas: Optional[dict] = None, pesos: Optional[Sequence[int]] = None, atributos: Optional[Sequence[int]] = None, criterio: Optional[Criterio] = None, registro: "Optional[instrumentacion.Registro]" = None, conGanancia: bool = False) -> "Optional[tuple[int, any]] | tuple[float, Optional[tuple[int, any]]]":
+    """
+    Busca la prueba (columna, valor codificado) de mayor ganancia de información para las filas indicadas.
+    Cada columna se recorre una vez: las continuas se ordenan y se barren con histogramas acumulados y las
+    categoricas se agrupan por valor, de modo que cada candidato se puntua sin volver a particionar las filas.
+    Con 'histogramas' (modo discretizado) los atributos continuos se puntuan sobre los bordes de sus bins.
+    Con 'pesos' cada fila cuenta tantas veces como su multiplicidad y con 'atributos' solo se consideran esas columnas.
+    'criterio' es el entropia_ganancia.Criterio de la ganancia (por defecto, la entropía).
+    En los atributos con faltantes la ganancia se calcula con las filas que tienen el valor y se multiplica por la
+    proporción (en peso) de esas filas, como en C4.5.
+    En regresión la ganancia es la reducción de varianza (ver mejorDivisionRegresion).
+    Con 'registro' (instrumentacion) se mide cada barrido y se cuentan las pruebas candidatas.
+    Los empates de ganancia (diferencias de hasta TOLERANCIA) se resuelven por el orden de los candidatos: gana la
+    primera columna y, dentro de ella, el primer valor en aparecer en las filas. El constructor anterior los resolvía
+    por el ruido de redondeo de cada suma, así que en datos con empates (frecuentes con atributos categóricos, por
+    ejemplo 'x == p' y 'x == q' en una columna de dos valores) el árbol y a veces sus hojas cambian respecto de él.
+    Devuelve None si ninguna prueba tiene ganancia positiva; con conGanancia=True devuelve (ganancia, prueba).
+    """
+    if datos.regresion:
+        return mejorDivisionRegresion(datos, indices, min_ganancia, pesos, atributos, registro, conGanancia)
+    objetivo = datos.objetivo
+    totales = _totalesClase(objetivo, indices, pesos)
+    if criterio is None:
+        criterio = ENTROPIA
+    puntuacionActual = criterio.impureza(totales.values(), sum(totales.values()))
 
     mejorGanancia = 0.0
     mejorAtributo = None
-    mejoressets = None
 
-    numColumnas = len(filas[0]) - 1  # la ultima columna es la columna de resultado/objetivo 
+    total = sum(totales.values())
+
+    for col in (range(datos.n_columnas) if atributos is None else atributos):
+        filas, totalesCol, puntuacion, proporcion = indices, totales, puntuacionActual, 1.0
+        if datos.tieneFaltantes(col):
+            if histogramas is not None and col in histogramas:
+                numClases = len(datos.clases)
+                faltantes = histogramas[col][-numClases:]
+                totalesCol = {c: n - faltantes[c] for c, n in totales.items() if n - faltantes[c] > 0}
+            else:
+                filas = datos.conocidas(col, indices)
+                if len(filas) < len(indices):
+                    totalesCol = _totalesClase(objetivo, filas, pesos)
+            if totalesCol is not totales:
+                conocido = sum(totalesCol.values())
+                if not conocido:
+                    continue
+                proporcion = conocido / total
+                puntuacion = criterio.impureza(totalesCol.values(), conocido)
+
+        if registro is not None:
+            t = registro.reloj()
+        if histogramas is not None and col in histogramas:
+            fase = 'barridoHistograma'
+            ganancias = _barridoHistograma(histogramas[col], datos.bordes[col], len(datos.clases), totalesCol, criterio)
+        elif datos.esNumerica(col):
+            fase = 'barridoNumerico'
+            ganancias = _barridoNumerico(datos.columnas[col], objetivo, filas, totalesCol, pesos, criterio)
+        else:
+            fase = 'barridoCategorico'
+            ganancias = _barridoCategorico(datos.columnas[col], objetivo, filas, totalesCol, puntuacion, pesos, criterio)
+        if registro is not None:
+            registro.fase(fase, t)
+            registro.candidatos += len(ganancias)
+
+        for valor, ganancia in ganancias.items():
+            ganancia *= proporcion
+            if ganancia < min_ganancia:
+                continue
+            if ganancia > mejorGanancia + TOLERANCIA: # los empates los gana el primer candidato, no el redondeo
+                mejorGanancia = ganancia
+                mejorAtributo = (col, valor)
+
+    return (mejorGanancia, mejorAtributo) if conGanancia else mejorAtributo
     
-    for col in range(0, numColumnas):
-        valoresColumna = [fila[col] for fila in filas]
-        
-        for valor in valoresColumna:
-            (set1, set2) = dividirConjunto(filas, col, valor)
+###### REGRESION ######
+
+def _reduccionVarianza(n: float, suma: float, n1: float, suma1: float) -> float:
+    """
+    Reducción de varianza de una división binaria a partir de la cantidad y la suma de y del nodo y de un lado.
+    Es (SSE del padre - SSE de los hijos) / n; los términos con la suma de y² se cancelan, así que no hacen falta.
+    Se calcula con el desvío d de la suma del lado respecto de la media del nodo, que nunca da negativo.
+    """
+    d = suma1 - n1 * suma / n
+    return d * d * (1 / n1 + 1 / (n - n1)) / n
 
-            # Ganancia -- Entropía o Gini
-            p = float(len(set1)) / len(filas)
-            ganancia = puntuacionActual - p * entropia(set1) - (1 - p) * entropia(set2)
+def _barridoNumericoRegresion(columna: Sequence, objetivo: Sequence[float], indices: Sequence[int], n: float, suma: float, pesos: Optional[Sequence[int]] = None) -> dict:
+    """
+    Ordena la columna y barre de mayor a menor acumulando la cantidad y la suma de y de la rama 'x >= umbral'
+    (sumas prefijas), de modo que cada umbral candidato se puntúa en O(1). Devuelve {umbral: reducción de varianza}.
+    """
+    ordenados = sorted(indices, key=columna.__getitem__)
+    n1 = suma1 = 0
+    porUmbral = {}
+    i = len(ordenados) - 1
+    while i > 0:
+        umbral = columna[ordenados[i]]
+        while i >= 0 and columna[ordenados[i]] == umbral:
+            fila = ordenados[i]
+            peso = 1 if pesos is None else pesos[fila]
+            n1 += peso
+            suma1 += peso * objetivo[fila]
+            i -= 1
+        if i < 0:
+            break
+        porUmbral[umbral] = _reduccionVarianza(n, suma, n1, suma1)
+    return porUmbral
+
+def _barridoCategoricoRegresion(columna: Sequence, objetivo: Sequence[float], indices: Sequence[int], n: float, suma: float, pesos: Optional[Sequence[int]] = None) -> dict:
+    """
+    Agrupa la columna por valor acumulando cantidad y suma de y, y puntúa cada prueba 'x == valor'.
+    Devuelve {valor: reducción de varianza} en orden de primera aparición.
+    """
+    grupos = {}  # valor -> [cantidad, suma]
+    for i in indices:
+        grupo = grupos.get(columna[i])
+        if grupo is None:
+            grupo = grupos[columna[i]] = [0, 0.0]
+        peso = 1 if pesos is None else pesos[i]
+        grupo[0] += peso
+        grupo[1] += peso * objetivo[i]
+    return {valor: _reduccionVarianza(n, suma, n1, suma1) for valor, (n1, suma1) in grupos.items() if n1 < n}
+
+def mejorDivisionRegresion(datos: Dataset, indices: Sequence[int], min_ganancia: float = 0.0, pesos: Optional[Sequence[int]] = None, atributos: Optional[Sequence[int]] = None, registro: "Optional[instrumentacion.Registro]" = None, conGanancia: bool = False) -> "Optional[tuple[int, any]] | tuple[float, Optional[tuple[int, any]]]":
+    """
+    Igual que mejorDivision para un Dataset de regresión: elige la prueba (columna, valor codificado) con mayor
+    reducción de varianza del valor a predecir. Devuelve None si ninguna prueba la reduce.
+    Los faltantes se manejan como en mejorDivision.
+    """
+    objetivo = datos.objetivo
+    def cantidadYSuma(filas):
+        if pesos is None:
+            return len(filas), sum(map(objetivo.__getitem__, filas))
+        return sum(map(pesos.__getitem__, filas)), sum(pesos[i] * objetivo[i] for i in filas)
+    n, suma = cantidadYSuma(indices)
 
+    mejorGanancia = 0.0
+    mejorAtributo = None
+    for col in (range(datos.n_columnas) if atributos is None else atributos):
+        filas, nCol, sumaCol = indices, n, suma
+        if datos.tieneFaltantes(col):
+            filas = datos.conocidas(col, indices)
+            nCol, sumaCol = cantidadYSuma(filas)
+            if not nCol:
+                continue
+        if registro is not None:
+            t = registro.reloj()
+        if datos.esNumerica(col):
+            fase = 'barridoNumerico'
+            ganancias = _barridoNumericoRegresion(datos.columnas[col], objetivo, filas, nCol, sumaCol, pesos)
+        else:
+            fase = 'barridoCategorico'
+            ganancias = _barridoCategoricoRegresion(datos.columnas[col], objetivo, filas, nCol, sumaCol, pesos)
+        if registro is not None:
+            registro.fase(fase, t)
+            registro.candidatos += len(ganancias)
+        for valor, ganancia in ganancias.items():
+            ganancia *= nCol / n
             if ganancia < min_ganancia:
                 continue
-
-            if ganancia > mejorGanancia and len(set1) > 0 and len(set2) > 0:
+            if ganancia > mejorGanancia:
                 mejorGanancia = ganancia
                 mejorAtributo = (col, valor)
-                mejoressets = (set1, set2)
+    return (mejorGanancia, mejorAtributo) if conGanancia else mejorAtributo
 
-    if mejorGanancia > 0:
-        ramaVerdadera = crearArbolDecisionDesde(mejoressets[0],max_profundidad -1, min_ganancia,  min_muestras_nodo = 1)
-        ramaFalsa = crearArbolDecisionDesde(mejoressets[1], max_profundidad -1, min_ganancia, min_muestras_nodo = 1)
-        return ArbolDecision(col=mejorAtributo[0], valor=mejorAtributo[1], ramaVerdadera=ramaVerdadera, ramaFalsa=ramaFalsa)
-    else:
-       # print(filas)
-        return ArbolDecision(resultados=conteosUnicos(filas))
-    
 def nodo_puro(filas: list[list[any]]) -> bool:
     clase_primera_fila = filas[0][-1]  # Clase de la última columna en la primera fila
     for fila in filas:
@@ -136,26 +755,10 @@ def nodo_puro(filas: list[list[any]]) -> bool:
 
 def podarArbol(arbol: "ArbolDecision", minGanancia:float, notificar=False) -> None:
     """
-    Poda el árbol de decisión según una ganancia mínima.
+    Poda el árbol de decisión según una ganancia mínima (en el lugar, a partir de los conteos de las hojas).
+    Ver el módulo poda para la poda por costo-complejidad y por error reducido.
     """
-    # llamada recursiva para cada rama
-    if arbol.ramaVerdadera.resultados == None: 
-        podarArbol(arbol.ramaVerdadera, minGanancia, notificar)
-    if arbol.ramaFalsa.resultados == None: 
-        podarArbol(arbol.ramaFalsa, minGanancia, notificar)
-
-    if arbol.ramaVerdadera.resultados != None and arbol.ramaFalsa.resultados != None:
-        ramaVerdadera, ramaFalsa = [], []
-
-        for v, c in arbol.ramaVerdadera.resultados.items(): ramaVerdadera += [[v]] * c
-        for v, c in arbol.ramaFalsa.resultados.items(): ramaFalsa += [[v]] * c
-
-        p = float(len(ramaVerdadera)) / len(ramaVerdadera + ramaFalsa)
-        delta = entropia(ramaVerdadera + ramaFalsa) - p * entropia(ramaVerdadera) - (1 - p) * entropia(ramaFalsa)
-        if delta < minGanancia: 
-            if notificar: print('Se podó una rama: ganancia = %f' % delta)      
-            arbol.ramaVerdadera, arbol.ramaFalsa = None, None
-            arbol.resultados = conteosUnicos(ramaVerdadera + ramaFalsa)
+    poda.podarPorGanancia(arbol, minGanancia, notificar)
 
 ###### NUEVAS FUNCIONES ######
             
@@ -213,20 +816,32 @@ def manejoAtributosContinuos(filas: list[list[any]]) -> list[list[any]]:
             filas_nuevas.extend(filas_derecha)
     return filas_nuevas
 
+def _valorNumerico(valor: any) -> Optional[float]:
+    """
+    Valor numérico de una celda (número o cadena de dígitos), o None si no lo tiene.
+    """
+    if esNumerico(valor):
+        return None if valor != valor else valor
+    if isinstance(valor, str) and valor.isdigit():
+        return int(valor)
+    return None
+
 def imputacionValoresFaltantes(filas: list[list[any]]) -> list[list[any]]: # decidimos usar la media de la columna para reemplazar los valores faltantes (o sea, imputar los valores faltantes con el valor que resulta de calcular la media de la columna)
     """
-    Imputa valores faltantes en el conjunto de datos.
+    Imputa valores faltantes en el conjunto de datos. No modifica las filas recibidas (pueden estar compartidas,
+    por ejemplo entre muestras bootstrap): las filas con valores imputados se reemplazan por copias.
     """
+    filas = list(filas)
     columnas = len(filas[0])
     for i in range(columnas):
         # Encontramos la media de la columna actual
-        valores = [fila[i] for fila in filas if fila[i] is not None and fila[i].isdigit()]
+        valores = [_valorNumerico(fila[i]) for fila in filas if _valorNumerico(fila[i]) is not None]
         if valores:
-            media_columna = sum(map(int, valores)) / len(valores)
+            media_columna = sum(valores) / len(valores)
             # Y rellenamos los valores faltantes con la media de la columna
             for j in range(len(filas)):
-                if filas[j][i] is None:
-                    filas[j][i] = media_columna
+                if esFaltante(filas[j][i]):
+                    filas[j] = filas[j][:i] + [media_columna] + filas[j][i + 1:]
     return filas
 
 
@@ -245,13 +860,10 @@ def calcularSplitInfo(atributo:int, datos_entrenamiento: list[list[any]]) -> flo
     Calcula el Split Information para un atributo.
     """    
 
-    valores_atributo = set(fila[atributo] for fila in datos_entrenamiento)
-    total_filas = len(datos_entrenamiento)
-    split_info = 0
-    for valor in valores_atributo:
-        p = sum(1 for fila in datos_entrenamiento if fila[atributo] == valor) / total_filas
-        split_info -= p * log2(p) if p > 0 else 0 
-    return split_info
+    tamanos = {}
+    for fila in datos_entrenamiento:
+        tamanos[fila[atributo]] = tamanos.get(fila[atributo], 0) + 1
+    return informacionDivision(tamanos.values())
 
 # Costos asimétricos y datos ponderados:
 # IMPLEMENTAR estas funcionalidades según lo requerido por el TPF.
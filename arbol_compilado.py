@@ -0,0 +1,482 @@
+"""
+Este módulo "compila" los árboles de decisión construidos por algoritmo.crearArbolDecisionDesde a una tabla plana
+de nodos, pensada para la inferencia.
+
+Cada árbol compilado guarda arreglos paralelos indexados por número de nodo: atributo de la prueba, umbral o código
+de categoría, tipo de prueba, hijo izquierdo (rama verdadera), hijo derecho (rama falsa), fila de la hoja en una
+matriz de conteos por clase y probabilidad de la rama verdadera. La predicción recorre esos arreglos con un ciclo,
+sin recursión ni objetos por nodo.
+
+Los valores faltantes se codifican como NaN. Una observación con un faltante en el atributo de un nodo sigue por
+las dos ramas con su peso multiplicado por la probabilidad de cada una (la proporción del peso de entrenamiento que
+fue por ella, precalculada al compilar), y el voto del árbol es la suma ponderada de las hojas alcanzadas.
+
+Los árboles de objetos (ArbolDecision) se siguen usando para construir y para graficadora.graficar; este módulo no
+depende de los módulos de entrenamiento. Los votos del bosque se acumulan con votacion.AcumuladorVotos.
+
+Con una instrumentacion.Instrumentacion activa, votar y promediar registran el tiempo de codificar el lote y de
+cada árbol.
+
+BosqueCompilado.activarCache pone un cache acotado de predicciones (cache_prediccion) delante de predict y
+predict_batch, para cuando las mismas observaciones se repiten.
+"""
+
+import itertools
+import math
+import numbers
+import operator
+from array import array
+from typing import Optional, Sequence
+
+import instrumentacion
+from cache_prediccion import CachePrediccion
+from votacion import AcumuladorVotos
+
+HOJA = -1
+
+class ArbolCompilado:
+    def __init__(self, atributo: Sequence[int], valor: Sequence[float], numerico: Sequence[int], izquierdo: Sequence[int], derecho: Sequence[int], hoja: Sequence[int], conteos: Sequence[float], n_clases: int, probabilidad: Optional[Sequence[float]] = None):
+        """
+        Clase que representa un árbol de decisión como tabla plana de nodos. El nodo 0 es la raíz; en las hojas
+        izquierdo[n] == derecho[n] == HOJA y hoja[n] es la fila de la hoja en la matriz 'conteos' (n_hojas x n_clases).
+        probabilidad[n] es la probabilidad de la rama verdadera del nodo n (ver probabilidadesRamas).
+        """
+        self.atributo = atributo
+        self.valor = valor
+        self.numerico = numerico
+        self.izquierdo = izquierdo
+        self.derecho = derecho
+        self.hoja = hoja
+        self.conteos = conteos
+        self.n_clases = n_clases
+        self.probabilidad = probabilidad if probabilidad is not None else self.probabilidadesRamas(izquierdo, derecho, hoja, conteos, n_clases)
+
+    @staticmethod
+    def probabilidadesRamas(izquierdo: Sequence[int], derecho: Sequence[int], hoja: Sequence[int], conteos: Sequence[float], n_clases: int, regresion: bool = False) -> array:
+        """
+        Calcula, para cada nodo, la proporción del peso de entrenamiento (suma de los conteos de sus hojas) que fue
+        por la rama verdadera. Los hijos siempre tienen número mayor que el padre, así que alcanza una pasada de atrás
+        hacia adelante. En regresión el peso de una hoja es su cantidad de filas.
+        """
+        totales = [0.0] * len(izquierdo)
+        probabilidad = array('d', bytes(8 * len(izquierdo)))
+        for n in range(len(izquierdo) - 1, -1, -1):
+            if izquierdo[n] == HOJA:
+                inicio = hoja[n] * n_clases
+                totales[n] = conteos[inicio + 1] if regresion else sum(conteos[inicio:inicio + n_clases])
+            else:
+                verdadera, falsa = totales[izquierdo[n]], totales[derecho[n]]
+                totales[n] = verdadera + falsa
+                probabilidad[n] = verdadera / (verdadera + falsa) if verdadera + falsa else 0.5
+        return probabilidad
+
+    @classmethod
+    def compilar(cls, arbol, clases: list, codigos: list[Optional[dict]]) -> "ArbolCompilado":
+        """
+        Aplana un ArbolDecision. 'codigos' tiene, por atributo, el diccionario valor -> código de categoría
+        (None para atributos continuos); las categorías que no estén se agregan al diccionario.
+        Con clases=None (árbol de regresión) cada hoja guarda (media, cantidad de filas) en lugar de los conteos.
+        """
+        regresion = clases is None
+        anchoHoja = 2 if regresion else len(clases)
+        posicion = {clase: i for i, clase in enumerate(clases or ())}
+        atributo, valor, numerico = array('i'), array('d'), array('b')
+        izquierdo, derecho, hoja, conteos = array('i'), array('i'), array('i'), array('d')
+
+        pendientes = [(arbol, -1, False)] # (nodo, padre, es rama falsa)
+        while pendientes:
+            nodo, padre, esFalsa = pendientes.pop()
+            n = len(atributo)
+            if padre >= 0:
+                (derecho if esFalsa else izquierdo)[padre] = n
+            izquierdo.append(HOJA)
+            derecho.append(HOJA)
+            if nodo.resultados is not None or nodo.ramaVerdadera is None:
+                atributo.append(HOJA)
+                valor.append(0.0)
+                numerico.append(0)
+                hoja.append(len(conteos) // anchoHoja if anchoHoja else 0)
+                if regresion:
+                    fila = list(next(iter(nodo.resultados.items()))) if nodo.resultados else [math.nan, 0.0]
+                else:
+                    fila = [0.0] * len(clases)
+                    for clase, conteo in (nodo.resultados or {}).items():
+                        fila[posicion[clase]] = conteo
+                conteos.extend(fila)
+                continue
+            atributo.append(nodo.col)
+            hoja.append(HOJA)
+            diccionario = codigos[nodo.col]
+            if diccionario is None: # el tipo de la prueba es el de la columna, no el del valor (ver Dataset.desdeFilas)
+                valor.append(nodo.valor)
+                numerico.append(1)
+            else:
+                if nodo.valor not in diccionario:
+                    diccionario[nodo.valor] = len(diccionario)
+                valor.append(diccionario[nodo.valor])
+                numerico.append(0)
+            pendientes.append((nodo.ramaFalsa, n, True))
+            pendientes.append((nodo.ramaVerdadera, n, False))
+        return cls(atributo, valor, numerico, izquierdo, derecho, hoja, conteos, anchoHoja, cls.probabilidadesRamas(izquierdo, derecho, hoja, conteos, anchoHoja, regresion))
+
+    def __len__(self) -> int:
+        return len(self.atributo)
+
+    def hojaDe(self, fila: Sequence[float]) -> int:
+        """
+        Devuelve la fila de la matriz de conteos de la hoja a la que llega una observación codificada.
+        """
+        atributo, valor, numerico, izquierdo, derecho = self.atributo, self.valor, self.numerico, self.izquierdo, self.derecho
+        n = 0
+        while izquierdo[n] != HOJA:
+            x = fila[atributo[n]]
+            if (x >= valor[n]) if numerico[n] else (x == valor[n]):
+                n = izquierdo[n]
+            else:
+                n = derecho[n]
+        return self.hoja[n]
+
+    def hojasDe(self, fila: Sequence[float]) -> list[tuple[int, float]]:
+        """
+        Como hojaDe para una observación con faltantes (NaN): devuelve las hojas alcanzadas con el peso con el que
+        llega la observación a cada una (los pesos suman 1).
+        """
+        atributo, valor, numerico, izquierdo, derecho, probabilidad = self.atributo, self.valor, self.numerico, self.izquierdo, self.derecho, self.probabilidad
+        hojas = []
+        pendientes = [(0, 1.0)]
+        while pendientes:
+            n, peso = pendientes.pop()
+            if izquierdo[n] == HOJA:
+                hojas.append((self.hoja[n], peso))
+                continue
+            x = fila[atributo[n]]
+            if x != x:
+                p = probabilidad[n]
+                if p < 1.0:
+                    pendientes.append((derecho[n], peso * (1.0 - p)))
+                if p > 0.0:
+                    pendientes.append((izquierdo[n], peso * p))
+            elif (x >= valor[n]) if numerico[n] else (x == valor[n]):
+                pendientes.append((izquierdo[n], peso))
+            else:
+                pendientes.append((derecho[n], peso))
+        return hojas
+
+    def conteosHoja(self, hoja: int) -> Sequence[float]:
+        k = self.n_clases
+        return self.conteos[hoja * k:(hoja + 1) * k]
+
+    def hojasLote(self, columnas: list[Sequence[float]], indices: list[int]):
+        """
+        Recorre la tabla con muchas observaciones codificadas a la vez (columnas[a] es el atributo a de todas).
+        Genera pares (hoja, índices de las filas que llegan a esa hoja).
+        """
+        atributo, valor, numerico, izquierdo, derecho = self.atributo, self.valor, self.numerico, self.izquierdo, self.derecho
+        pendientes = [(0, indices)]
+        while pendientes:
+            n, indices = pendientes.pop()
+            if izquierdo[n] == HOJA:
+                yield self.hoja[n], indices
+                continue
+            columna = columnas[atributo[n]]
+            valores = operator.itemgetter(*indices)(columna) if len(indices) > 1 else (columna[indices[0]],)
+            mascara = list(map(operator.le if numerico[n] else operator.eq, itertools.repeat(valor[n]), valores))
+            falsos = list(itertools.compress(indices, map(operator.not_, mascara)))
+            if falsos:
+                pendientes.append((derecho[n], falsos))
+            if len(falsos) < len(indices):
+                pendientes.append((izquierdo[n], list(itertools.compress(indices, mascara))))
+
+    def hojasLotePonderado(self, columnas: list[Sequence[float]], indices: list[int], faltantes: set[int]):
+        """
+        Como hojasLote para observaciones con faltantes (NaN) en los atributos del conjunto 'faltantes': en los nodos
+        de esos atributos las filas con faltante bajan por las dos ramas con su peso multiplicado por la probabilidad
+        de cada rama. Genera triplas (hoja, índices, pesos), con pesos None si todas las filas llegan con peso 1.
+        """
+        atributo, valor, numerico, izquierdo, derecho, probabilidad = self.atributo, self.valor, self.numerico, self.izquierdo, self.derecho, self.probabilidad
+        pendientes = [(0, indices, None)]
+        while pendientes:
+            n, indices, pesos = pendientes.pop()
+            if izquierdo[n] == HOJA:
+                yield self.hoja[n], indices, pesos
+                continue
+            columna = columnas[atributo[n]]
+            valores = operator.itemgetter(*indices)(columna) if len(indices) > 1 else (columna[indices[0]],)
+            mascara = list(map(operator.le if numerico[n] else operator.eq, itertools.repeat(valor[n]), valores))
+            if atributo[n] in faltantes and any(map(operator.ne, valores, valores)):
+                p = probabilidad[n]
+                verdaderos, pesosV, falsos, pesosF = [], [], [], []
+                for i, peso, v, va in zip(indices, pesos or itertools.repeat(1.0), valores, mascara):
+                    if v != v:
+                        if p > 0.0:
+                            verdaderos.append(i)
+                            pesosV.append(peso * p)
+                        if p < 1.0:
+                            falsos.append(i)
+                            pesosF.append(peso * (1.0 - p))
+                    elif va:
+                        verdaderos.append(i)
+                        pesosV.append(peso)
+                    else:
+                        falsos.append(i)
+                        pesosF.append(peso)
+                if falsos:
+                    pendientes.append((derecho[n], falsos, pesosF))
+                if verdaderos:
+                    pendientes.append((izquierdo[n], verdaderos, pesosV))
+                continue
+            negada = list(map(operator.not_, mascara))
+            falsos = list(itertools.compress(indices, negada))
+            if falsos:
+                pendientes.append((derecho[n], falsos, list(itertools.compress(pesos, negada)) if pesos else None))
+            if len(falsos) < len(indices):
+                pendientes.append((izquierdo[n], list(itertools.compress(indices, mascara)), list(itertools.compress(pesos, mascara)) if pesos else None))
+
+class BosqueCompilado:
+    def __init__(self, arboles: list[ArbolCompilado], clases: list, codigos: list[Optional[dict]], metadatos: Optional[dict] = None):
+        """
+        Clase que representa un bosque de árboles compilados junto con la codificación de sus atributos.
+        Es el camino de inferencia por defecto de random_forest.RandomForest. clases es None en los bosques de
+        regresión, que predicen el promedio de las medias de las hojas alcanzadas.
+        """
+        self.arboles = arboles
+        self.clases = clases
+        self.regresion = clases is None
+        self.codigos = codigos
+        self.metadatos = metadatos if metadatos is not None else {}
+        self.cache: Optional[CachePrediccion] = None
+
+    def activarCache(self, capacidad: int = 1024, politica: str = 'lru') -> CachePrediccion:
+        """
+        Activa un cache de predicciones (ver cache_prediccion) para predict y predict_batch, vacío. Está desactivado
+        por defecto; cada bosque (cada modelo cargado o entrenado) tiene el suyo. Reemplaza el cache anterior sin
+        tocarlo, así que se puede llamar mientras otro hilo clasifica un lote: ese lote termina con el anterior.
+        """
+        self.cache = CachePrediccion(capacidad, politica)
+        return self.cache
+
+    def desactivarCache(self) -> None:
+        self.cache = None
+
+    @staticmethod
+    def clave(fila: list[float]) -> tuple:
+        """
+        Clave de cache de una observación codificada (los NaN pasan a None, para que sean iguales entre sí).
+        """
+        return tuple(None if v != v else v for v in fila)
+
+    @classmethod
+    def compilar(cls, arboles: list, clases: list, categorias: list[Optional[list]]) -> "BosqueCompilado":
+        """
+        Compila una lista de ArbolDecision. 'categorias' tiene, por atributo, la lista código -> valor
+        (None para atributos continuos), como en conjuntos.Dataset.
+        """
+        codigos = [None if cats is None else {v: i for i, v in enumerate(cats)} for cats in categorias]
+        return cls([ArbolCompilado.compilar(arbol, clases, codigos) for arbol in arboles], clases, codigos)
+
+    def validar(self, observacion: Sequence[any]) -> None:
+        """
+        Verifica que la observación tenga un valor por atributo, numérico (o None) en los atributos continuos y
+        hashable en los categóricos. Sirve para rechazar un pedido antes de juntarlo con otros en un lote.
+
+        Raises:
+            ValueError: Si la cantidad de valores no es la cantidad de atributos.
+            TypeError: Si un valor no es del tipo de su atributo.
+        """
+        if len(observacion) != len(self.codigos):
+            raise ValueError(f'se esperaban {len(self.codigos)} atributos y la observación tiene {len(observacion)}')
+        for a, (valor, diccionario) in enumerate(zip(observacion, self.codigos)):
+            if valor is None:
+                continue
+            if diccionario is None:
+                if isinstance(valor, bool) or not isinstance(valor, numbers.Real):
+                    raise TypeError(f'el atributo {a} es continuo y recibió {valor!r}')
+            else:
+                hash(valor)
+
+    def codificar(self, observacion: Sequence[any]) -> list[float]:
+        """
+        Codifica una observación: las categorías pasan a su código (-1 si no se conocen) y los faltantes a NaN.
+        """
+        fila = []
+        for valor, diccionario in zip(observacion, self.codigos):
+            if valor is None:
+                fila.append(math.nan)
+            elif diccionario is not None:
+                fila.append(diccionario.get(valor, -1))
+            else:
+                fila.append(valor)
+        return fila
+
+    def codificarColumnas(self, matriz: list[Sequence[any]]) -> list[Sequence[float]]:
+        """
+        Transpone y codifica una matriz de observaciones.
+        """
+        return self.codificarConFaltantes(matriz)[0]
+
+    def codificarConFaltantes(self, matriz: list[Sequence[any]]) -> tuple[list[Sequence[float]], set[int]]:
+        """
+        Transpone y codifica una matriz de observaciones. Devuelve también el conjunto de atributos que tienen algún
+        faltante (None o NaN), que se detecta acá una sola vez por lote.
+        """
+        largos = set(map(len, matriz))
+        if largos and largos != {len(self.codigos)}:
+            raise ValueError(f'se esperaban {len(self.codigos)} atributos y hay observaciones con {sorted(largos - {len(self.codigos)})}')
+        columnas, faltantes = [], set()
+        for a, (valores, diccionario) in enumerate(zip(zip(*matriz), self.codigos)):
+            if None in valores:
+                faltantes.add(a)
+                if diccionario is not None:
+                    columnas.append(array('d', (math.nan if v is None else diccionario.get(v, -1) for v in valores)))
+                else:
+                    columnas.append(array('d', (math.nan if v is None else v for v in valores)))
+            elif diccionario is not None:
+                columnas.append(array('d', map(diccionario.get, valores, itertools.repeat(-1))))
+            else:
+                if any(map(operator.ne, valores, valores)): # NaN
+                    faltantes.add(a)
+                columnas.append(valores)
+        return columnas, faltantes
+
+    def predict(self, observacion: Sequence[any]) -> dict:
+        """
+        Clasifica una observación por votación mayoritaria: devuelve {clase ganadora: suma de conteos}.
+        En regresión devuelve el valor predicho (float).
+        """
+        fila = self.codificar(observacion)
+        cache = self.cache # se lee una vez: activarCache puede reemplazarlo desde otro hilo
+        if cache is None:
+            votos = self._votosFila(fila)
+        else:
+            clave = self.clave(fila)
+            votos = cache.obtener(clave)
+            if votos is None:
+                votos = self._votosFila(fila)
+                cache.guardar(clave, votos)
+        if self.regresion:
+            return votos
+        ganadora = max(range(len(votos)), key=votos.__getitem__)
+        total = votos[ganadora]
+        return {self.clases[ganadora]: int(total) if total.is_integer() else total}
+
+    def _votosFila(self, fila: list[float]) -> "array | float":
+        """
+        Suma de los conteos por clase de las hojas alcanzadas por una observación codificada, o el valor predicho
+        en regresión.
+        """
+        conFaltantes = any(map(operator.ne, fila, fila))
+        if self.regresion:
+            if conFaltantes:
+                medias = [sum(arbol.conteos[2 * h] * peso for h, peso in arbol.hojasDe(fila)) for arbol in self.arboles]
+            else:
+                medias = [arbol.conteos[2 * arbol.hojaDe(fila)] for arbol in self.arboles]
+            return sum(medias) / len(medias) if medias else math.nan
+        k = len(self.clases)
+        totales = array('d', bytes(8 * k))
+        for arbol in self.arboles:
+            for h, peso in (arbol.hojasDe(fila) if conFaltantes else ((arbol.hojaDe(fila), 1.0),)):
+                for c, conteo in enumerate(arbol.conteos[h * k:(h + 1) * k]):
+                    totales[c] += conteo * peso
+        return totales
+
+    def votar(self, matriz: list[Sequence[any]], modo: str = 'mayoria', temprana: bool = False) -> AcumuladorVotos:
+        """
+        Hace votar a todos los árboles, de a uno, sobre muchas observaciones y devuelve el acumulador de votos
+        (ver votacion.AcumuladorVotos para los modos y la detención temprana).
+        """
+        if self.regresion:
+            raise ValueError('un bosque de regresión no vota: usar predict_batch')
+        acumulador = AcumuladorVotos(len(matriz), len(self.clases), modo, len(self.arboles), temprana)
+        if matriz:
+            registro = instrumentacion.nuevoRegistro('votar')
+            if registro is not None:
+                t = registro.reloj()
+            columnas, faltantes = self.codificarConFaltantes(matriz)
+            if registro is not None:
+                registro.fase('codificar', t)
+            for arbol in self.arboles:
+                if registro is not None:
+                    t = registro.reloj()
+                acumulador.agregarArbol(arbol, columnas, faltantes)
+                if registro is not None:
+                    registro.fase('arbol', t)
+                if not acumulador.activas:
+                    break
+            if registro is not None:
+                registro.terminar()
+        return acumulador
+
+    def predict_batch(self, matriz: list[Sequence[any]]) -> list[array]:
+        """
+        Clasifica muchas observaciones a la vez. Devuelve, para cada fila, el arreglo con la suma de los conteos
+        de las hojas alcanzadas en todos los árboles, ordenado segun self.clases.
+        En regresión devuelve un único arreglo con el valor predicho para cada fila.
+        """
+        cache = self.cache # se lee una vez: activarCache puede reemplazarlo desde otro hilo
+        if cache is not None:
+            return self._predecirConCache(matriz, cache)
+        if self.regresion:
+            return self.promediar(matriz)
+        return self.votar(matriz, 'conteos').votos()
+
+    def _predecirConCache(self, matriz: list[Sequence[any]], cache: CachePrediccion) -> "list[array] | array":
+        """
+        predict_batch con el cache activado: solo las observaciones que no están en el cache recorren los árboles,
+        en un único lote y una vez por clave aunque se repitan en el lote.
+        """
+        claves = [self.clave(self.codificar(observacion)) for observacion in matriz]
+        resultados = [cache.obtener(clave) for clave in claves]
+        pendientes = {}
+        for i, resultado in enumerate(resultados):
+            if resultado is None:
+                pendientes.setdefault(claves[i], i)
+        if pendientes:
+            submatriz = [matriz[i] for i in pendientes.values()]
+            calculados = self.promediar(submatriz) if self.regresion else self.votar(submatriz, 'conteos').votos()
+            for clave, resultado in zip(pendientes, calculados):
+                cache.guardar(clave, resultado)
+                pendientes[clave] = resultado
+            resultados = [pendientes[clave] if resultado is None else resultado for clave, resultado in zip(claves, resultados)]
+        if self.regresion:
+            return array('d', resultados)
+        return [array('d', votos) for votos in resultados] # copias: los arreglos del cache no se exponen
+
+    def promediar(self, matriz: list[Sequence[any]]) -> array:
+        """
+        Predicción de un bosque de regresión para muchas observaciones: el promedio, para cada fila, de las
+        medias de las hojas alcanzadas en cada árbol.
+        """
+        sumas = array('d', bytes(8 * len(matriz)))
+        if matriz and self.arboles:
+            registro = instrumentacion.nuevoRegistro('promediar')
+            if registro is not None:
+                t = registro.reloj()
+            columnas, faltantes = self.codificarConFaltantes(matriz)
+            if registro is not None:
+                registro.fase('codificar', t)
+            todas = list(range(len(matriz)))
+            for arbol in self.arboles:
+                if registro is not None:
+                    t = registro.reloj()
+                for h, indices, pesos in arbol.hojasLotePonderado(columnas, todas, faltantes):
+                    media = arbol.conteos[2 * h]
+                    if pesos is None:
+                        for i in indices:
+                            sumas[i] += media
+                    else:
+                        for i, peso in zip(indices, pesos):
+                            sumas[i] += media * peso
+                if registro is not None:
+                    registro.fase('arbol', t)
+            n = len(self.arboles)
+            sumas = array('d', (s / n for s in sumas))
+            if registro is not None:
+                registro.terminar()
+        return sumas
+
+    def predict_proba(self, matriz: list[Sequence[any]]) -> list[array]:
+        """
+        Probabilidad de cada clase (ordenadas segun self.clases) por votación suave: el promedio de las
+        distribuciones de clase de las hojas alcanzadas.
+        """
+        return self.votar(matriz, 'suave').probabilidades()
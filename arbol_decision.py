@@ -8,24 +8,188 @@ Cada nodo tiene un dato y puede tener referencias a sus hijos izquierdo y derech
 
 La clase ArbolBinario tiene varios métodos que permiten realizar operaciones en el árbol binario, 
 como insertar nodos, obtener la altura del árbol y recorrer los nodos en diferentes órdenes.
+
+Todos los árboles de la biblioteca comparten un mismo núcleo, NodoBinario: un nodo con __slots__ que apunta
+directamente a sus dos hijos (None si no hay). NodoAB y algoritmo.ArbolDecision son subclases de NodoBinario, así
+que un árbol de decisión se puede recorrer como ArbolBinario (ArbolBinario.de(arbol)) sin convertirlo. Los
+subárboles que devuelven si() y sd() son vistas sobre el hijo del nodo padre, creadas al pedirlas.
+
+NodoBinario permite compartir estructura: conHijos, reemplazar y mapear devuelven un árbol nuevo que copia solo
+los nodos en el camino a los cambios y comparte el resto con el original, que no se modifica. Una copia modificada
+(por ejemplo una poda de prueba) cuesta entonces lo que los nodos que cambian, no una copia completa. Los nodos
+compartidos no se deben modificar en el lugar (insertar_si, insertar_sd, set_raiz): para eso está copy().
+
+Los recorridos son generadores (iter_inorder, iter_preorder, iter_posorder, iter_bfs) con pilas explícitas o una
+deque, sin recursión ni copias de listas, así que sirven para árboles de cualquier profundidad. Cada NodoAB guarda
+el tamaño y la altura de su subárbol, de modo que len() y altura() son O(1); al insertar se actualizan solo los
+nodos del camino desde la raíz hasta el nodo modificado.
 '''
 
-from typing import Any, Optional, TypeVar 
-from collections.abc import Callable
+from typing import Any, Generic, Optional, Sequence, TypeVar 
+from collections import deque
+from collections.abc import Callable, Iterator
 from functools import wraps
 
 T = TypeVar('T')
 
-class NodoAB:
-    def __init__(self, dato: T, si: "Optional[ArbolBinario[T]]" = None, sd: "Optional[ArbolBinario[T]]" = None):
+_CAMPOS: dict[type, tuple[str, ...]] = {}
+
+def _campos(clase: type) -> tuple[str, ...]:
+    """
+    Nombres de los slots de una clase de nodo (los de toda su jerarquía), para copiar nodos de cualquier subclase.
+    """
+    campos = _CAMPOS.get(clase)
+    if campos is None:
+        campos = []
+        for c in reversed(clase.__mro__):
+            slots = c.__dict__.get('__slots__', ())
+            for nombre in (slots,) if isinstance(slots, str) else slots:
+                if nombre not in ('__weakref__', '__dict__'):
+                    campos.append(nombre)
+        campos = _CAMPOS[clase] = tuple(campos)
+    return campos
+
+def _nodo(arbol: "ArbolBinario[T] | NodoBinario | None") -> "Optional[NodoBinario]":
+    return arbol.raiz if isinstance(arbol, ArbolBinario) else arbol
+
+class NodoBinario:
+    __slots__ = ('izquierdo', 'derecho')
+
+    def __init__(self, izquierdo: "Optional[NodoBinario]" = None, derecho: "Optional[NodoBinario]" = None):
+        """
+        Núcleo de los nodos de todos los árboles binarios de la biblioteca (NodoAB, algoritmo.ArbolDecision): las
+        referencias directas a los dos hijos, None si no hay. Las subclases agregan sus campos con __slots__.
+        """
+        self.izquierdo = izquierdo
+        self.derecho = derecho
+
+    def es_hoja(self) -> bool:
+        return self.izquierdo is None and self.derecho is None
+
+    def medidas(self) -> tuple[int, int]:
+        """
+        Devuelve (tamaño, altura) del subárbol recorriéndolo con una pila (NodoAB las guarda y las devuelve en O(1)).
+        """
+        tamano = altura = 0
+        pendientes = [(self, 1)]
+        while pendientes:
+            nodo, nivel = pendientes.pop()
+            tamano += 1
+            altura = max(altura, nivel)
+            for hijo in (nodo.izquierdo, nodo.derecho):
+                if hijo is not None:
+                    pendientes.append((hijo, nivel + 1))
+        return tamano, altura
+
+    def _calcular(self) -> None:
+        """
+        Recalcula lo que el nodo guarda de su subárbol a partir de sus hijos, después de cambiarlos (nada, salvo en
+        NodoAB).
+        """
+
+    def copiaNodo(self) -> "NodoBinario":
+        """
+        Copia superficial del nodo: de la misma clase, con los mismos campos y los mismos hijos.
+        """
+        copia = object.__new__(type(self))
+        for campo in _campos(type(self)):
+            setattr(copia, campo, getattr(self, campo))
+        return copia
+
+    def conHijos(self, izquierdo: "Optional[NodoBinario]", derecho: "Optional[NodoBinario]") -> "NodoBinario":
+        """
+        Devuelve el nodo con esos hijos sin modificarlo: el mismo nodo si ya los tiene y, si no, una copia.
+        """
+        if izquierdo is self.izquierdo and derecho is self.derecho:
+            return self
+        copia = self.copiaNodo()
+        copia.izquierdo, copia.derecho = izquierdo, derecho
+        copia._calcular()
+        return copia
+
+    def reemplazar(self, camino: Sequence[bool], nuevo: "Optional[NodoBinario]") -> "Optional[NodoBinario]":
+        """
+        Devuelve la raíz de un árbol nuevo con el subárbol al que lleva 'camino' (True baja por el hijo izquierdo,
+        False por el derecho; vacío es la raíz) reemplazado por 'nuevo'. Copia solo los nodos del camino.
+
+        Raises:
+            ValueError: Si el camino pasa por un hijo vacío.
+        """
+        recorridos = []
+        nodo = self
+        for izquierda in camino:
+            if nodo is None:
+                raise ValueError('El camino sale del arbol')
+            recorridos.append((nodo, izquierda))
+            nodo = nodo.izquierdo if izquierda else nodo.derecho
+        for nodo, izquierda in reversed(recorridos):
+            nuevo = nodo.conHijos(nuevo, nodo.derecho) if izquierda else nodo.conHijos(nodo.izquierdo, nuevo)
+        return nuevo
+
+    def mapear(self, cambio: "Callable[[NodoBinario], Optional[NodoBinario]]") -> "NodoBinario":
+        """
+        Devuelve la raíz de un árbol nuevo en el que cada subárbol para el que cambio(nodo) no devuelve None queda
+        reemplazado por ese resultado (sin llamar a cambio en sus descendientes). Recorre con una pila y copia solo
+        los nodos en el camino a un reemplazo: los subárboles sin reemplazos se comparten con el original.
+        """
+        resultados = []
+        pendientes = [(self, False)]
+        while pendientes:
+            nodo, listo = pendientes.pop()
+            if listo:
+                derecho = resultados.pop()
+                resultados.append(nodo.conHijos(resultados.pop(), derecho))
+                continue
+            nuevo = None if nodo is None else cambio(nodo)
+            if nuevo is not None or nodo is None or nodo.es_hoja():
+                resultados.append(nodo if nuevo is None else nuevo)
+                continue
+            pendientes.append((nodo, True))
+            pendientes.append((nodo.derecho, False))
+            pendientes.append((nodo.izquierdo, False))
+        return resultados[0]
+
+class NodoAB(NodoBinario, Generic[T]):
+    __slots__ = ('dato', '_tamano', '_altura')
+
+    def __init__(self, dato: T, si: "ArbolBinario[T] | NodoBinario | None" = None, sd: "ArbolBinario[T] | NodoBinario | None" = None):
+        """
+        Nodo de un árbol binario con un dato. si y sd son los subárboles (ArbolBinario) o directamente los nodos
+        hijos. Guarda el tamaño y la altura de su subárbol, calculados al crearlo a partir de los de sus hijos.
+        insertar_si/insertar_sd/set_raiz los actualizan en el nodo modificado y en sus ancestros, subiendo por el
+        camino de vistas si()/sd() desde la raíz (O(profundidad)). Asignar izquierdo o derecho directamente, o
+        modificar un subárbol a través de otro ArbolBinario que no venga de esa raíz, no actualiza los ancestros.
+        """
         self.dato = dato
-        self.si: ArbolBinario[T] = ArbolBinario() if si is None else si
-        self.sd: ArbolBinario[T] = ArbolBinario() if sd is None else sd
+        self.izquierdo = _nodo(si)
+        self.derecho = _nodo(sd)
+        self._calcular()
+
+    @property
+    def si(self) -> "ArbolBinario[T]":
+        return _Subarbol(self, True, None)
+
+    @property
+    def sd(self) -> "ArbolBinario[T]":
+        return _Subarbol(self, False, None)
+
+    def medidas(self) -> tuple[int, int]:
+        return self._tamano, self._altura
+
+    def _calcular(self) -> None:
+        # Los hijos NodoAB tienen sus medidas al día; otros nodos (por ejemplo un ArbolDecision) las calculan
+        tamano, altura = 1, 0
+        for hijo in (self.izquierdo, self.derecho):
+            if hijo is not None:
+                tamanoHijo, alturaHijo = hijo.medidas()
+                tamano += tamanoHijo
+                altura = max(altura, alturaHijo)
+        self._tamano, self._altura = tamano, altura + 1
  
     def __str__(self):
         return str(self.dato)
     
-class ArbolBinario:
+class ArbolBinario(Generic[T]):
     """
     Esta clase representa un árbol binario.
 
@@ -38,10 +202,15 @@ class ArbolBinario:
     Los métodos disponibles en esta clase permiten realizar operaciones como insertar nodos, obtener la altura 
     del árbol, recorrer los nodos en diferentes órdenes, entre otros.
 
+    ArbolBinario() crea un árbol vacío que se puede modificar con set_raiz y ArbolBinario.de(nodo) envuelve en O(1)
+    un árbol existente de cualquier clase de nodo (NodoAB, algoritmo.ArbolDecision). si() y sd() devuelven vistas
+    sobre los hijos: modificarlas modifica el nodo padre.
+
     """
+    __slots__ = ('raiz',)
 
     def __init__(self):
-        self.raiz: Optional[NodoAB[T]] = None
+        self.raiz: Optional[NodoBinario] = None
         
     class _Decoradores:
         @classmethod
@@ -53,6 +222,22 @@ class ArbolBinario:
                 return f(self, *args, **kwargs)
             return wrapper
         
+    @staticmethod
+    def vacio() -> "ArbolBinario[T]":
+        """
+        Devuelve un árbol vacío compartido, que no se puede modificar.
+        """
+        return _VACIO
+
+    @staticmethod
+    def de(nodo: Optional[NodoBinario]) -> "ArbolBinario[T]":
+        """
+        Devuelve un árbol con esa raíz, sin copiar nodos (por ejemplo, para recorrer un algoritmo.ArbolDecision).
+        """
+        t = ArbolBinario()
+        t.raiz = nodo
+        return t
+
     @staticmethod
     def crear_nodo(dato: T, si: "Optional[ArbolBinario[T]]" = None, sd: "Optional[ArbolBinario[T]]" = None) -> "ArbolBinario[T]":
         """
@@ -94,7 +279,7 @@ class ArbolBinario:
 
         """
         assert self.raiz is not None
-        return self.raiz.si
+        return _Subarbol(self.raiz, True, self)
     
     @_Decoradores.valida_es_vacio
     def sd(self) -> "ArbolBinario[T]":
@@ -109,7 +294,7 @@ class ArbolBinario:
 
         """
         assert self.raiz is not None
-        return self.raiz.sd
+        return _Subarbol(self.raiz, False, self)
     
     def es_hoja(self) -> bool:
         """
@@ -119,7 +304,7 @@ class ArbolBinario:
             True si el árbol es una hoja, False de lo contrario.
 
         """
-        return not self.es_vacio() and self.si().es_vacio() and self.sd().es_vacio()
+        return not self.es_vacio() and self.raiz.es_hoja()
 
     @_Decoradores.valida_es_vacio
     def dato(self) -> T:
@@ -149,7 +334,9 @@ class ArbolBinario:
 
         """
         assert self.raiz is not None
-        self.raiz.si = si
+        self.raiz.izquierdo = _nodo(si)
+        self.raiz._calcular()
+        self._propagar()
 
     @_Decoradores.valida_es_vacio
     def insertar_sd(self, sd: "ArbolBinario[T]"):
@@ -164,9 +351,11 @@ class ArbolBinario:
 
         """
         assert self.raiz is not None
-        self.raiz.sd = sd
+        self.raiz.derecho = _nodo(sd)
+        self.raiz._calcular()
+        self._propagar()
 
-    def set_raiz(self, nodo: NodoAB[T]):
+    def set_raiz(self, nodo: Optional[NodoBinario]):
         """
         Establece el nodo especificado como raíz del árbol.
 
@@ -175,32 +364,33 @@ class ArbolBinario:
 
         """
         self.raiz = nodo
+
+    def _propagar(self) -> None:
+        """
+        Actualiza las medidas de los ancestros de la raíz después de modificarla (la raíz de un árbol no tiene:
+        ver _Subarbol).
+        """
         
     def altura(self) -> int:
         """
-        Calcula la altura del árbol.
+        Devuelve la altura del árbol en O(1) con nodos NodoAB, que la guardan al día (ver NodoAB); con otros nodos
+        recorre el árbol.
 
         Returns:
             La altura del árbol.
 
         """
-        if self.es_vacio():
-            return 0
-        else:
-            return 1 + max(self.si().altura(), self.sd().altura())
+        return 0 if self.raiz is None else self.raiz.medidas()[1]
         
     def __len__(self) -> int:
         """
-        Calcula la cantidad de nodos en el árbol.
+        Devuelve la cantidad de nodos en el árbol en O(1) con nodos NodoAB, que guardan el tamaño (ver NodoAB).
 
         Returns:
             La cantidad de nodos en el árbol.
 
         """
-        if self.es_vacio():
-            return 0
-        else:
-            return 1 + len(self.si()) + len(self.sd())
+        return 0 if self.raiz is None else self.raiz.medidas()[0]
     
     def __str__(self):
         """
@@ -210,18 +400,81 @@ class ArbolBinario:
             Una representación en cadena del árbol.
 
         """
-        def mostrar(t: ArbolBinario[T], nivel: int):
-            tab = '.' * 4
-            indent = tab * nivel
-            if t.es_vacio():
-                return indent + 'AV\n'
+        tab = '.' * 4
+        lineas = []
+        pendientes = [(self.raiz, 0)]
+        while pendientes:
+            nodo, nivel = pendientes.pop()
+            if nodo is None:
+                lineas.append(tab * nivel + 'AV\n')
             else:
-                out = indent + str(t.dato()) + '\n'
-                out += mostrar(t.si(), nivel + 1)
-                out += mostrar(t.sd(), nivel + 1)
-                return out
-            
-        return mostrar(self, 0)
+                lineas.append(tab * nivel + str(nodo.dato) + '\n')
+                pendientes.append((nodo.derecho, nivel + 1))
+                pendientes.append((nodo.izquierdo, nivel + 1))
+        return ''.join(lineas)
+
+    def __iter__(self) -> Iterator[T]:
+        return self.iter_inorder()
+
+    def iter_inorder(self) -> Iterator[T]:
+        """
+        Genera los datos de los nodos en recorrido inorder, con una pila explícita (sin recursión).
+        """
+        pila = []
+        nodo = self.raiz
+        while pila or nodo is not None:
+            while nodo is not None:
+                pila.append(nodo)
+                nodo = nodo.izquierdo
+            nodo = pila.pop()
+            yield nodo.dato
+            nodo = nodo.derecho
+
+    def iter_preorder(self) -> Iterator[T]:
+        """
+        Genera los datos de los nodos en recorrido preorder, con una pila explícita.
+        """
+        pila = [] if self.raiz is None else [self.raiz]
+        while pila:
+            nodo = pila.pop()
+            yield nodo.dato
+            if nodo.derecho is not None:
+                pila.append(nodo.derecho)
+            if nodo.izquierdo is not None:
+                pila.append(nodo.izquierdo)
+
+    def iter_posorder(self) -> Iterator[T]:
+        """
+        Genera los datos de los nodos en recorrido posorder, con una pila explícita de (nodo, hijos ya visitados).
+        """
+        pila = [] if self.raiz is None else [(self.raiz, False)]
+        while pila:
+            nodo, visitado = pila.pop()
+            if visitado:
+                yield nodo.dato
+                continue
+            pila.append((nodo, True))
+            if nodo.derecho is not None:
+                pila.append((nodo.derecho, False))
+            if nodo.izquierdo is not None:
+                pila.append((nodo.izquierdo, False))
+
+    def iter_bfs(self) -> Iterator[T]:
+        """
+        Genera los datos de los nodos por niveles (BFS), con una deque como cola.
+        """
+        for nodo, _ in self._iter_niveles():
+            yield nodo.dato
+
+    def _iter_niveles(self) -> Iterator[tuple[NodoBinario, int]]:
+        cola = deque() if self.raiz is None else deque([(self.raiz, 0)])
+        while cola:
+            nodo, nivel = cola.popleft()
+            yield nodo, nivel
+            if nodo.izquierdo is not None:
+                cola.append((nodo.izquierdo, nivel + 1))
+            if nodo.derecho is not None:
+                cola.append((nodo.derecho, nivel + 1))
 
     def inorder(self) -> list[T]:
         """
@@ -231,28 +484,19 @@ class ArbolBinario:
             Una lista con los datos de los nodos en el recorrido inorder.
 
         """
-        if self.es_vacio():
-            return []
-        else:
-            return self.si().inorder() + [self.dato()] + self.sd().inorder()
+        return list(self.iter_inorder())
     
     def inorder_tail(self) -> list[T]:
         """
-        Realiza un recorrido inorder del árbol utilizando una implementación tail recursive.
+        Realiza un recorrido inorder del árbol acumulando en una única lista (igual que inorder).
 
         Returns:
             Una lista con los datos de los nodos en el recorrido inorder.
 
         """
-        def inorder_tail_helper(node: "ArbolBinario[T]", acc: list[T]) -> list[T]:
-            if node.es_vacio():
-                return acc
-            else:
-                acc = inorder_tail_helper(node.si(), acc)
-                acc.append(node.dato())
-                return inorder_tail_helper(node.sd(), acc)
-
-        return inorder_tail_helper(self, [])
+        acc = []
+        acc.extend(self.iter_inorder())
+        return acc
 
     def preorder(self) -> list[T]: 
         """
@@ -262,10 +506,7 @@ class ArbolBinario:
             Una lista con los datos de los nodos en el recorrido preorder.
 
         """
-        if self.es_vacio():
-            return []
-        else:
-            return [self.dato()] + self.si().preorder() + self.sd().preorder()
+        return list(self.iter_preorder())
 
     def posorder(self) -> list[T]: 
         """
@@ -275,10 +516,7 @@ class ArbolBinario:
             Una lista con los datos de los nodos en el recorrido posorder.
 
         """
-        if self.es_vacio():
-            return []
-        else:
-            return self.si().posorder() + self.sd().posorder() + [self.dato()]
+        return list(self.iter_posorder())
 
     def bfs(self) -> list[T]: 
         """
@@ -288,57 +526,30 @@ class ArbolBinario:
             Una lista con los datos de los nodos en el recorrido BFS.
 
         """
-        if self.es_vacio():
-            return []
-
-        queue = [self]
-        result = []
-
-        while queue:
-            node = queue.pop(0)
-            result.append(node.dato())
-
-            if not node.si().es_vacio():
-                queue.append(node.si())
-            if not node.sd().es_vacio():
-                queue.append(node.sd())
-
-        return result
+        return list(self.iter_bfs())
 
     def nivel(self, x: T) -> int: 
-            """
-            Devuelve el nivel en el que se encuentra el nodo con el dato especificado.
-
-            Args:
-                x: El dato del nodo a buscar.
-
-            Returns:
-                El nivel en el que se encuentra el nodo con el dato especificado.
-
-            """
-            if self.es_vacio(): # Si el árbol está vacío
-                return -1 # Devolver -1 porque el dato no se encuentra en el árbol
-
-            queue = [(self, 0)] # Inicializar la cola con el nodo raíz y el nivel 0
-
-            while queue: # Mientras la cola no esté vacía
-                node, level = queue.pop(0) # Obtener el nodo y el nivel actual
+        """
+        Devuelve el nivel en el que se encuentra el nodo con el dato especificado.
 
-                if node.dato() == x: # Si el dato del nodo es igual al dato especificado
-                    return level # Devolver el nivel actual
+        Args:
+            x: El dato del nodo a buscar.
 
-                if not node.si().es_vacio(): # Si el hijo izquierdo no es vacío
-                    queue.append((node.si(), level + 1)) # Agregar el hijo izquierdo a la cola
-                if not node.sd().es_vacio(): # Si el hijo derecho no es vacío
-                    queue.append((node.sd(), level + 1)) # Agregar el hijo derecho a la cola
+        Returns:
+            El nivel en el que se encuentra el nodo con el dato especificado, o -1 si el dato no se
+            encuentra en el árbol (-1 es un valor inválido para el nivel).
 
-            return -1 # El dato no se encuentra en el árbol por lo que se devuelve -1. 
-                      # -1 es un valor inválido para el nivel 
-                      # Usmaos -1 para indicar que el dato no se encuentra en el árbol.
+        """
+        for nodo, nivel in self._iter_niveles():
+            if nodo.dato == x:
+                return nivel
+        return -1
 
-    def copy(self) -> "ArbolBinario[T]": 
+    def copy(self) -> "ArbolBinario[T]":
         """
-        Crea una copia del árbol.
+        Crea una copia del árbol, con nodos nuevos de la misma clase (sin recursión). Es la copia para modificar en el
+        lugar; para una copia con cambios que comparta el resto usar reemplazar, y para fijar el árbol actual sin
+        copiarlo, instantanea.
 
         Returns:
             Una copia del árbol.
@@ -347,18 +558,42 @@ class ArbolBinario:
         if self.es_vacio():  # Si el árbol está vacío
             return ArbolBinario()  # Devolver un árbol binario vacío
 
-        # Crear una nueva instancia de ArbolBinario con la raíz del árbol actual
-        arbol_copia = ArbolBinario(self.raiz.dato)
+        copia = self.raiz.copiaNodo()
+        pendientes = [copia]
+        while pendientes:
+            nodo = pendientes.pop()
+            if nodo.izquierdo is not None:
+                nodo.izquierdo = nodo.izquierdo.copiaNodo()
+                pendientes.append(nodo.izquierdo)
+            if nodo.derecho is not None:
+                nodo.derecho = nodo.derecho.copiaNodo()
+                pendientes.append(nodo.derecho)
+        return ArbolBinario.de(copia)
 
-        # Copiar los subárboles izquierdo y derecho recursivamente
-        arbol_copia.insertar_si(self.si().copy())
-        arbol_copia.insertar_sd(self.sd().copy())
+    def instantanea(self) -> "ArbolBinario[T]":
+        """
+        Devuelve en O(1) otro árbol con la misma raíz. Sigue igual mientras sus nodos no se modifiquen en el lugar:
+        reemplazar y NodoBinario.mapear no los modifican.
+        """
+        return ArbolBinario.de(self.raiz)
 
-        return arbol_copia  # Devolver la copia del árbol
+    def reemplazar(self, camino: Sequence[bool], subarbol: "ArbolBinario[T] | NodoBinario | None") -> "ArbolBinario[T]":
+        """
+        Devuelve un árbol nuevo con el subárbol al que lleva 'camino' reemplazado (ver NodoBinario.reemplazar). El
+        árbol actual no cambia y comparte con el nuevo todos los nodos fuera del camino.
+
+        Raises:
+            ValueError: Si el camino sale del árbol.
+        """
+        if self.es_vacio():
+            if camino:
+                raise ValueError('El camino sale del arbol')
+            return ArbolBinario.de(_nodo(subarbol))
+        return ArbolBinario.de(self.raiz.reemplazar(camino, _nodo(subarbol)))
 
-    def espejo(self) -> "ArbolBinario[T]": 
+    def espejo(self) -> "ArbolBinario[T]":
         """
-        Crea un árbol espejo del árbol actual.
+        Crea un árbol espejo del árbol actual, con nodos nuevos (sin recursión).
 
         Returns:
             Un árbol espejo del árbol actual.
@@ -367,18 +602,19 @@ class ArbolBinario:
         if self.es_vacio():  # Si el árbol está vacío
             return ArbolBinario()  # Devolver un árbol binario vacío
 
-        # Crear una nueva instancia de ArbolBinario con la raíz del árbol actual
-        arbol_espejo = ArbolBinario(self.raiz.dato)
-
-        # Crear el árbol espejo recursivamente intercambiando los subárboles izquierdo y derecho
-        arbol_espejo.insertar_si(self.sd().espejo())
-        arbol_espejo.insertar_sd(self.si().espejo())
+        espejo = self.raiz.copiaNodo()
+        pendientes = [espejo]
+        while pendientes:
+            nodo = pendientes.pop()
+            izquierdo, derecho = nodo.derecho, nodo.izquierdo  # intercambiar los subárboles
+            nodo.izquierdo = None if izquierdo is None else izquierdo.copiaNodo()
+            nodo.derecho = None if derecho is None else derecho.copiaNodo()
+            pendientes.extend(hijo for hijo in (nodo.izquierdo, nodo.derecho) if hijo is not None)
+        return ArbolBinario.de(espejo)
 
-        return arbol_espejo  # Devolver el árbol espejo
-        
-    def sin_hojas(self): 
+    def sin_hojas(self):
         """
-        Elimina todas las hojas del árbol.
+        Elimina todas las hojas del árbol (en el lugar, sin recursión).
 
         """
         if self.es_vacio():  # Si el árbol está vacío
@@ -388,13 +624,64 @@ class ArbolBinario:
             self.set_raiz(None)  # Eliminar la raíz del árbol
             return
 
-        # Eliminar las hojas de los subárboles izquierdo y derecho recursivamente
-        if self.si().es_hoja():
-            self.insertar_si(None)
+        # Eliminar las hojas hijas de cada nodo y seguir por los hijos que no son hojas
+        pendientes = [self.raiz]
+        while pendientes:
+            nodo = pendientes.pop()
+            if nodo.izquierdo is not None:
+                if nodo.izquierdo.es_hoja():
+                    nodo.izquierdo = None
+                else:
+                    pendientes.append(nodo.izquierdo)
+            if nodo.derecho is not None:
+                if nodo.derecho.es_hoja():
+                    nodo.derecho = None
+                else:
+                    pendientes.append(nodo.derecho)
+        # Recalcular las medidas de los nodos que quedan, de abajo hacia arriba, y las de los ancestros
+        for nodo, _ in reversed(list(self._iter_niveles())):
+            nodo._calcular()
+        self._propagar()
+
+class _Subarbol(ArbolBinario):
+    """
+    Un hijo de un nodo visto como árbol (lo que devuelven si() y sd()): su raíz es el hijo del nodo padre, así que
+    set_raiz, insertar_si e insertar_sd modifican el árbol del padre. Recuerda el árbol del que salió ('arriba'),
+    de modo que después de una modificación se actualizan las medidas solo en el camino hasta la raíz.
+    """
+    __slots__ = ('_padre', '_izquierdo', '_arriba')
+
+    def __init__(self, padre: NodoBinario, izquierdo: bool, arriba: Optional[ArbolBinario]):
+        self._padre = padre
+        self._izquierdo = izquierdo
+        self._arriba = arriba
+
+    def _propagar(self) -> None:
+        vista = self
+        while isinstance(vista, _Subarbol):
+            vista._padre._calcular()
+            vista = vista._arriba
+
+    @property
+    def raiz(self) -> Optional[NodoBinario]:
+        return self._padre.izquierdo if self._izquierdo else self._padre.derecho
+
+    @raiz.setter
+    def raiz(self, nodo: Optional[NodoBinario]) -> None:
+        if self._izquierdo:
+            self._padre.izquierdo = nodo
         else:
-            self.si().sin_hojas()
+            self._padre.derecho = nodo
+        self._propagar()
 
-        if self.sd().es_hoja():
-            self.insertar_sd(None)
-        else:
-            self.sd().sin_hojas()
+class _ArbolVacio(ArbolBinario):
+    """
+    El árbol vacío compartido de ArbolBinario.vacio(): como es de todos, no se le puede poner raíz.
+    """
+    __slots__ = ()
+
+    def set_raiz(self, nodo: Optional[NodoBinario]):
+        if nodo is not None:
+            raise TypeError('El arbol vacio compartido no se puede modificar: usar ArbolBinario()')
+
+_VACIO: ArbolBinario = _ArbolVacio()
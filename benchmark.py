@@ -0,0 +1,262 @@
+"""
+Benchmarks de la librería a distintas escalas.
+
+Genera conjuntos de datos sintéticos (cantidad de filas, mezcla de atributos numéricos y categóricos, cardinalidad
+de los categóricos y cantidad de clases) y mide, para cada tamaño, la carga con CargadorCsv.cargarCSV, la
+construcción del árbol, la poda (podarArbol y el módulo poda), la clasificación fila por fila con clasificar, la votación del
+bosque y su predicción de observaciones repetidas con y sin cache. También informa la memoria por nodo de los árboles
+(ArbolDecision, el árbol compilado y arbol_decision.ArbolBinario con la misma forma). Informa tiempo, filas por segundo y pico de memoria (tracemalloc) de cada etapa y guarda los resultados
+en JSON para poder comparar entre commits.
+
+Uso:
+    python benchmark.py --tamanos 1000 10000 100000 --salida bench.json
+    python benchmark.py --tamanos 1000 10000 --comparar bench_anterior.json
+    python benchmark.py --tamanos 10000 --traza traza.json   # reporte por fase y traza de Chrome de un árbol y un bosque
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+import algoritmo
+import clasificacion
+import muestreo
+import poda
+from arbol_compilado import ArbolCompilado
+from arbol_decision import ArbolBinario
+from cargadoraCSV import CargadorCsv
+from conjuntos import Dataset
+from instrumentacion import Instrumentacion
+from random_forest import RandomForest
+from servidor import ClienteLocal, ServidorPrediccion
+
+def generarFilas(n_filas: int, n_numericos: int = 4, n_categoricos: int = 4, cardinalidad: int = 8, n_clases: int = 2, ruido: float = 0.1, semilla: int = 0, faltantes: float = 0.0) -> list[list[any]]:
+    """
+    Genera filas sintéticas cuya última columna es la clase. La clase depende de los primeros atributos
+    (numéricos y categóricos) más un porcentaje de ruido, para que los árboles tengan estructura que aprender.
+    Con 'faltantes' cada atributo falta (None) con esa probabilidad.
+    """
+    rng = random.Random(semilla)
+    categorias = ['c%d' % i for i in range(cardinalidad)]
+    clases = ['clase%d' % i for i in range(n_clases)]
+    filas = []
+    for _ in range(n_filas):
+        numericos = [round(rng.random() * 100, 3) for _ in range(n_numericos)]
+        categoricos = [rng.choice(categorias) for _ in range(n_categoricos)]
+        puntaje = (numericos[0] if numericos else 0) + (categorias.index(categoricos[0]) * 100 / cardinalidad if categoricos else 0)
+        clase = clases[int(puntaje / 200 * n_clases) % n_clases]
+        if rng.random() < ruido:
+            clase = rng.choice(clases)
+        atributos = numericos + categoricos
+        if faltantes:
+            atributos = [None if rng.random() < faltantes else v for v in atributos]
+        filas.append(atributos + [clase])
+    return filas
+
+def escribirCSV(filas: list[list[any]], ruta: str) -> None:
+    """
+    Escribe las filas en un CSV con encabezado.
+    """
+    with open(ruta, 'w') as file:
+        file.write(','.join('a%d' % c for c in range(len(filas[0]) - 1)) + ',clase\n')
+        for fila in filas:
+            file.write(','.join(map(str, fila)) + '\n')
+
+def medir(funcion: Callable[[], any], filas: int, memoria: bool = True) -> tuple[any, dict]:
+    """
+    Ejecuta 'funcion' y devuelve su resultado y {segundos, filas_por_segundo, pico_memoria_bytes}. El pico de
+    memoria se mide en una segunda ejecución bajo tracemalloc para no distorsionar el tiempo.
+    """
+    inicio = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - inicio
+    medicion = {'segundos': segundos, 'filas_por_segundo': filas / segundos if segundos > 0 else None}
+    if memoria:
+        tracemalloc.start()
+        funcion()
+        medicion['pico_memoria_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return resultado, medicion
+
+def _nodos(arbol: algoritmo.ArbolDecision) -> list[algoritmo.ArbolDecision]:
+    nodos, pendientes = [], [arbol]
+    while pendientes:
+        nodo = pendientes.pop()
+        nodos.append(nodo)
+        if nodo.ramaVerdadera is not None:
+            pendientes.append(nodo.ramaFalsa)
+            pendientes.append(nodo.ramaVerdadera)
+    return nodos
+
+def _comoArbolBinario(arbol: algoritmo.ArbolDecision) -> ArbolBinario:
+    """
+    ArbolBinario con la misma forma que el árbol de decisión (el dato de cada nodo es el nodo original).
+    """
+    raiz = ArbolBinario.crear_nodo(arbol)
+    pendientes = [raiz]
+    while pendientes:
+        t = pendientes.pop()
+        nodo = t.dato()
+        if nodo.ramaVerdadera is not None:
+            t.insertar_si(ArbolBinario.crear_nodo(nodo.ramaVerdadera))
+            t.insertar_sd(ArbolBinario.crear_nodo(nodo.ramaFalsa))
+            pendientes += [t.si(), t.sd()]
+    return raiz
+
+def retenida(construir: Callable[[], any]) -> tuple[any, int]:
+    """
+    Construye algo bajo tracemalloc y devuelve el resultado y los bytes que siguen ocupados al terminar.
+    """
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    resultado = construir()
+    despues = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return resultado, despues - antes
+
+def memoriaPorNodo(filas: list[list[any]], profundidad: Optional[int]) -> dict:
+    """
+    Bytes por nodo que ocupa un árbol entrenado con 'filas' como ArbolDecision, como ArbolCompilado y como
+    ArbolBinario de la misma forma (sin contar los datos, que ya existían).
+    """
+    datos = Dataset.desdeFilas(filas)
+    datos.tieneFaltantes(0) # los caches del Dataset no son del árbol
+    arbol, bytesArbol = retenida(lambda: algoritmo.crearArbolDecisionDesde(datos, profundidad))
+    n = len(_nodos(arbol))
+    codigos = [None if cats is None else {v: i for i, v in enumerate(cats)} for cats in datos.categorias]
+    _, bytesCompilado = retenida(lambda: ArbolCompilado.compilar(arbol, datos.clases, codigos))
+    _, bytesBinario = retenida(lambda: _comoArbolBinario(arbol))
+    return {'nodos': n, 'ArbolDecision': bytesArbol / n, 'ArbolCompilado': bytesCompilado / n, 'ArbolBinario': bytesBinario / n}
+
+async def _servirLocal(bosque: RandomForest, observaciones: list[list[any]]) -> list:
+    """
+    Pide todas las observaciones de a una, concurrentemente, al servidor de micro-lotes.
+    """
+    async with ServidorPrediccion(bosque) as servidor:
+        return await ClienteLocal(servidor).predecirMuchas(observaciones)
+
+def correrTamano(n_filas: int, args: argparse.Namespace) -> dict:
+    """
+    Corre todas las etapas para un tamaño de conjunto.
+    """
+    filas = generarFilas(n_filas, args.numericos, args.categoricos, args.cardinalidad, args.clases, semilla=args.semilla, faltantes=args.faltantes)
+    observaciones = [fila[:-1] for fila in filas]
+    etapas = {}
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'datos.csv')
+        escribirCSV(filas, ruta)
+        _, etapas['cargarCSV'] = medir(lambda: CargadorCsv(ruta).cargarCSV(), n_filas, args.memoria)
+
+    arbol, etapas['crearArbolDecisionDesde'] = medir(lambda: algoritmo.crearArbolDecisionDesde(filas, args.profundidad), n_filas, args.memoria)
+    _, etapas['crearArbolDecisionDesde_max_hojas'] = medir(lambda: algoritmo.crearArbolDecisionDesde(filas, args.profundidad, max_hojas=32), n_filas, args.memoria)
+    _, etapas['crearArbolDecisionDesde_gini'] = medir(lambda: algoritmo.crearArbolDecisionDesde(filas, args.profundidad, criterio='gini'), n_filas, args.memoria)
+
+    def podar():
+        copia = algoritmo.crearArbolDecisionDesde(filas, args.profundidad)
+        if copia.resultados is None:
+            algoritmo.podarArbol(copia, 0.01)
+    _, etapas['crear_y_podarArbol'] = medir(podar, n_filas, args.memoria)
+    _, etapas['poda.caminoCostoComplejidad'] = medir(lambda: poda.caminoCostoComplejidad(arbol), n_filas, args.memoria)
+    _, etapas['poda.podarErrorReducido'] = medir(lambda: poda.podarErrorReducido(arbol, filas), n_filas, args.memoria)
+
+    _, etapas['clasificar'] = medir(lambda: [clasificacion.clasificar(o, arbol) for o in observaciones], n_filas, args.memoria)
+
+    bosque = RandomForest(args.arboles, max_profundidad=args.profundidad, semilla=args.semilla)
+    _, etapas['RandomForest.fit'] = medir(lambda: bosque.fit(filas), n_filas, args.memoria)
+    _, etapas['votacion_combinar_predicciones'] = medir(lambda: [muestreo.combinar_predicciones([clasificacion.clasificar(o, a) for a in bosque.arboles]) for o in observaciones], n_filas, args.memoria)
+    _, etapas['RandomForest.predict_batch'] = medir(lambda: bosque.predict_batch(observaciones), n_filas, args.memoria)
+    _, etapas['RandomForest.votar_temprana'] = medir(lambda: bosque.votar(observaciones, 'mayoria', temprana=True), n_filas, args.memoria)
+    _, etapas['servidor.ClienteLocal'] = medir(lambda: asyncio.run(_servirLocal(bosque, observaciones)), n_filas, args.memoria)
+
+    # Observaciones repetidas (cada una 20 veces), con y sin el cache de predicciones
+    repetidas = [observaciones[i % max(1, n_filas // 20)] for i in range(n_filas)]
+    _, etapas['RandomForest.predict_repetidas'] = medir(lambda: [bosque.predict(o) for o in repetidas], n_filas, args.memoria)
+
+    def predecirConCache():
+        bosque.activarCache(max(1, n_filas // 20), 'tinylfu')
+        predicciones = [bosque.predict(o) for o in repetidas]
+        bosque.desactivarCache()
+        return predicciones
+    _, etapas['RandomForest.predict_cache'] = medir(predecirConCache, n_filas, args.memoria)
+
+    return {'filas': n_filas, 'etapas': etapas, 'memoria_por_nodo': memoriaPorNodo(filas, args.profundidad)}
+
+def _commitActual() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar(anterior: dict, actual: dict) -> list[str]:
+    """
+    Compara dos resultados guardados y devuelve una línea por etapa y tamaño con la razón de tiempos (actual/anterior).
+    """
+    lineas = []
+    previos = {r['filas']: r['etapas'] for r in anterior['resultados']}
+    for resultado in actual['resultados']:
+        for etapa, medicion in resultado['etapas'].items():
+            previa = previos.get(resultado['filas'], {}).get(etapa)
+            if previa is None or not previa['segundos']:
+                continue
+            razon = medicion['segundos'] / previa['segundos']
+            marca = '  <-- REGRESION' if razon > 1.2 else ''
+            lineas.append('%8d filas  %-32s %8.3fs -> %8.3fs  x%.2f%s' % (resultado['filas'], etapa, previa['segundos'], medicion['segundos'], razon, marca))
+    return lineas
+
+def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description='Benchmarks de construcción, poda, predicción y carga.')
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--numericos', type=int, default=4)
+    parser.add_argument('--categoricos', type=int, default=4)
+    parser.add_argument('--cardinalidad', type=int, default=8)
+    parser.add_argument('--clases', type=int, default=2)
+    parser.add_argument('--profundidad', type=int, default=8)
+    parser.add_argument('--arboles', type=int, default=10)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--faltantes', type=float, default=0.0, help='probabilidad de que falte cada atributo')
+    parser.add_argument('--sin-memoria', dest='memoria', action='store_false', help='no medir el pico de memoria (la mitad de tiempo)')
+    parser.add_argument('--salida', default='bench.json')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior contra el cual comparar')
+    parser.add_argument('--traza', help='instrumenta un árbol y un bosque del primer tamaño y guarda la traza de Chrome en este archivo')
+    args = parser.parse_args(argv)
+
+    if args.traza:
+        filas = generarFilas(args.tamanos[0], args.numericos, args.categoricos, args.cardinalidad, args.clases, semilla=args.semilla, faltantes=args.faltantes)
+        with Instrumentacion(memoria=args.memoria) as instrumentacion:
+            algoritmo.crearArbolDecisionDesde(filas, args.profundidad)
+            RandomForest(args.arboles, max_profundidad=args.profundidad, semilla=args.semilla).fit(filas).predict_batch([fila[:-1] for fila in filas])
+        print(instrumentacion.reporte())
+        instrumentacion.guardarTraza(args.traza)
+
+    resultados = []
+    for n_filas in args.tamanos:
+        resultado = correrTamano(n_filas, args)
+        resultados.append(resultado)
+        for etapa, medicion in resultado['etapas'].items():
+            memoria = ' pico %8.1f MiB' % (medicion['pico_memoria_bytes'] / 2 ** 20) if 'pico_memoria_bytes' in medicion else ''
+            print('%8d filas  %-32s %8.3fs %12.0f filas/s%s' % (n_filas, etapa, medicion['segundos'], medicion['filas_por_segundo'] or 0, memoria))
+        porNodo = resultado['memoria_por_nodo']
+        print('%8d filas  memoria por nodo (%d nodos): %s' % (n_filas, porNodo['nodos'], ', '.join('%s %.0f B' % (k, v) for k, v in porNodo.items() if k != 'nodos')))
+
+    salida = {'commit': _commitActual(), 'python': sys.version, 'plataforma': platform.platform(),
+              'parametros': {k: v for k, v in vars(args).items() if k not in ('salida', 'comparar')}, 'resultados': resultados}
+    with open(args.salida, 'w') as file:
+        json.dump(salida, file, indent=2)
+
+    if args.comparar:
+        with open(args.comparar) as file:
+            print('\n'.join(comparar(json.load(file), salida)))
+    return salida
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Este módulo define un cache acotado de predicciones para los bosques compilados (ver
+arbol_compilado.BosqueCompilado.activarCache).
+
+Con atributos categóricos de poca cardinalidad (como los de weather.csv) las mismas observaciones se repiten
+constantemente, y cada una recorre todos los árboles del bosque. El cache guarda el resultado por observación
+codificada: dos observaciones que se codifican igual (por ejemplo, con categorías desconocidas distintas en la misma
+posición) comparten la entrada.
+
+Hay dos políticas:
+
+- 'lru': se desaloja la entrada usada hace más tiempo.
+- 'tinylfu': LRU con admisión TinyLFU. Un count-min sketch estima la frecuencia reciente de cada clave (con
+  contadores de 4 bits que se dividen por dos cada 10 * capacidad accesos) y, con el cache lleno, una clave nueva
+  solo entra si es más frecuente que la que desalojaría. Así las observaciones que aparecen una sola vez no
+  desplazan a las que se repiten.
+
+El cache no es seguro entre hilos: el bosque lo usa desde un único hilo a la vez (como servidor.ServidorPrediccion,
+que clasifica un lote por vez).
+"""
+
+from array import array
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+POLITICAS = ('lru', 'tinylfu')
+
+class _Frecuencias:
+    # Multiplicadores para derivar las posiciones de cada fila del sketch a partir de un único hash
+    SEMILLAS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+    MAXIMO = 15
+
+    def __init__(self, capacidad: int):
+        """
+        Clase que estima la frecuencia reciente de las claves con un count-min sketch de 4 filas.
+        """
+        ancho = 1 << max(4, (4 * capacidad - 1).bit_length())
+        self.mascara = ancho - 1
+        self.filas = [array('B', bytes(ancho)) for _ in self.SEMILLAS]
+        self.ventana = 10 * capacidad
+        self.incrementos = 0
+
+    def _posiciones(self, clave: Hashable) -> list[int]:
+        h = hash(clave) & 0xFFFFFFFFFFFFFFFF
+        return [((h * semilla) & 0xFFFFFFFFFFFFFFFF) >> 40 & self.mascara for semilla in self.SEMILLAS]
+
+    def estimar(self, clave: Hashable) -> int:
+        return min(fila[p] for fila, p in zip(self.filas, self._posiciones(clave)))
+
+    def incrementar(self, clave: Hashable) -> None:
+        for fila, p in zip(self.filas, self._posiciones(clave)):
+            if fila[p] < self.MAXIMO:
+                fila[p] += 1
+        self.incrementos += 1
+        if self.incrementos >= self.ventana:
+            self.envejecer()
+
+    def envejecer(self) -> None:
+        """
+        Divide todos los contadores por dos, para que el sketch refleje la frecuencia reciente.
+        """
+        self.filas = [array('B', (c >> 1 for c in fila)) for fila in self.filas]
+        self.incrementos //= 2
+
+class CachePrediccion:
+    def __init__(self, capacidad: int = 1024, politica: str = 'lru'):
+        """
+        Clase que representa un cache de a lo sumo 'capacidad' predicciones, con política 'lru' o 'tinylfu'.
+        """
+        if capacidad < 1:
+            raise ValueError('la capacidad del cache debe ser al menos 1')
+        if politica not in POLITICAS:
+            raise ValueError(f"politica invalida: {politica!r} (se espera una de {list(POLITICAS)})")
+        self.capacidad = capacidad
+        self.politica = politica
+        self.entradas: OrderedDict = OrderedDict()
+        self.frecuencias: Optional[_Frecuencias] = None
+        self.invalidar()
+
+    def invalidar(self) -> None:
+        """
+        Vacía el cache y reinicia las métricas (por ejemplo, al recargar el modelo).
+        """
+        self.entradas.clear()
+        self.frecuencias = _Frecuencias(self.capacidad) if self.politica == 'tinylfu' else None
+        self.aciertos = 0
+        self.fallos = 0
+        self.rechazos = 0
+        self.desalojos = 0
+
+    def obtener(self, clave: Hashable) -> any:
+        """
+        Devuelve el valor guardado para 'clave' y lo marca como usado recientemente, o None si no está.
+        """
+        if self.frecuencias is not None:
+            self.frecuencias.incrementar(clave)
+        valor = self.entradas.get(clave)
+        if valor is None:
+            self.fallos += 1
+            return None
+        self.entradas.move_to_end(clave)
+        self.aciertos += 1
+        return valor
+
+    def guardar(self, clave: Hashable, valor: any) -> None:
+        """
+        Guarda el valor de 'clave'. Con el cache lleno desaloja la entrada usada hace más tiempo; con 'tinylfu',
+        solo si la clave nueva es más frecuente que esa entrada (si no, la clave nueva no se guarda).
+        """
+        entradas = self.entradas
+        if clave in entradas:
+            entradas[clave] = valor
+            entradas.move_to_end(clave)
+            return
+        if len(entradas) >= self.capacidad:
+            victima = next(iter(entradas))
+            if self.frecuencias is not None and self.frecuencias.estimar(clave) <= self.frecuencias.estimar(victima):
+                self.rechazos += 1
+                return
+            del entradas[victima]
+            self.desalojos += 1
+        entradas[clave] = valor
+
+    def __len__(self) -> int:
+        return len(self.entradas)
+
+    def metricas(self) -> dict:
+        """
+        Devuelve las métricas del cache como diccionario serializable en JSON.
+        """
+        consultas = self.aciertos + self.fallos
+        return {'politica': self.politica, 'capacidad': self.capacidad, 'tamano': len(self.entradas),
+                'aciertos': self.aciertos, 'fallos': self.fallos, 'tasa_aciertos': self.aciertos / consultas if consultas else None,
+                'desalojos': self.desalojos, 'rechazos': self.rechazos}
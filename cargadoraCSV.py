@@ -1,25 +1,176 @@
+'''
+Este módulo carga archivos CSV para la librería.
+
+El esquema de columnas (int, float o str) se infiere una sola vez a partir de una muestra de filas; después el
+archivo se lee en bloques de tamaño configurable y cada columna se convierte con su conversor fijo, sin probar
+tipos celda por celda. Cada bloque es columnar: los atributos numéricos se devuelven como arreglos tipados y los
+categóricos como listas. Los valores faltantes se devuelven como None (NaN en las columnas float). Si una columna
+inferida como int tiene un valor float fuera de la muestra, ese bloque de la columna se devuelve como float (y
+Dataset.desdeBloques pasa la columna a float). Las líneas en blanco se saltean.
+
+cargarDataset puede además guardar el Dataset ya parseado en un archivo binario junto al CSV ('<archivo>.cache')
+y, en las cargas siguientes, mapearlo en memoria en lugar de volver a parsear el texto.
+'''
+
 import csv
+import hashlib
+import itertools
+import math
+import os
+from array import array
+from typing import Iterator, Optional
+
+from conjuntos import Dataset
+
+FALTANTES = frozenset({'', '?', 'NA', 'N/A', 'NaN', 'nan', 'null', 'NULL', 'None'})
+EXTENSION_CACHE = '.cache'
+BYTES_HASH = 1 << 20 # se hashean el primer y el último MiB del archivo
+
+def _enBlanco(fila: list[str]) -> bool:
+    return not fila or (len(fila) == 1 and not fila[0].strip())
 
 class CargadorCsv:
-    def __init__(self, archivo):
+    def __init__(self, archivo, tamano_bloque: int = 65536, filas_muestra: int = 1000, faltantes: frozenset = FALTANTES, encabezado: bool = True):
         self.archivo = archivo
+        self.tamano_bloque = tamano_bloque
+        self.filas_muestra = filas_muestra
+        self.faltantes = faltantes
+        self.encabezado = encabezado
+        self.nombres: Optional[list[str]] = None
+        self.esquema: Optional[list[type]] = None
 
-    def cargarCSV(self) -> list[list[any]]:
-        '''Carga un archivo CSV y convierte todos los flotantes y enteros en tipos de datos básicos.'''
-        def convertirTipos(s):
-            s = s.strip()
-            try:
-                return float(s) if '.' in s else int(s)
-            except ValueError:
-                return s    
+    def _lector(self, file):
+        lector = itertools.filterfalse(_enBlanco, csv.reader(file, skipinitialspace=True))
+        nombres = next(lector, None) if self.encabezado else None
+        return lector, nombres
+
+    def inferirEsquema(self) -> list[type]:
+        '''Infiere el tipo (int, float o str) de cada columna a partir de las primeras filas del archivo.'''
+        def tipoDe(valores):
+            presentes = [v.strip() for v in valores if v.strip() not in self.faltantes]
+            if not presentes:
+                return str
+            for tipo in (int, float):
+                try:
+                    for v in presentes:
+                        tipo(v)
+                    return tipo
+                except ValueError:
+                    continue
+            return str
+
+        with open(self.archivo, 'rt', newline='') as file:
+            lector, nombres = self._lector(file)
+            muestra = list(itertools.islice(lector, self.filas_muestra))
+        numColumnas = len(nombres) if nombres else (len(muestra[0]) if muestra else 0)
+        self.nombres = nombres if nombres else ['Columna %d' % c for c in range(numColumnas)]
+        self.esquema = [tipoDe([fila[c] for fila in muestra if c < len(fila)]) for c in range(numColumnas)]
+        return self.esquema
 
+    def _convertir(self, valores: tuple, tipo: type):
+        faltantes = self.faltantes
+        valores = list(map(str.strip, valores)) # como en inferirEsquema: 'NA ' es un faltante
+        if tipo is str:
+            if faltantes.isdisjoint(valores):
+                return valores
+            return [None if v in faltantes else v for v in valores]
+        if faltantes.isdisjoint(valores):
+            return array('q' if tipo is int else 'd', map(tipo, valores))
+        # Con faltantes la columna del bloque pasa a float para poder guardar NaN
+        return array('d', (math.nan if v in faltantes else tipo(v) for v in valores))
+
+    def _convertirColumna(self, valores: tuple, tipo: type, numFila: int, col: int):
+        '''
+        Convierte una columna de un bloque con el conversor fijo de su tipo. Una columna int con un valor float
+        fuera de la muestra se convierte como float en ese bloque.
+        '''
         try:
-            with open(self.archivo, 'rt') as file:
-                lector = csv.reader(file)
-                return [[convertirTipos(item) for item in fila] for fila in lector]
-        except FileNotFoundError:
-            print(f"El archivo '{self.archivo}' no fue encontrado.")
-            return []
-        except Exception as e:
-            print(f"Error al cargar el archivo '{self.archivo}': {e}")
-            return []
+            return self._convertir(valores, tipo)
+        except ValueError as e:
+            if tipo is int:
+                try:
+                    return self._convertir(valores, float)
+                except ValueError:
+                    pass
+            raise ValueError(f"'{self.archivo}': la columna {self.nombres[col]!r} (tipo inferido {tipo.__name__}) tiene un valor invalido en el bloque que empieza en la fila {numFila}: {e}") from None
+
+    def cargarEnBloques(self) -> Iterator[list]:
+        '''
+        Lee el archivo en bloques de a lo sumo 'tamano_bloque' filas (sin el encabezado ni las líneas en blanco).
+        Cada bloque es una lista con una columna por atributo: array('q'), array('d') o lista de str/None según el
+        esquema.
+        '''
+        esquema = self.esquema if self.esquema is not None else self.inferirEsquema()
+        with open(self.archivo, 'rt', newline='') as file:
+            lector, _ = self._lector(file)
+            numFila = 2 if self.encabezado else 1
+            while True:
+                filas = list(itertools.islice(lector, self.tamano_bloque))
+                if not filas:
+                    return
+                largos = set(map(len, filas))
+                if largos != {len(esquema)}:
+                    raise ValueError(f"'{self.archivo}': se esperaban {len(esquema)} columnas y hay filas con {sorted(largos - {len(esquema)})} en el bloque que empieza en la fila {numFila}")
+                yield [self._convertirColumna(valores, tipo, numFila, col) for col, (valores, tipo) in enumerate(zip(zip(*filas), esquema))]
+                numFila += len(filas)
+
+    def cargarCSV(self) -> list[list[any]]:
+        '''Carga un archivo CSV como lista de filas (sin el encabezado), con los tipos del esquema inferido.'''
+        filas = []
+        for bloque in self.cargarEnBloques():
+            columnas = []
+            for columna, tipo in zip(bloque, self.esquema):
+                if tipo is int and isinstance(columna, array) and columna.typecode == 'd':
+                    # bloque con faltantes o pasado a float: los enteros vuelven a int, como en la muestra
+                    columna = [None if math.isnan(v) else int(v) if v.is_integer() else v for v in columna]
+                elif isinstance(columna, array) and columna.typecode == 'd' and any(math.isnan(v) for v in columna):
+                    columna = [None if math.isnan(v) else v for v in columna]
+                columnas.append(columna)
+            filas.extend(map(list, zip(*columnas)))
+        return filas
+
+    def claveCache(self) -> dict:
+        '''
+        Identifica la versión del CSV: tamaño, fecha de modificación y hash (blake2b del tamaño y del primer y último
+        MiB, para no releer archivos enormes en cada carga). También incluye la configuración que cambia el parseo.
+        '''
+        estado = os.stat(self.archivo)
+        resumen = hashlib.blake2b(str(estado.st_size).encode(), digest_size=16)
+        with open(self.archivo, 'rb') as file:
+            resumen.update(file.read(BYTES_HASH))
+            if estado.st_size > 2 * BYTES_HASH:
+                file.seek(-BYTES_HASH, os.SEEK_END)
+            resumen.update(file.read(BYTES_HASH))
+        return {'tamano': estado.st_size, 'mtime_ns': estado.st_mtime_ns, 'hash': resumen.hexdigest(),
+                'filas_muestra': self.filas_muestra, 'faltantes': sorted(self.faltantes), 'encabezado': self.encabezado}
+
+    def cargarDataset(self, usar_cache: bool = False, max_bins: Optional[int] = None, regresion: bool = False) -> Dataset:
+        '''
+        Carga el archivo directamente como Dataset columnar (la última columna es la clase), bloque a bloque.
+        Con usar_cache=True reutiliza '<archivo>.cache' si corresponde a esta versión del CSV (lo mapea en memoria,
+        sin copiar) y si no, parsea el CSV y escribe el cache para la próxima vez.
+        Con max_bins además cuantiza los atributos continuos para el modo discretizado (Dataset.discretizar).
+        Con regresion=True la última columna es el valor numérico a predecir.
+        '''
+        datos = self._cargarDataset(usar_cache, regresion)
+        if max_bins is not None:
+            datos.discretizar(max_bins)
+        return datos
+
+    def _cargarDataset(self, usar_cache: bool, regresion: bool) -> Dataset:
+        if usar_cache:
+            ruta = self.archivo + EXTENSION_CACHE
+            clave = dict(self.claveCache(), regresion=regresion)
+            metadatos = Dataset.leerMetadatos(ruta)
+            if metadatos is not None and metadatos.get('clave') == clave:
+                datos = Dataset.abrir(ruta)
+                self.nombres = metadatos['encabezado']
+                self.esquema = [{'int': int, 'float': float, 'str': str}[t] for t in metadatos['esquema']]
+                return datos
+
+        bloques = self.cargarEnBloques()
+        datos = Dataset.desdeBloques(bloques, self.esquema if self.esquema is not None else self.inferirEsquema(), self.nombres, regresion)
+        if usar_cache:
+            datos.guardar(ruta, {'clave': clave, 'encabezado': self.nombres, 'esquema': [t.__name__ for t in self.esquema]})
+            datos = Dataset.abrir(ruta)
+        return datos
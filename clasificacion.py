@@ -7,12 +7,20 @@ El módulo contiene dos funciones internas, "clasificarSinDatosFaltantes" y "cla
 que clasifican las observaciones según el árbol sin manejar datos faltantes y con manejo de datos faltantes, respectivamente.
 
 La función "clasificarSinDatosFaltantes" clasifica las observaciones según el árbol sin manejar datos faltantes.
-La función "clasificarConDatosFaltantes" clasifica las observaciones según el árbol con manejo de datos faltantes.
+La función "clasificarConDatosFaltantes" clasifica las observaciones según el árbol con manejo de datos faltantes,
+usando las probabilidades de las ramas que "probabilidadesRamas" calcula una sola vez por árbol.
 
 El módulo utiliza la biblioteca "collections" para crear un diccionario con los resultados de la clasificación para cada observación.
+
+La función "clasificar_lote" clasifica muchas observaciones a la vez: en lugar de bajar por el árbol fila por fila,
+parte en cada nodo el conjunto de índices de las filas con una máscara sobre la columna del nodo.
 '''
 
 import collections
+import itertools
+import operator
+import weakref
+from array import array
 
 def clasificar(observaciones: list[list[int]], arbol, datosFaltantes=False) -> dict:
     '''
@@ -20,67 +28,146 @@ def clasificar(observaciones: list[list[int]], arbol, datosFaltantes=False) -> d
     '''
 
     def clasificarSinDatosFaltantes(observaciones: list[list[int]], arbol) -> dict:  
-        '''Clasifica las observaciones según el árbol sin manejar datos faltantes.'''
-        if arbol.resultados is not None:  # hoja
-            return arbol.resultados
-        else:
+        '''Clasifica las observaciones según el árbol sin manejar datos faltantes (con un ciclo, sin límite de profundidad).'''
+        while arbol.resultados is None:
             v = observaciones[arbol.col]
-            rama = None
             if isinstance(v, int) or isinstance(v, float):
                 if v >= arbol.valor:
-                    rama = arbol.ramaVerdadera
+                    arbol = arbol.ramaVerdadera
                 else:
-                    rama = arbol.ramaFalsa
+                    arbol = arbol.ramaFalsa
             else:
                 if v == arbol.valor:
-                    rama = arbol.ramaVerdadera
+                    arbol = arbol.ramaVerdadera
                 else:
-                    rama = arbol.ramaFalsa
-        return clasificarSinDatosFaltantes(observaciones, rama)
+                    arbol = arbol.ramaFalsa
+        return arbol.resultados
 
     def clasificarConDatosFaltantes(observaciones: list[list[int]], arbol) -> dict: # Funcionalidad C4.5 - Clasificar con datos faltantes
         '''Clasifica las observaciones según el árbol con manejo de datos faltantes.
         
-         Si el valor de la obser. es 'None', calculamos las probabilidades de las ramas VERDADERA y FALSA basadas 
-         en las frecuencias obsers. en los nodos actuales. Luego, multiplicamos los resultados de clasificacion en cada 
-         rama por estas probabilidades y los sumo para obtener el resultado final de clasificación para la obser.
+         Si el valor de la obser. es 'None', la obser. sigue por las dos ramas: a cada una le llega su peso actual
+         multiplicado por la probabilidad de la rama (la proporción de filas de entrenamiento que fueron por ella,
+         precalculada una vez por árbol con probabilidadesRamas). El resultado es la suma de los conteos de cada
+         hoja alcanzada multiplicados por el peso con el que llega la obser.
          
          Si el valor de la observación no es 'None', clasificamos normalmente segun el valor de la obser.
 
         '''
-        if arbol.resultados is not None:  
-            return arbol.resultados
-        else:
-            v = observaciones[arbol.col]
-            if v is None: # Si el valor es None (o sea, dato faltante), se propaga la clasificacion por ambas ramas
-                ramaVerdadera = clasificarConDatosFaltantes(observaciones, arbol.ramaVerdadera) # Clasificar con datos faltantes por la rama verdadera
-                ramaFalsa = clasificarConDatosFaltantes(observaciones, arbol.ramaFalsa) # Clasificar con datos faltantes por la rama falsa
-                cuentaVerdadera = sum(ramaVerdadera.values()) # sumo los valores de la rama verdadera
-                cuentaFalsa = sum(ramaFalsa.values()) # sumo los valores de la rama falsa
-                pVerdadera = float(cuentaVerdadera) / (cuentaVerdadera + cuentaFalsa) # calculo la probabilidad de la rama verdadera
-                pFalsa = float(cuentaFalsa) / (cuentaVerdadera + cuentaFalsa) # calculo la probabilidad de la rama falsa
-                resultado = collections.defaultdict(int)   # Creo un diccionario con valores por defecto 0 para almacenar los resultados de la clasificación, esto sirve para que si no existe una clave en el diccionario, se cree con valor 0
-                for k, v in ramaVerdadera.items(): # Recorro los elementos de la rama verdadera
-                    resultado[k] += v * pVerdadera # voy multiplicando el valor de la rama verdadera por la probabilidad de la rama verdadera y esto lo agrego al resultado
-                for k, v in ramaFalsa.items(): # recorro los elementos de la rama falsa
-                    resultado[k] += v * pFalsa # voy multiplicando el valor de la rama falsa por la probabilidad de la rama falsa y esto lo agrego al resultado
-                return dict(resultado) # y por ultimo devuelvo el resultado como un diccionario
-            else: # Si el valor no es None, se clasifica normalmente 
-                rama = None # inicializo la rama en None
-                if isinstance(v, int) or isinstance(v, float): # si el valor es un nro entero o flotante 
-                    if v >= arbol.valor: # si el valor es mayor o igual al valor del arbol
-                        rama = arbol.ramaVerdadera # la rama es la rama Verdadera
-                    else: # si no
-                        rama = arbol.ramaFalsa # la rama es la rama Falsa
-                else: # si el valor no es un nro entero o flotante
-                    if v == arbol.valor: # si el valor es igual al valor del arbol
-                        rama = arbol.ramaVerdadera  # la rama es la rama Verdadera
-                    else: # si no
-                        rama = arbol.ramaFalsa  # la rama es la rama Falsa
-            return clasificarConDatosFaltantes(observaciones, rama) # luego, devuelvo la clasificacion con datos modo faltantes
-            # todo esto se hizo para manejar los datos FALTANTES en las observaciones y clasificarlas segun el arbol de decision 
+        probabilidades = probabilidadesRamas(arbol)
+        resultado = collections.defaultdict(float)
+        pendientes = [(arbol, 1.0)]
+        while pendientes:
+            nodo, peso = pendientes.pop()
+            if nodo.resultados is not None: # hoja: se suman sus conteos ponderados
+                if peso == 1.0: # la obser. llegó entera a una sola hoja
+                    return nodo.resultados
+                for k, v in nodo.resultados.items():
+                    resultado[k] += v * peso
+                continue
+            v = observaciones[nodo.col]
+            if v is None: # dato faltante: se propaga por ambas ramas
+                pVerdadera = probabilidades[id(nodo)]
+                if pVerdadera < 1.0:
+                    pendientes.append((nodo.ramaFalsa, peso * (1.0 - pVerdadera)))
+                if pVerdadera > 0.0:
+                    pendientes.append((nodo.ramaVerdadera, peso * pVerdadera))
+            elif isinstance(v, int) or isinstance(v, float):
+                pendientes.append((nodo.ramaVerdadera if v >= nodo.valor else nodo.ramaFalsa, peso))
+            else:
+                pendientes.append((nodo.ramaVerdadera if v == nodo.valor else nodo.ramaFalsa, peso))
+        return dict(resultado)
 
     if datosFaltantes:  # Si se deben manejar datos faltantes
         return clasificarConDatosFaltantes(observaciones, arbol) # clasificamos con datos faltantes
     else:  # Si no se deben manejar datos faltantes
-        return clasificarSinDatosFaltantes(observaciones, arbol) # clasificamos sin datos faltantes
\ No newline at end of file
+        return clasificarSinDatosFaltantes(observaciones, arbol) # clasificamos sin datos faltantes
+
+
+# Probabilidades de las ramas de cada árbol, calculadas una vez (se descartan junto con el árbol)
+_probabilidades = weakref.WeakKeyDictionary()
+
+def probabilidadesRamas(arbol) -> dict:
+    '''
+    Devuelve {id(nodo): probabilidad de la rama verdadera} para los nodos internos del árbol: la proporción del peso
+    de entrenamiento (suma de los conteos de las hojas) que fue por la rama verdadera. Se calcula en una sola
+    pasada de abajo hacia arriba y queda guardada para las siguientes clasificaciones con el mismo árbol.
+    '''
+    probabilidades = _probabilidades.get(arbol)
+    if probabilidades is not None:
+        return probabilidades
+    probabilidades, totales = {}, {}
+    pendientes = [(arbol, False)]
+    while pendientes:
+        nodo, visitado = pendientes.pop()
+        if nodo.resultados is not None or nodo.ramaVerdadera is None:
+            totales[nodo] = sum((nodo.resultados or {}).values())
+        elif visitado:
+            verdadera, falsa = totales.pop(nodo.ramaVerdadera), totales.pop(nodo.ramaFalsa)
+            totales[nodo] = verdadera + falsa
+            probabilidades[id(nodo)] = verdadera / (verdadera + falsa) if verdadera + falsa else 0.5
+        else:
+            pendientes.append((nodo, True))
+            pendientes.append((nodo.ramaFalsa, False))
+            pendientes.append((nodo.ramaVerdadera, False))
+    _probabilidades[arbol] = probabilidades
+    return probabilidades
+
+def hojasLote(columnas: list, arbol, indices: list[int]):
+    '''
+    Recorre el árbol con todas las filas a la vez: en cada nodo una máscara booleana sobre la columna del nodo
+    parte el conjunto de índices en los de la rama verdadera y los de la rama falsa.
+    Genera pares (hoja, índices de las filas que llegan a esa hoja). 'columnas' es la matriz transpuesta.
+    '''
+    pendientes = [(arbol, indices)]
+    while pendientes:
+        nodo, indices = pendientes.pop()
+        if nodo.resultados is not None: # hoja
+            yield nodo, indices
+            continue
+        valores = operator.itemgetter(*indices)(columnas[nodo.col]) if len(indices) > 1 else (columnas[nodo.col][indices[0]],)
+        if isinstance(nodo.valor, int) or isinstance(nodo.valor, float):
+            try:
+                mascara = list(map(operator.le, itertools.repeat(nodo.valor), valores)) # x >= valor
+            except TypeError: # columna mezclada: se decide fila por fila igual que clasificar()
+                mascara = [(v >= nodo.valor) if (isinstance(v, int) or isinstance(v, float)) else (v == nodo.valor) for v in valores]
+        else:
+            mascara = list(map(operator.eq, itertools.repeat(nodo.valor), valores)) # x == valor
+        falsos = list(itertools.compress(indices, map(operator.not_, mascara)))
+        if falsos:
+            pendientes.append((nodo.ramaFalsa, falsos))
+        if len(falsos) < len(indices):
+            pendientes.append((nodo.ramaVerdadera, list(itertools.compress(indices, mascara))))
+
+
+def clasesDelArbol(arbol) -> list:
+    '''Devuelve las clases que aparecen en las hojas del árbol, en orden de aparición.'''
+    clases = {}
+    pendientes = [arbol]
+    while pendientes:
+        nodo = pendientes.pop()
+        if nodo.resultados is not None:
+            clases.update(dict.fromkeys(nodo.resultados))
+        else:
+            pendientes.append(nodo.ramaFalsa)
+            pendientes.append(nodo.ramaVerdadera)
+    return list(clases)
+
+
+def clasificar_lote(matriz: list[list[any]], arbol, clases: list = None) -> list[tuple]:
+    '''
+    Clasifica muchas observaciones a la vez (sin manejar datos faltantes).
+    Devuelve, para cada fila de la matriz, la tupla de conteos de la hoja alcanzada ordenada según 'clases'
+    (por defecto, las clases del árbol en orden de aparición). Las filas que llegan a la misma hoja comparten la tupla.
+    '''
+    if clases is None:
+        clases = clasesDelArbol(arbol)
+    salida = [None] * len(matriz)
+    if not matriz:
+        return salida
+    columnas = list(zip(*matriz))
+    for hoja, indices in hojasLote(columnas, arbol, list(range(len(matriz)))):
+        conteos = tuple(hoja.resultados.get(clase, 0) for clase in clases)
+        for i in indices:
+            salida[i] = conteos
+    return salida
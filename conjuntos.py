@@ -0,0 +1,412 @@
+"""
+Este módulo define la clase Dataset, la representación columnar de un conjunto de datos de entrenamiento.
+
+Cada atributo se guarda en un arreglo tipado (módulo array de la biblioteca estándar): los atributos continuos
+como enteros o flotantes y los categóricos codificados por diccionario a enteros chicos. La clase objetivo
+(última columna de las filas) también se guarda codificada como un vector de enteros, salvo en regresión, donde
+es un vector de flotantes y no hay lista de clases.
+
+La construcción de árboles trabaja con arreglos de índices sobre esta estructura en lugar de copiar listas de
+filas, por lo que la memoria de entrenamiento queda acotada por el tamaño de las columnas.
+
+Los valores faltantes (None, o NaN en las columnas float) se marcan una sola vez, al construir el Dataset: en los
+atributos continuos se guardan como NaN y en los categóricos con el código FALTANTE. El entrenamiento los reparte
+entre las ramas con pesos fraccionarios (C4.5) y Dataset.imputar() permite, en cambio, reemplazarlos por la media
+o la moda de cada columna.
+"""
+
+import json
+import math
+import mmap
+import operator
+import os
+import struct
+from array import array
+from bisect import bisect_right
+from functools import partial
+from typing import Optional, Sequence
+
+ALINEACION = 8
+MAGIA_BINARIO = b'RFDATOS\0'
+VERSION_BINARIO = 1
+FALTANTE = -1 # código de un valor faltante en un atributo categórico
+
+def esNumerico(valor: any) -> bool:
+    """
+    Indica si un valor se trata como atributo continuo (umbral) y no como categoria (igualdad).
+    """
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool)
+
+def esFaltante(valor: any) -> bool:
+    """
+    Indica si un valor de una fila es un faltante: None o NaN.
+    """
+    return valor is None or (isinstance(valor, float) and valor != valor)
+
+def tipoCodigos(cantidad: int) -> str:
+    """
+    Devuelve el typecode de array mas chico que alcanza para guardar 'cantidad' codigos distintos.
+    """
+    if cantidad < 2 ** 7:
+        return 'b'
+    if cantidad < 2 ** 15:
+        return 'h'
+    return 'i'
+
+def arregloIndices(n: int) -> array:
+    """
+    Crea el arreglo de índices 0..n-1 con el typecode mas chico que los representa.
+    """
+    return array('i' if n < 2 ** 31 else 'q', range(n))
+
+def codificarCategorica(valores: Sequence[any]) -> tuple[array, list[any]]:
+    """
+    Codifica una columna categorica por diccionario: devuelve los codigos y la lista codigo -> valor
+    (en orden de primera aparicion). Los faltantes (None) reciben el código FALTANTE.
+    """
+    codigos = {None: FALTANTE}
+    for valor in valores:
+        if valor not in codigos:
+            codigos[valor] = len(codigos) - 1
+    del codigos[None]
+    return array(tipoCodigos(len(codigos)), [codigos.get(valor, FALTANTE) for valor in valores]), list(codigos)
+
+def _codificarCon(codigos: dict, valores: Sequence[any]) -> list[int]:
+    """
+    Codifica valores con un diccionario valor -> codigo que se va completando (usado al cargar por bloques).
+    Los faltantes (None) reciben el código FALTANTE.
+    """
+    for valor in valores:
+        if valor not in codigos and valor is not None:
+            codigos[valor] = len(codigos)
+    return [FALTANTE if valor is None else codigos[valor] for valor in valores]
+
+class Dataset:
+    def __init__(self, columnas: list[Sequence], categorias: list[Optional[list[any]]], objetivo: Sequence[int], clases: list[any], nombres: Optional[list[str]] = None):
+        """
+        Clase que representa un conjunto de datos en formato columnar.
+
+        columnas[c] es el arreglo tipado del atributo c; categorias[c] es la lista codigo -> valor si el atributo
+        es categorico o None si es continuo. objetivo guarda el codigo de clase de cada fila y clases la lista
+        codigo -> clase. En regresión clases es None y objetivo guarda el valor (float) de cada fila.
+        """
+        self.columnas = columnas
+        self.categorias = categorias
+        self.objetivo = objetivo
+        self.clases = clases
+        self.nombres = nombres if nombres is not None else ['Columna %d' % c for c in range(len(columnas))]
+        self._codigos = [None if cats is None else {v: i for i, v in enumerate(cats)} for cats in categorias]
+        self.archivo: Optional[str] = None  # archivo binario mapeado en memoria del que salen las columnas, si lo hay
+        self.max_bins: Optional[int] = None
+        self.bins: list[Optional[array]] = []  # por atributo continuo, el bin de cada fila (ver discretizar)
+        self.bordes: list[Optional[list[float]]] = []
+        self._conFaltantes: Optional[list[bool]] = None
+        self.imputacion: Optional[list[any]] = None  # valores usados por imputar(), si se imputó
+
+    @property
+    def regresion(self) -> bool:
+        return self.clases is None
+
+    @classmethod
+    def desdeFilas(cls, filas: list[list[any]], nombres: Optional[list[str]] = None, regresion: bool = False) -> "Dataset":
+        """
+        Construye el Dataset a partir de una lista de filas cuya ultima columna es la clase (o, con regresion=True,
+        el valor numérico a predecir).
+        Un atributo es continuo si todos sus valores presentes son numericos; si no, se codifica como categorico.
+        Los faltantes (None o NaN) quedan marcados como NaN o FALTANTE.
+        """
+        columnas, categorias = [], []
+        numColumnas = len(filas[0]) - 1 if filas else 0
+        for col in range(numColumnas):
+            valores = [fila[col] for fila in filas]
+            if all(esNumerico(v) or v is None for v in valores):
+                if None in valores:
+                    columnas.append(array('d', (math.nan if v is None else v for v in valores)))
+                else:
+                    columnas.append(array('q' if all(isinstance(v, int) for v in valores) else 'd', valores))
+                categorias.append(None)
+            else:
+                codigos, cats = codificarCategorica([None if esFaltante(v) else v for v in valores])
+                columnas.append(codigos)
+                categorias.append(cats)
+        if regresion:
+            return cls(columnas, categorias, array('d', (float(fila[-1]) for fila in filas)), None, nombres)
+        objetivo, clases = codificarCategorica([fila[-1] for fila in filas])
+        return cls(columnas, categorias, objetivo, clases, nombres)
+
+    @classmethod
+    def desdeBloques(cls, bloques, esquema: list[type], nombres: Optional[list[str]] = None, regresion: bool = False) -> "Dataset":
+        """
+        Construye el Dataset a partir de bloques columnares (ver cargadoraCSV.CargadorCsv.cargarEnBloques) sin pasar
+        por filas: cada bloque se agrega a las columnas y se descarta. La ultima columna es la clase (o el valor a
+        predecir, con regresion=True).
+        Los atributos int/float son continuos y los str se codifican por diccionario.
+        """
+        numColumnas = len(esquema) - 1
+        columnas = [array('q' if tipo is int else 'd') if tipo is not str else array('i') for tipo in esquema[:-1]]
+        codigos = [None if tipo is not str else {} for tipo in esquema[:-1]]
+        objetivo, codigosClase = array('d' if regresion else 'i'), {}
+        for bloque in bloques:
+            for col in range(numColumnas):
+                valores = bloque[col]
+                if codigos[col] is None:
+                    if valores.typecode != columnas[col].typecode:
+                        # un bloque con faltantes (NaN) o con valores float pasa la columna int a float una sola
+                        # vez; después solo se convierten los bloques int que llegan
+                        if columnas[col].typecode == 'q':
+                            columnas[col] = array('d', columnas[col])
+                        if valores.typecode != 'd':
+                            valores = array('d', valores)
+                    columnas[col].extend(valores)
+                else:
+                    columnas[col].extend(_codificarCon(codigos[col], valores))
+            if regresion:
+                objetivo.extend(map(float, bloque[-1]))
+            else:
+                objetivo.extend(_codificarCon(codigosClase, bloque[-1]))
+
+        categorias = [None if cods is None else list(cods) for cods in codigos]
+        # Los codigos de categoria se achican al typecode mas chico que alcanza
+        columnas = [col if cods is None else array(tipoCodigos(len(cods)), col) for col, cods in zip(columnas, codigos)]
+        if regresion:
+            return cls(columnas, categorias, objetivo, None, nombres[:numColumnas] if nombres else None)
+        return cls(columnas, categorias, array(tipoCodigos(len(codigosClase)), objetivo), list(codigosClase), nombres[:numColumnas] if nombres else None)
+
+    def __len__(self) -> int:
+        return len(self.objetivo)
+
+    @property
+    def n_columnas(self) -> int:
+        return len(self.columnas)
+
+    def esNumerica(self, col: int) -> bool:
+        """
+        Indica si el atributo 'col' es continuo.
+        """
+        return self.categorias[col] is None
+
+    def codificar(self, col: int, valor: any) -> any:
+        """
+        Traduce un valor original del atributo 'col' a su codigo (-1 si la categoria no se vio en el entrenamiento).
+        """
+        if self.categorias[col] is None:
+            return math.nan if valor is None else valor
+        return self._codigos[col].get(valor, -1)
+
+    def decodificar(self, col: int, valor: any) -> any:
+        """
+        Traduce un codigo del atributo 'col' al valor original (None para los faltantes).
+        """
+        if self.categorias[col] is None:
+            return None if valor != valor else valor
+        return None if valor < 0 else self.categorias[col][valor]
+
+    def tieneFaltantes(self, col: int) -> bool:
+        """
+        Indica si el atributo 'col' tiene algún valor faltante. Se calcula una vez por columna.
+        """
+        if self._conFaltantes is None:
+            self._conFaltantes = [None] * self.n_columnas
+        if self._conFaltantes[col] is None:
+            columna = self.columnas[col]
+            if self.categorias[col] is not None:
+                self._conFaltantes[col] = any(map(FALTANTE.__eq__, columna))
+            else:
+                tipo = columna.typecode if isinstance(columna, array) else columna.format
+                self._conFaltantes[col] = tipo in 'fd' and any(map(math.isnan, columna))
+        return self._conFaltantes[col]
+
+    def conocidas(self, col: int, indices: Sequence[int]) -> list[int]:
+        """
+        Devuelve los índices de las filas cuyo atributo 'col' no falta.
+        """
+        columna = self.columnas[col]
+        if self.categorias[col] is not None:
+            return [i for i in indices if columna[i] != FALTANTE]
+        return [i for i in indices if columna[i] == columna[i]]
+
+    def esFaltante(self, col: int, valor: any) -> bool:
+        """
+        Indica si un valor codificado del atributo 'col' es un faltante.
+        """
+        return valor == FALTANTE if self.categorias[col] is not None else valor != valor
+
+    def imputar(self) -> "Dataset":
+        """
+        Devuelve un Dataset donde cada faltante se reemplaza por la media (atributos continuos) o la moda
+        (categóricos) de su columna. Los valores usados quedan en 'imputacion' (por atributo, None si la columna
+        no tenía faltantes) para imputar igual las observaciones a predecir. Solo se copian las columnas con faltantes.
+        """
+        columnas, imputacion = [], []
+        for col, columna in enumerate(self.columnas):
+            if not self.tieneFaltantes(col):
+                columnas.append(columna)
+                imputacion.append(None)
+                continue
+            conocidos = [v for v in columna if not self.esFaltante(col, v)]
+            if self.categorias[col] is None:
+                valor = sum(conocidos) / len(conocidos) if conocidos else 0.0
+                columnas.append(array('d', (valor if v != v else v for v in columna)))
+            else:
+                frecuencias = {}
+                for v in conocidos:
+                    frecuencias[v] = frecuencias.get(v, 0) + 1
+                valor = max(frecuencias, key=frecuencias.get) if frecuencias else 0
+                columnas.append(array(tipoCodigos(max(len(self.categorias[col]), 1)), (valor if v == FALTANTE else v for v in columna)))
+            imputacion.append(self.decodificar(col, valor))
+        datos = Dataset(columnas, self.categorias, self.objetivo, self.clases, self.nombres)
+        datos.imputacion = imputacion
+        return datos
+
+    def discretizar(self, max_bins: int, tamano_muestra: int = 100000) -> None:
+        """
+        Cuantiza cada atributo continuo en a lo sumo max_bins bins. Los bordes salen de los cuantiles de una muestra
+        equiespaciada de la columna (de a lo sumo tamano_muestra valores), asi que se calculan una sola vez y en
+        tiempo lineal. Si la columna tiene a lo sumo max_bins valores distintos cada valor tiene su propio bin.
+
+        El bin de x es bisect_right(bordes, x), de modo que 'x >= bordes[b - 1]' equivale a 'bin(x) >= b' y los
+        umbrales elegidos sobre bins son pruebas validas sobre los valores originales. Los faltantes (NaN) van a un bin
+        extra, len(bordes) + 1, que los barridos no recorren (ver algoritmo.histogramasBins).
+        """
+        if self.max_bins == max_bins:
+            return
+        self.bins, self.bordes = [], []
+        for col, columna in enumerate(self.columnas):
+            if not self.esNumerica(col):
+                self.bins.append(None)
+                self.bordes.append(None)
+                continue
+            muestra = sorted(v for v in columna[::max(1, len(columna) // tamano_muestra)] if v == v)
+            distintos = sorted(set(muestra))
+            if len(distintos) <= max_bins:
+                bordes = distintos[1:]
+            else:
+                bordes = sorted(set(muestra[(j * len(muestra)) // max_bins] for j in range(1, max_bins)))
+            if any(v != v for v in columna):
+                bins = [bisect_right(bordes, v) if v == v else len(bordes) + 1 for v in columna]
+            else:
+                bins = map(partial(bisect_right, bordes), columna)
+            self.bins.append(array(tipoCodigos(len(bordes) + 2), bins))
+            self.bordes.append(bordes)
+        self.max_bins = max_bins
+
+    def conteos(self, indices: Sequence[int], pesos: Optional[Sequence[int]] = None) -> dict:
+        """
+        Equivalente a conteosUnicos para las filas indicadas: {clase: ocurrencias} en orden de primera aparicion.
+        Con 'pesos' (multiplicidad de cada fila) cada fila cuenta tantas veces como su peso.
+        En regresión devuelve {media: cantidad de filas}, que es lo que guarda una hoja de un árbol de regresión.
+        """
+        codigos = {}
+        objetivo = self.objetivo
+        if self.regresion:
+            pesosFilas = [1] * len(indices) if pesos is None else [pesos[i] for i in indices]
+            total = sum(pesosFilas)
+            return {sum(map(operator.mul, map(objetivo.__getitem__, indices), pesosFilas)) / total: total} if total else {}
+        if pesos is None:
+            for i in indices:
+                c = objetivo[i]
+                codigos[c] = codigos.get(c, 0) + 1
+        else:
+            for i in indices:
+                c = objetivo[i]
+                codigos[c] = codigos.get(c, 0) + pesos[i]
+        return {self.clases[c]: n for c, n in codigos.items()}
+
+    def filas(self, indices: Optional[Sequence[int]] = None) -> list[list[any]]:
+        """
+        Reconstruye las filas originales (atributos y clase) de los índices dados, o de todo el conjunto.
+        """
+        if indices is None:
+            indices = range(len(self))
+        return [[self.decodificar(col, self.columnas[col][i]) for col in range(self.n_columnas)] + [self.objetivo[i] if self.regresion else self.clases[self.objetivo[i]]] for i in indices]
+
+    def disposicion(self) -> tuple[list[tuple[str, int, int]], int]:
+        """
+        Calcula como ubicar las columnas y el objetivo, uno detras de otro y alineados, en un bloque de memoria
+        plano. Devuelve la lista de (typecode, desplazamiento, largo) y el tamaño total en bytes.
+        """
+        arreglos = list(self.columnas) + [self.objetivo]
+        ubicaciones, desplazamiento = [], 0
+        for arreglo in arreglos:
+            tipo = arreglo.typecode if isinstance(arreglo, array) else arreglo.format
+            ubicaciones.append((tipo, desplazamiento, len(arreglo)))
+            desplazamiento += -(-len(arreglo) * arreglo.itemsize // ALINEACION) * ALINEACION
+        return ubicaciones, desplazamiento
+
+    def volcar(self, buffer, ubicaciones: list[tuple[str, int, int]]) -> None:
+        """
+        Copia las columnas y el objetivo dentro de 'buffer' segun la disposicion calculada.
+        """
+        destino = memoryview(buffer).cast('B')
+        for arreglo, (_, desplazamiento, _) in zip(list(self.columnas) + [self.objetivo], ubicaciones):
+            origen = memoryview(arreglo).cast('B')
+            destino[desplazamiento:desplazamiento + len(origen)] = origen
+
+    @classmethod
+    def desdeBuffer(cls, buffer, ubicaciones: list[tuple[str, int, int]], categorias: list[Optional[list[any]]], clases: list[any], nombres: Optional[list[str]] = None) -> "Dataset":
+        """
+        Construye un Dataset cuyas columnas son vistas (sin copia) sobre 'buffer', por ejemplo memoria compartida
+        entre procesos o un archivo mapeado en memoria.
+        """
+        bytes_ = memoryview(buffer).cast('B')
+        vistas = []
+        for tipo, desplazamiento, largo in ubicaciones:
+            tamano = array(tipo).itemsize
+            vistas.append(bytes_[desplazamiento:desplazamiento + largo * tamano].cast(tipo))
+        return cls(vistas[:-1], categorias, vistas[-1], clases, nombres)
+
+    def guardar(self, ruta: str, metadatos: Optional[dict] = None) -> None:
+        """
+        Guarda el Dataset en formato binario columnar: una cabecera fija (magia, version, largo de la cabecera JSON),
+        la cabecera JSON con las categorias, las clases, la disposicion de las columnas y 'metadatos', y despues los
+        arreglos crudos alineados a 8 bytes. Escribe en un archivo temporal y lo renombra al terminar.
+        """
+        ubicaciones, _ = self.disposicion()
+        cabecera = json.dumps({'nombres': self.nombres, 'categorias': self.categorias, 'clases': self.clases,
+                               'ubicaciones': ubicaciones, 'metadatos': metadatos or {}}).encode('utf-8')
+        inicio = -(-(16 + len(cabecera)) // ALINEACION) * ALINEACION
+        temporal = ruta + '.tmp'
+        with open(temporal, 'wb') as file:
+            file.write(MAGIA_BINARIO + struct.pack('<II', VERSION_BINARIO, len(cabecera)) + cabecera)
+            file.write(bytes(inicio - 16 - len(cabecera)))
+            for arreglo, (_, desplazamiento, _) in zip(list(self.columnas) + [self.objetivo], ubicaciones):
+                file.seek(inicio + desplazamiento)
+                file.write(memoryview(arreglo).cast('B'))
+        os.replace(temporal, ruta)
+
+    @staticmethod
+    def leerMetadatos(ruta: str) -> Optional[dict]:
+        """
+        Lee solo los metadatos de un archivo escrito con guardar(); None si no es un archivo de Dataset valido.
+        """
+        try:
+            with open(ruta, 'rb') as file:
+                fijo = file.read(16)
+                if len(fijo) < 16 or fijo[:8] != MAGIA_BINARIO:
+                    return None
+                version, largo = struct.unpack('<II', fijo[8:])
+                if version != VERSION_BINARIO:
+                    return None
+                return json.loads(file.read(largo))['metadatos']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def abrir(cls, ruta: str) -> "Dataset":
+        """
+        Abre un archivo escrito con guardar() mapeandolo en memoria: las columnas son vistas de solo lectura sobre
+        el archivo, sin copia, y varios procesos que abran el mismo archivo comparten las paginas en cache.
+        """
+        with open(ruta, 'rb') as file:
+            mapa = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapa[:8] != MAGIA_BINARIO:
+            raise ValueError(f"'{ruta}' no es un archivo binario de Dataset")
+        version, largo = struct.unpack('<II', mapa[8:16])
+        if version != VERSION_BINARIO:
+            raise ValueError(f"'{ruta}': version {version} no soportada")
+        cabecera = json.loads(mapa[16:16 + largo])
+        inicio = -(-(16 + largo) // ALINEACION) * ALINEACION
+        ubicaciones = [tuple(u) for u in cabecera['ubicaciones']]
+        datos = cls.desdeBuffer(memoryview(mapa)[inicio:], ubicaciones, cabecera['categorias'], cabecera['clases'], cabecera['nombres'])
+        datos.archivo = ruta
+        return datos
@@ -3,6 +3,10 @@ Este modulo contiene funciones y clases relacionadas con la construcción y poda
 """
 
 from clasificacion import clasificar
+import algoritmo
+import entropia_ganancia
+from conjuntos import esNumerico
+import poda
 
 def dividirConjunto(filas, columna, valor): 
     """
@@ -81,23 +85,8 @@ def ganancia_informacion(atributo, datos_entrenamiento):
 
     return entropia_total - entropia_atributo
 
-class ArbolDecision:
-    def __init__(self, col = -1, valor = None, ramaVerdadera = None, ramaFalsa = None, resultados = None):
-        """
-        Clase que representa un árbol de decisión.
-
-        Args:
-            col (int): Índice de la columna utilizada para dividir el árbol.
-            valor: Valor de la columna utilizado para dividir el árbol.
-            ramaVerdadera (ArbolDecision): Rama verdadera del árbol.
-            ramaFalsa (ArbolDecision): Rama falsa del árbol.
-            resultados (dict): Diccionario con los resultados de las hojas del árbol.
-        """
-        self.col = col
-        self.valor = valor
-        self.ramaVerdadera = ramaVerdadera
-        self.ramaFalsa = ramaFalsa
-        self.resultados = resultados  # None para nodos, no None para hojas
+# El mismo árbol de decisión que construye algoritmo (sobre el nodo binario de arbol_decision)
+ArbolDecision = algoritmo.ArbolDecision
 
 def crearArbolDecisionDesde(filas, funcionEvaluacion = entropia):
     """
@@ -105,16 +94,25 @@ def crearArbolDecisionDesde(filas, funcionEvaluacion = entropia):
 
     Args:
         filas (list): Lista de filas de datos de entrenamiento.
-        funcionEvaluacion (function): Función de evaluación utilizada para calcular la ganancia de información.
+        funcionEvaluacion (function | str | entropia_ganancia.Criterio): Función de evaluación utilizada para calcular
+            la ganancia de información. Con el nombre de un criterio ('entropia', 'gini', 'ratio') o un Criterio,
+            el árbol se construye con algoritmo.crearArbolDecisionDesde, que evalúa los cortes sobre conteos.
 
     Returns:
         ArbolDecision: Árbol de decisión creado.
     """
+    if isinstance(funcionEvaluacion, (str, entropia_ganancia.Criterio)):
+        return algoritmo.crearArbolDecisionDesde(filas, criterio=funcionEvaluacion)
 
-    filas = imputacionValoresFaltantes(filas) # Manejamos valores faltantes antes de construir el arbol de desicion
+    if len(filas) == 0: return ArbolDecision()
+    filas = imputacionValoresFaltantes(filas) # Manejamos valores faltantes una sola vez, antes de construir el arbol de desicion
   #  filas = manejoAtributosContinuos(filas) 
-    ordenarValoresUnicos(filas)  # Ordenamos valores unicos (para atributos continuos #C4.5)
+    return _crearArbol(filas, funcionEvaluacion)
 
+def _crearArbol(filas, funcionEvaluacion):
+    """
+    Construye recursivamente el árbol de crearArbolDecisionDesde, con los faltantes ya imputados.
+    """
     if len(filas) == 0: return ArbolDecision()
     puntuacionActual = funcionEvaluacion(filas)
 
@@ -139,15 +137,26 @@ def crearArbolDecisionDesde(filas, funcionEvaluacion = entropia):
                 mejoressets = (set1, set2)
 
     if mejorGanancia > 0:
-        ramaVerdadera = crearArbolDecisionDesde(mejoressets[0])
-        ramaFalsa = crearArbolDecisionDesde(mejoressets[1])
+        ramaVerdadera = _crearArbol(mejoressets[0], funcionEvaluacion)
+        ramaFalsa = _crearArbol(mejoressets[1], funcionEvaluacion)
         return ArbolDecision(col=mejorAtributo[0], valor=mejorAtributo[1], ramaVerdadera=ramaVerdadera, ramaFalsa=ramaFalsa)
     else:
        # print(filas)
         return ArbolDecision(resultados=conteosUnicos(filas))
 
-def podarArbol(arbol):
- pass # IMPLEMENTAR la poda del árbol de acuerdo a lo requerido por el TPF. !!!!!!!!!!!!!
+def podarArbol(arbol, alfa=0.0):
+    """
+    Poda el árbol por costo-complejidad (ver poda.podarCostoComplejidad).
+
+    Args:
+        arbol (ArbolDecision): Árbol de decisión a podar.
+        alfa (float): Costo por hoja, en proporción de filas de entrenamiento.
+
+    Returns:
+        ArbolDecision: Árbol podado, que comparte con el original los subárboles sin podar; el original no se
+            modifica.
+    """
+    return poda.podarCostoComplejidad(arbol, alfa)
 
 
 ###### NUEVAS FUNCIONES ######
@@ -228,7 +237,8 @@ def manejoAtributosContinuos(filas):
 
 def imputacionValoresFaltantes(filas): # decidimos usar la media de la columna para reemplazar los valores faltantes (o sea, imputar los valores faltantes con el valor que resulta de calcular la media de la columna)
     """
-    Imputa valores faltantes en el conjunto de datos.
+    Imputa valores faltantes en el conjunto de datos (ver algoritmo.imputacionValoresFaltantes). No modifica las
+    filas recibidas: las filas con valores imputados se reemplazan por copias.
 
     Args:
         filas (list): Lista de filas de datos de entrenamiento.
@@ -236,17 +246,7 @@ def imputacionValoresFaltantes(filas): # decidimos usar la media de la columna p
     Returns:
         list: Lista de filas de datos de entrenamiento con valores faltantes imputados.
     """
-    columnas = len(filas[0])
-    for i in range(columnas):
-        # Encontramos la media de la columna actual
-        valores = [fila[i] for fila in filas if fila[i] is not None and fila[i].isdigit()]
-        if valores:
-            media_columna = sum(map(int, valores)) / len(valores)
-            # Y rellenamos los valores faltantes con la media de la columna
-            for j in range(len(filas)):
-                if filas[j][i] is None:
-                    filas[j][i] = media_columna
-    return filas
+    return algoritmo.imputacionValoresFaltantes(filas)
 
 
 # Criterio de division (Gain Ratio):
@@ -277,16 +277,10 @@ def calcularSplitInfo(atributo, datos_entrenamiento):
     Returns:
         float: Valor del Split Information.
     """    
-
-    from math import log2
-
-    valores_atributo = set(fila[atributo] for fila in datos_entrenamiento)
-    total_filas = len(datos_entrenamiento)
-    split_info = 0
-    for valor in valores_atributo:
-        p = sum(1 for fila in datos_entrenamiento if fila[atributo] == valor) / total_filas
-        split_info -= p * log2(p) if p > 0 else 0 
-    return split_info
+    tamanos = {}
+    for fila in datos_entrenamiento:
+        tamanos[fila[atributo]] = tamanos.get(fila[atributo], 0) + 1
+    return entropia_ganancia.informacionDivision(tamanos.values())
 
 # Costos asimétricos y datos ponderados:
 # IMPLEMENTAR estas funcionalidades según lo requerido por el TPF.
@@ -0,0 +1,206 @@
+"""
+Este módulo define los criterios de división de los árboles de clasificación, calculados a partir de vectores de
+conteos por clase (sin recorrer filas).
+
+Cada criterio (Entropia, Gini, RatioGanancia) sabe calcular la impureza de un vector de conteos y la ganancia de
+una división binaria, y crear un Barrido: el estado de un barrido sobre una columna ordenada, que empieza con todas
+las filas del lado derecho y pasa las filas de a una al lado izquierdo. Cada movimiento actualiza el estado en
+O(1), y la ganancia del corte actual también se obtiene en O(1), sin recalcular los conteos:
+
+- Entropia (Shannon, la de ID3/C4.5): se mantiene la suma de c*log2(c) de cada lado.
+- Gini: se mantiene la suma de los cuadrados de los conteos de cada lado, sin llamar a log2.
+- RatioGanancia (C4.5): la ganancia de información dividida por la información de la división (calcularSplitInfo).
+
+criterio(nombre) devuelve el criterio por nombre: 'entropia', 'gini' o 'ratio'.
+"""
+
+from abc import ABC, abstractmethod
+from math import log2
+from typing import Sequence
+
+TOLERANCIA = 1e-12 # ganancias menores se consideran nulas (errores de redondeo de las sumas acumuladas)
+
+def _xlog2x(x: float) -> float:
+    return x * log2(x) if x > 0 else 0.0
+
+def entropiaConteos(conteos: Sequence[float], total: float) -> float:
+    """
+    Entropía de Shannon de un vector de conteos por clase.
+    """
+    ent = 0.0
+    for r in conteos:
+        if r > 0:
+            p = r / total
+            ent -= p * log2(p)
+    return ent
+
+def giniConteos(conteos: Sequence[float], total: float) -> float:
+    """
+    Impureza de Gini de un vector de conteos por clase.
+    """
+    if not total:
+        return 0.0
+    return 1.0 - sum(c * c for c in conteos) / (total * total)
+
+def informacionDivision(tamanos: Sequence[float]) -> float:
+    """
+    Información de la división (split info de C4.5): la entropía de los tamaños de las ramas.
+    """
+    return entropiaConteos(tamanos, sum(tamanos))
+
+class Criterio(ABC):
+    """
+    Interfaz de los criterios de división. Las subclases definen impureza() y barrido(); una subclase que no los
+    define no se puede instanciar.
+    """
+    nombre = ''
+
+    @abstractmethod
+    def impureza(self, conteos: Sequence[float], total: float) -> float:
+        """
+        Impureza de un vector de conteos por clase con 'total' filas.
+        """
+
+    def ganancia(self, puntuacionActual: float, conteos1: Sequence[float], n1: float, conteos2: Sequence[float], n2: float) -> float:
+        """
+        Ganancia de una división binaria dada por los conteos de clase de cada lado; puntuacionActual es la
+        impureza del nodo.
+        """
+        p = float(n1) / (n1 + n2)
+        return puntuacionActual - p * self.impureza(conteos1, n1) - (1 - p) * self.impureza(conteos2, n2)
+
+    @abstractmethod
+    def barrido(self, totales: Sequence[float]) -> "Barrido":
+        """
+        Crea el Barrido del criterio, con todas las filas ('totales' por clase) del lado derecho.
+        """
+
+    def __repr__(self) -> str:
+        return self.nombre
+
+class Barrido(ABC):
+    """
+    Estado de un barrido: conteos por clase de cada lado del corte (índice = código de clase). Las subclases
+    definen ganancia().
+    """
+    def __init__(self, totales: Sequence[float]):
+        self.izquierda = [0] * len(totales)
+        self.derecha = list(totales)
+        self.nIzquierda = 0
+        self.nDerecha = sum(totales)
+
+    def mover(self, clase: int, peso: float = 1) -> None:
+        """
+        Pasa 'peso' filas de la clase indicada del lado derecho al izquierdo.
+        """
+        self.izquierda[clase] += peso
+        self.derecha[clase] -= peso
+        self.nIzquierda += peso
+        self.nDerecha -= peso
+
+    @abstractmethod
+    def ganancia(self) -> float:
+        """
+        Ganancia del corte actual.
+        """
+
+class _BarridoEntropia(Barrido):
+    def __init__(self, totales: Sequence[float]):
+        super().__init__(totales)
+        self.xlogIzquierda = 0.0
+        self.xlogDerecha = sum(map(_xlog2x, totales))
+        total = self.nDerecha
+        self.padre = (_xlog2x(total) - self.xlogDerecha) / total if total else 0.0
+
+    def mover(self, clase: int, peso: float = 1) -> None:
+        izquierda, derecha = self.izquierda[clase], self.derecha[clase]
+        self.xlogIzquierda += _xlog2x(izquierda + peso) - _xlog2x(izquierda)
+        self.xlogDerecha += _xlog2x(derecha - peso) - _xlog2x(derecha)
+        self.izquierda[clase] = izquierda + peso
+        self.derecha[clase] = derecha - peso
+        self.nIzquierda += peso
+        self.nDerecha -= peso
+
+    def entropiaHijos(self) -> float:
+        # n * H(lado) = n log2 n - sum(c log2 c)
+        return (_xlog2x(self.nIzquierda) - self.xlogIzquierda + _xlog2x(self.nDerecha) - self.xlogDerecha) / (self.nIzquierda + self.nDerecha)
+
+    def ganancia(self) -> float:
+        ganancia = self.padre - self.entropiaHijos()
+        return ganancia if ganancia > TOLERANCIA else 0.0
+
+class _BarridoGini(Barrido):
+    def __init__(self, totales: Sequence[float]):
+        super().__init__(totales)
+        self.cuadradosIzquierda = 0
+        self.cuadradosDerecha = sum(c * c for c in totales)
+        total = self.nDerecha
+        self.padre = 1.0 - self.cuadradosDerecha / (total * total) if total else 0.0
+
+    def mover(self, clase: int, peso: float = 1) -> None:
+        izquierda, derecha = self.izquierda[clase], self.derecha[clase]
+        # (c + w)^2 - c^2 = w (2c + w)
+        self.cuadradosIzquierda += peso * (2 * izquierda + peso)
+        self.cuadradosDerecha -= peso * (2 * derecha - peso)
+        self.izquierda[clase] = izquierda + peso
+        self.derecha[clase] = derecha - peso
+        self.nIzquierda += peso
+        self.nDerecha -= peso
+
+    def ganancia(self) -> float:
+        n1, n2 = self.nIzquierda, self.nDerecha
+        # n1/n * (1 - S1/n1^2) + n2/n * (1 - S2/n2^2) = 1 - (S1/n1 + S2/n2) / n
+        ganancia = self.padre - 1.0 + (self.cuadradosIzquierda / n1 + self.cuadradosDerecha / n2) / (n1 + n2)
+        return ganancia if ganancia > TOLERANCIA else 0.0
+
+class _BarridoRatio(_BarridoEntropia):
+    def ganancia(self) -> float:
+        ganancia = _BarridoEntropia.ganancia(self)
+        informacion = informacionDivision((self.nIzquierda, self.nDerecha))
+        return ganancia / informacion if ganancia and informacion else 0.0
+
+class Entropia(Criterio):
+    nombre = 'entropia'
+
+    def impureza(self, conteos: Sequence[float], total: float) -> float:
+        return entropiaConteos(conteos, total)
+
+    def barrido(self, totales: Sequence[float]) -> Barrido:
+        return _BarridoEntropia(totales)
+
+class Gini(Criterio):
+    nombre = 'gini'
+
+    def impureza(self, conteos: Sequence[float], total: float) -> float:
+        return giniConteos(conteos, total)
+
+    def barrido(self, totales: Sequence[float]) -> Barrido:
+        return _BarridoGini(totales)
+
+class RatioGanancia(Entropia):
+    """
+    Gain ratio de C4.5: la impureza es la entropía y la ganancia se divide por la información de la división.
+    """
+    nombre = 'ratio'
+
+    def ganancia(self, puntuacionActual: float, conteos1: Sequence[float], n1: float, conteos2: Sequence[float], n2: float) -> float:
+        ganancia = Entropia.ganancia(self, puntuacionActual, conteos1, n1, conteos2, n2)
+        informacion = informacionDivision((n1, n2))
+        return ganancia / informacion if informacion != 0 else 0
+
+    def barrido(self, totales: Sequence[float]) -> Barrido:
+        return _BarridoRatio(totales)
+
+ENTROPIA = Entropia()
+CRITERIOS = {c.nombre: c for c in (ENTROPIA, Gini(), RatioGanancia())}
+
+def criterio(nombre: "str | Criterio") -> Criterio:
+    """
+    Devuelve el criterio con ese nombre ('entropia', 'gini' o 'ratio'); si recibe un Criterio lo devuelve tal cual.
+    """
+    if isinstance(nombre, Criterio):
+        return nombre
+    try:
+        return CRITERIOS[nombre]
+    except KeyError:
+        raise ValueError(f"criterio invalido: {nombre!r} (se espera uno de {sorted(CRITERIOS)})") from None
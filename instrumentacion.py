@@ -0,0 +1,194 @@
+"""
+Este módulo define la instrumentación opcional del entrenamiento y la predicción.
+
+Mientras una Instrumentacion está activa (dentro de un bloque with), cada árbol que construye
+algoritmo.crearArbolDecisionDesde y cada lote que clasifica arbol_compilado.BosqueCompilado registran:
+
+- el tiempo de cada fase (preparación del Dataset, búsqueda de la división por tipo de barrido, partición de los
+  índices, división de las filas con faltantes, histogramas; en la predicción, la codificación y cada árbol),
+- la cantidad de divisiones candidatas evaluadas,
+- los nodos creados en cada profundidad y las filas de cada nodo,
+- el pico de memoria (tracemalloc), si se pide con memoria=True.
+
+Desactivada no cuesta nada: el código instrumentado consulta activa() una vez por árbol o por lote y, si devuelve
+None, solo compara con None en cada nodo.
+
+reporte() devuelve un resumen por árbol en texto y guardarTraza() escribe los eventos en el formato de trazas de
+Chrome (abrir con chrome://tracing o https://ui.perfetto.dev). Solo se instrumenta el proceso actual: con
+RandomForest.fit(n_jobs > 1) los árboles se construyen en otros procesos y no se registran.
+
+Uso:
+    with Instrumentacion(memoria=True) as inst:
+        bosque = RandomForest(10).fit(filas)
+        bosque.predict_batch(observaciones)
+    print(inst.reporte())
+    inst.guardarTraza('traza.json')
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from array import array
+from typing import Optional
+
+_activa: Optional["Instrumentacion"] = None
+
+def activa() -> Optional["Instrumentacion"]:
+    """
+    Devuelve la instrumentación activa, o None si está desactivada.
+    """
+    return _activa
+
+def nuevoRegistro(nombre: str) -> Optional["Registro"]:
+    """
+    Empieza un registro (un árbol, un lote) en la instrumentación activa; None si está desactivada.
+    """
+    return None if _activa is None else _activa.registro(nombre)
+
+class Registro:
+    reloj = staticmethod(time.perf_counter)
+
+    def __init__(self, instrumentacion: "Instrumentacion", nombre: str, numero: int):
+        """
+        Clase que acumula las mediciones de un árbol construido o de un lote clasificado.
+        """
+        self.instrumentacion = instrumentacion
+        self.nombre = nombre
+        self.numero = numero
+        self.fases: dict[str, list] = {}  # fase -> [segundos, llamadas]
+        self.candidatos = 0
+        self.nodosPorProfundidad: dict[int, int] = {}
+        self.filasPorNodo = array('q')
+        self.picoMemoria: Optional[int] = None
+        self.segundos: Optional[float] = None
+        if instrumentacion.memoria:
+            tracemalloc.reset_peak()
+        self.inicio = self.reloj()
+
+    def fase(self, nombre: str, inicio: float) -> None:
+        """
+        Registra una fase que empezó en 'inicio' (un valor de reloj()) y termina ahora.
+        """
+        fin = self.reloj()
+        acumulado = self.fases.get(nombre)
+        if acumulado is None:
+            acumulado = self.fases[nombre] = [0.0, 0]
+        acumulado[0] += fin - inicio
+        acumulado[1] += 1
+        self.instrumentacion.evento(nombre, self, inicio, fin)
+
+    def nodo(self, profundidad: int, filas: int) -> None:
+        self.nodosPorProfundidad[profundidad] = self.nodosPorProfundidad.get(profundidad, 0) + 1
+        self.filasPorNodo.append(filas)
+
+    def terminar(self) -> None:
+        fin = self.reloj()
+        self.segundos = fin - self.inicio
+        if self.instrumentacion.memoria:
+            self.picoMemoria = tracemalloc.get_traced_memory()[1]
+        self.instrumentacion.evento(self.nombre, self, self.inicio, fin, {'candidatos': self.candidatos, 'nodos': len(self.filasPorNodo)})
+
+    def resumen(self) -> dict:
+        """
+        Devuelve las mediciones como diccionario serializable en JSON.
+        """
+        filas = self.filasPorNodo
+        return {'nombre': self.nombre, 'numero': self.numero, 'segundos': self.segundos,
+                'fases': {fase: {'segundos': s, 'llamadas': n} for fase, (s, n) in self.fases.items()},
+                'candidatos': self.candidatos, 'nodos_por_profundidad': dict(sorted(self.nodosPorProfundidad.items())),
+                'filas_por_nodo': {'min': min(filas), 'media': sum(filas) / len(filas), 'max': max(filas)} if filas else None,
+                'pico_memoria_bytes': self.picoMemoria}
+
+class Instrumentacion:
+    def __init__(self, memoria: bool = False, max_eventos: int = 200000):
+        """
+        Clase que activa la instrumentación dentro de un bloque with. Con memoria=True mide el pico de memoria de
+        cada registro con tracemalloc (que hace todo más lento). Se guardan a lo sumo max_eventos eventos de la
+        traza; los demás solo se cuentan.
+        """
+        self.memoria = memoria
+        self.max_eventos = max_eventos
+        self.registros: list[Registro] = []
+        self.eventos: list[dict] = []
+        self.omitidos = 0
+        self.origen = time.perf_counter()
+        self._anterior: Optional[Instrumentacion] = None
+        self._iniciada = False
+
+    def __enter__(self) -> "Instrumentacion":
+        global _activa
+        self._anterior, _activa = _activa, self
+        if self.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._iniciada = True
+        return self
+
+    def __exit__(self, *excepcion) -> None:
+        global _activa
+        _activa = self._anterior
+        if self._iniciada:
+            tracemalloc.stop()
+            self._iniciada = False
+
+    def registro(self, nombre: str) -> Registro:
+        registro = Registro(self, nombre, len(self.registros))
+        self.registros.append(registro)
+        return registro
+
+    def evento(self, nombre: str, registro: Registro, inicio: float, fin: float, argumentos: Optional[dict] = None) -> None:
+        """
+        Agrega un evento completo ("X") a la traza, en la fila (tid) de su registro.
+        """
+        if len(self.eventos) >= self.max_eventos:
+            self.omitidos += 1
+            return
+        evento = {'name': nombre, 'cat': registro.nombre, 'ph': 'X', 'pid': os.getpid(), 'tid': registro.numero,
+                  'ts': (inicio - self.origen) * 1e6, 'dur': (fin - inicio) * 1e6}
+        if argumentos:
+            evento['args'] = argumentos
+        self.eventos.append(evento)
+
+    def traza(self) -> dict:
+        """
+        Devuelve la traza en el formato de eventos de Chrome, con un nombre por fila (un registro por fila).
+        """
+        nombres = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': r.numero, 'args': {'name': '%s %d' % (r.nombre, r.numero)}}
+                   for r in self.registros]
+        return {'traceEvents': nombres + self.eventos, 'displayTimeUnit': 'ms', 'otherData': {'eventos_omitidos': self.omitidos}}
+
+    def guardarTraza(self, ruta: str) -> None:
+        with open(ruta, 'w') as file:
+            json.dump(self.traza(), file)
+
+    def resumen(self) -> list[dict]:
+        return [registro.resumen() for registro in self.registros]
+
+    def reporte(self) -> str:
+        """
+        Devuelve un reporte en texto con una sección por registro: tiempo total, nodos por profundidad, filas por
+        nodo, candidatos, pico de memoria y el tiempo de cada fase (con su porcentaje del total), más el tiempo que
+        no corresponde a ninguna fase (pureza de los nodos, conteos de las hojas, filas con faltantes).
+        """
+        lineas = []
+        for registro in self.registros:
+            r = registro.resumen()
+            total = r['segundos']
+            lineas.append('%s %d: %s' % (r['nombre'], r['numero'], 'sin terminar' if total is None else '%.4fs' % total))
+            if r['nodos_por_profundidad']:
+                lineas.append('  nodos por profundidad: ' + ' '.join('%d:%d' % par for par in r['nodos_por_profundidad'].items()))
+            if r['filas_por_nodo']:
+                lineas.append('  filas por nodo: min %(min)d, media %(media).1f, max %(max)d' % r['filas_por_nodo'])
+            if r['candidatos']:
+                lineas.append('  divisiones candidatas: %d' % r['candidatos'])
+            if r['pico_memoria_bytes'] is not None:
+                lineas.append('  pico de memoria: %.1f KiB' % (r['pico_memoria_bytes'] / 1024))
+            for fase, medicion in sorted(r['fases'].items(), key=lambda par: -par[1]['segundos']):
+                porcentaje = ' (%4.1f%%)' % (100 * medicion['segundos'] / total) if total else ''
+                lineas.append('  %-20s %8.4fs%s %8d llamadas' % (fase, medicion['segundos'], porcentaje, medicion['llamadas']))
+            if total and r['fases']:
+                resto = total - sum(medicion['segundos'] for medicion in r['fases'].values())
+                lineas.append('  %-20s %8.4fs (%4.1f%%)' % ('(sin fase)', resto, 100 * resto / total))
+        if self.omitidos:
+            lineas.append('(%d eventos de la traza omitidos por max_eventos)' % self.omitidos)
+        return '\n'.join(lineas)
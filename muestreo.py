@@ -2,30 +2,84 @@
 # para generar muestras aleatorias con repetición (o sea, un mismo elemento 
 # puede ser seleccionado más de una vez)
 
+import itertools
+import math
+import operator
 import random 
+from array import array
 
-def bootstrapping(datos_entrenamiento: list[list[any]] , tamano_muestra: any) -> list[any]: # datos_entrenamiento es una lista
-    muestra = [] 
-    for _ in range(tamano_muestra): 
-        muestra.append(random.choice(datos_entrenamiento)) # Seleccionar un elemento aleatorio de datos_entrenamiento y agregarlo a muestra
-    return muestra # Devuelvo la muestra bootstrap
+from votacion import MODOS, votoHoja
 
+def bootstrapping(datos_entrenamiento: list[list[any]] , tamano_muestra: any, rng: random.Random = None) -> list[any]: # datos_entrenamiento es una lista
+    generador = random if rng is None else rng # rng permite usar un generador con semilla propia (reproducible)
+    # La muestra son referencias a las filas elegidas: las filas no se copian (y no hay que modificarlas)
+    return [datos_entrenamiento[i] for i in bootstrap_indices(len(datos_entrenamiento), tamano_muestra, generador)] # Devuelvo la muestra bootstrap
 
-def seleccion_aleatoria_caracteristicas(atributos:any, cantidad_seleccion:any) ->list[any]:
-    atributos_seleccionados = random.sample(atributos, cantidad_seleccion)
+
+def bootstrap_indices(n_filas: int, tamano_muestra: int, rng: random.Random) -> array:
+    # Igual que bootstrapping pero devuelve los indices de las filas elegidas (con repeticion) en lugar de las filas
+    return array('i' if n_filas < 2 ** 31 else 'q', rng.choices(range(n_filas), k=tamano_muestra))
+
+
+def bootstrap_multiplicidades(n_filas: int, tamano_muestra: int, rng: random.Random) -> array:
+    # Misma muestra que bootstrap_indices pero expresada como la cantidad de veces que se eligio cada fila (0 = fuera de la muestra).
+    # Sirve como vector de pesos para algoritmo.crearArbolDecisionDesde, sin repetir indices ni filas
+    multiplicidades = array('i', bytes(4 * n_filas))
+    for i in bootstrap_indices(n_filas, tamano_muestra, rng):
+        multiplicidades[i] += 1
+    return multiplicidades
+
+
+def fuera_de_bolsa(multiplicidades: array) -> array:
+    # Indices de las filas que no quedaron en la muestra (out-of-bag) dado el vector de bootstrap_multiplicidades
+    n_filas = len(multiplicidades)
+    return array('i' if n_filas < 2 ** 31 else 'q', itertools.compress(range(n_filas), map(operator.not_, multiplicidades)))
+
+
+def seleccion_aleatoria_caracteristicas(atributos:any, cantidad_seleccion:any, rng: random.Random = None) ->list[any]:
+    generador = random if rng is None else rng
+    atributos_seleccionados = generador.sample(atributos, cantidad_seleccion)
     return atributos_seleccionados
 
 
-def combinar_predicciones(predicciones:any) -> dict:
+def cantidad_caracteristicas(max_features: any, n_atributos: int) -> int:
+    # Cantidad de atributos a sortear en cada nodo segun max_features: 'sqrt', 'log2', un entero (cantidad)
+    # o un float en (0, 1] (fraccion de los atributos). None usa todos
+    if max_features is None:
+        return n_atributos
+    if max_features == 'sqrt':
+        cantidad = int(math.sqrt(n_atributos))
+    elif max_features == 'log2':
+        cantidad = int(math.log2(n_atributos)) if n_atributos > 0 else 0
+    elif isinstance(max_features, float):
+        if not 0.0 < max_features <= 1.0:
+            raise ValueError(f"max_features como fraccion debe estar en (0, 1]: {max_features}")
+        cantidad = int(max_features * n_atributos)
+    elif isinstance(max_features, int) and not isinstance(max_features, bool):
+        if max_features < 1:
+            raise ValueError(f"max_features debe ser al menos 1: {max_features}")
+        cantidad = max_features
+    else:
+        raise ValueError(f"max_features invalido: {max_features!r} (se espera 'sqrt', 'log2', un entero o una fraccion)")
+    return max(1, min(cantidad, n_atributos))
+
+
+def combinar_predicciones(predicciones:any, modo: str = 'conteos', probabilidades: bool = False) -> dict:
     # Función para combinar las predicciones de los árboles en el bosque
-    # En este caso, se implementa la votación mayoritaria para problemas de clasificación
-    # Se asume que predicciones es una lista de diccionarios donde cada diccionario contiene las predicciones de un árbol
+    # 'predicciones' es un iterable (puede ser un generador) de diccionarios {clase: conteo}, uno por árbol; se recorre
+    # una sola vez sin guardarlo. Con modo 'conteos' se suman los conteos, con 'mayoria' cada árbol vota por su clase
+    # mayoritaria y con 'suave' se suman las distribuciones de probabilidad de cada árbol (ver votacion.AcumuladorVotos).
+    # Devuelve {clase ganadora: votos}, o con probabilidades=True la distribución {clase: probabilidad} completa
+    if modo not in MODOS:
+        raise ValueError(f"modo de votacion invalido: {modo!r} (se espera uno de {MODOS})")
     predicciones_combinadas = {}
     for pred in predicciones:
-        for clase, conteo in pred.items():
-            if clase not in predicciones_combinadas:
-                predicciones_combinadas[clase] = 0
-            predicciones_combinadas[clase] += conteo
+        for clase, voto in zip(pred, votoHoja(list(pred.values()), modo)):
+            predicciones_combinadas[clase] = predicciones_combinadas.get(clase, 0) + voto
+    if probabilidades:
+        total = sum(predicciones_combinadas.values())
+        return {clase: votos / total for clase, votos in predicciones_combinadas.items()} if total else predicciones_combinadas
     # Seleccionar la clase con mayor votación como la predicción final
     clase_final = max(predicciones_combinadas, key=predicciones_combinadas.get)
-    return {clase_final: predicciones_combinadas[clase_final]}
+    votos = predicciones_combinadas[clase_final]
+    return {clase_final: int(votos) if isinstance(votos, float) and votos.is_integer() else votos}
@@ -0,0 +1,89 @@
+"""
+Este módulo guarda y carga bosques entrenados en un formato binario versionado y compacto.
+
+El archivo tiene una cabecera fija (magia, versión, largo de la cabecera JSON), una cabecera JSON con las clases,
+los diccionarios de categorías, los metadatos del bosque y la ubicación de cada arreglo, y después los arreglos
+planos de nodos de cada árbol compilado (ver arbol_compilado), alineados a 8 bytes.
+
+cargar_modelo mapea el archivo en memoria: los árboles quedan como vistas sobre el archivo, sin copiar ni
+reconstruir nodos, y el modelo cargado predice igual que el bosque en memoria. Este módulo solo depende de
+arbol_compilado, no de los módulos de entrenamiento.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Optional
+
+from arbol_compilado import ArbolCompilado, BosqueCompilado
+
+MAGIA = b'RFMODELO'
+VERSION = 1
+ALINEACION = 8
+CAMPOS = ('atributo', 'valor', 'numerico', 'izquierdo', 'derecho', 'hoja', 'conteos', 'probabilidad')
+
+def guardar_modelo(modelo, ruta: str, metadatos: Optional[dict] = None) -> None:
+    """
+    Guarda un bosque entrenado (random_forest.RandomForest o arbol_compilado.BosqueCompilado) en 'ruta'.
+    'metadatos' es un diccionario serializable en JSON que se guarda junto con el modelo.
+    """
+    bosque = getattr(modelo, 'compilado', modelo)
+    if bosque is None:
+        raise ValueError('El modelo no está entrenado')
+
+    arreglos, ubicaciones, desplazamiento = [], [], 0
+    for arbol in bosque.arboles:
+        ubicacionesArbol = {}
+        for campo in CAMPOS:
+            arreglo = getattr(arbol, campo)
+            tipo = arreglo.typecode if isinstance(arreglo, array) else arreglo.format
+            ubicacionesArbol[campo] = (tipo, desplazamiento, len(arreglo))
+            arreglos.append((desplazamiento, arreglo))
+            desplazamiento += -(-len(arreglo) * arreglo.itemsize // ALINEACION) * ALINEACION
+        ubicaciones.append(ubicacionesArbol)
+
+    categorias = [None if codigos is None else sorted(codigos, key=codigos.__getitem__) for codigos in bosque.codigos]
+    cabecera = json.dumps({'orden_bytes': sys.byteorder, 'clases': bosque.clases, 'categorias': categorias,
+                           'n_clases': 2 if bosque.regresion else len(bosque.clases), 'arboles': ubicaciones, 'metadatos': {**bosque.metadatos, **(metadatos or {})}}).encode('utf-8')
+    inicio = -(-(16 + len(cabecera)) // ALINEACION) * ALINEACION
+
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as file:
+        file.write(MAGIA + struct.pack('<II', VERSION, len(cabecera)) + cabecera)
+        file.write(bytes(inicio - 16 - len(cabecera)))
+        for desplazamiento, arreglo in arreglos:
+            file.seek(inicio + desplazamiento)
+            file.write(memoryview(arreglo).cast('B'))
+    os.replace(temporal, ruta)
+
+def cargar_modelo(ruta: str) -> BosqueCompilado:
+    """
+    Carga un bosque guardado con guardar_modelo, mapeando el archivo en memoria. Los metadatos quedan en el
+    atributo 'metadatos' del bosque devuelto.
+    """
+    with open(ruta, 'rb') as file:
+        mapa = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapa[:8] != MAGIA:
+        raise ValueError(f"'{ruta}' no es un modelo guardado con guardar_modelo")
+    version, largo = struct.unpack('<II', mapa[8:16])
+    if version != VERSION:
+        raise ValueError(f"'{ruta}': version de modelo {version} no soportada (se esperaba {VERSION})")
+    cabecera = json.loads(mapa[16:16 + largo])
+    if cabecera['orden_bytes'] != sys.byteorder:
+        raise ValueError(f"'{ruta}' se guardó en una máquina {cabecera['orden_bytes']}-endian")
+
+    datos = memoryview(mapa)[-(-(16 + largo) // ALINEACION) * ALINEACION:]
+    arboles = []
+    for ubicacionesArbol in cabecera['arboles']:
+        campos = {}
+        for campo, (tipo, desplazamiento, largoArreglo) in ubicacionesArbol.items():
+            campos[campo] = datos[desplazamiento:desplazamiento + largoArreglo * array(tipo).itemsize].cast(tipo)
+        if 'probabilidad' not in campos: # modelo guardado antes de que se guardaran las probabilidades de las ramas
+            campos['probabilidad'] = ArbolCompilado.probabilidadesRamas(campos['izquierdo'], campos['derecho'], campos['hoja'], campos['conteos'], cabecera['n_clases'], cabecera['clases'] is None)
+        arboles.append(ArbolCompilado(n_clases=cabecera['n_clases'], **campos))
+
+    codigos = [None if cats is None else {v: i for i, v in enumerate(cats)} for cats in cabecera['categorias']]
+    return BosqueCompilado(arboles, cabecera['clases'], codigos, cabecera['metadatos'])
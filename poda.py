@@ -0,0 +1,227 @@
+"""
+Este módulo poda árboles de decisión (algoritmo.ArbolDecision) trabajando directamente con los conteos de clase de
+las hojas, sin reconstruir filas.
+
+- podarPorGanancia: la poda de algoritmo.podarArbol; une pares de hojas hermanas cuya división gana menos que una
+  ganancia mínima.
+- Poda por costo-complejidad (CART): el costo de un subárbol T es R(T) + alfa * |hojas de T|, donde R es la
+  proporción de filas de entrenamiento mal clasificadas. caminoCostoComplejidad calcula en una sola pasada de abajo
+  hacia arriba el camino completo de alfas y podarCostoComplejidad devuelve el árbol óptimo para un alfa dado.
+- podarErrorReducido: poda contra un conjunto de validación, clasificado con el recorrido por lotes de
+  clasificacion.hojasLote.
+
+Las podas de costo-complejidad y de error reducido devuelven un árbol nuevo y no modifican el original. El árbol
+nuevo comparte con el original los subárboles que no se podan (ver arbol_decision.NodoBinario.mapear): solo se
+crean las hojas nuevas y los nodos en el camino hacia ellas, así que podar para probar (por ejemplo, varios alfas
+sobre cada árbol de un bosque) cuesta en memoria lo que cambia y no una copia completa. Por eso los árboles podados
+no se deben modificar en el lugar (podarPorGanancia) mientras se use el original.
+"""
+
+import math
+from typing import Optional
+
+import algoritmo
+from clasificacion import clasesDelArbol, hojasLote
+
+def _esHoja(nodo: "algoritmo.ArbolDecision") -> bool:
+    return nodo.resultados is not None or nodo.ramaVerdadera is None
+
+def _hoja(conteos: list, clases: list) -> "algoritmo.ArbolDecision":
+    return algoritmo.ArbolDecision(resultados={clase: c for clase, c in zip(clases, conteos) if c})
+
+def _mayoritaria(conteos: list) -> int:
+    return max(range(len(conteos)), key=conteos.__getitem__)
+
+###### PODA POR GANANCIA MINIMA ######
+
+def podarPorGanancia(arbol: "algoritmo.ArbolDecision", min_ganancia: float, notificar: bool = False) -> None:
+    """
+    Poda el árbol en el lugar: de abajo hacia arriba, cada nodo cuyas dos ramas son hojas se convierte en hoja si
+    la ganancia de información de su división es menor que min_ganancia. Modifica también los árboles que
+    compartan nodos con este (los que devuelven las otras podas): copiarlo antes con ArbolBinario.de(arbol).copy().
+    """
+    # Recorrido posorden con una pila: cada nodo se evalúa después de podar sus dos ramas
+    pendientes = [] if _esHoja(arbol) else [(arbol, False)]
+    while pendientes:
+        nodo, listo = pendientes.pop()
+        if not listo:
+            pendientes.append((nodo, True))
+            for rama in (nodo.ramaFalsa, nodo.ramaVerdadera):
+                if not _esHoja(rama):
+                    pendientes.append((rama, False))
+            continue
+        if not (_esHoja(nodo.ramaVerdadera) and _esHoja(nodo.ramaFalsa)):
+            continue
+        verdaderos = nodo.ramaVerdadera.resultados or {}
+        falsos = nodo.ramaFalsa.resultados or {}
+        n1, n2 = sum(verdaderos.values()), sum(falsos.values())
+        if n1 + n2 == 0:
+            continue
+        unidos = dict(verdaderos)
+        for clase, c in falsos.items():
+            unidos[clase] = unidos.get(clase, 0) + c
+        delta = algoritmo.entropiaConteos(unidos.values(), n1 + n2)
+        if n1:
+            delta -= n1 / (n1 + n2) * algoritmo.entropiaConteos(verdaderos.values(), n1)
+        if n2:
+            delta -= (1 - n1 / (n1 + n2)) * algoritmo.entropiaConteos(falsos.values(), n2)
+        if delta < min_ganancia:
+            if notificar: print('Se podó una rama: ganancia = %f' % delta)
+            nodo.ramaVerdadera, nodo.ramaFalsa = None, None
+            nodo.resultados = unidos
+
+###### PODA POR COSTO-COMPLEJIDAD ######
+
+# El costo óptimo de un subárbol en función de alfa es una función lineal por partes y cóncava. Se representa con
+# la lista de sus tramos (alfa inicial, cantidad de hojas, errores) ordenada por alfa: en cada tramo el costo es
+# errores + alfa * hojas. Los errores y los alfas se miden en filas mal clasificadas (no en proporción).
+
+def _sumarFunciones(f: list, g: list) -> list:
+    """
+    Suma dos funciones de costo: en cada tramo de la suma se suman hojas y errores de los tramos activos.
+    """
+    resultado = []
+    i = j = 0
+    while True:
+        resultado.append((max(f[i][0], g[j][0]), f[i][1] + g[j][1], f[i][2] + g[j][2]))
+        siguienteF = f[i + 1][0] if i + 1 < len(f) else math.inf
+        siguienteG = g[j + 1][0] if j + 1 < len(g) else math.inf
+        if siguienteF == siguienteG == math.inf:
+            return resultado
+        if siguienteF <= siguienteG:
+            i += 1
+        if siguienteG <= siguienteF:
+            j += 1
+
+def _minimoConHoja(funcion: list, errores: float) -> tuple[list, float]:
+    """
+    Combina la función de costo de un subárbol con la de podarlo a una hoja (errores + alfa). Como el subárbol
+    tiene al menos dos hojas y nunca más errores que la hoja, las rectas se cortan una sola vez: devuelve la
+    función resultante y el alfa del corte, a partir del cual conviene podar el nodo.
+    """
+    for t, (inicio, hojas, erroresTramo) in enumerate(funcion):
+        fin = funcion[t + 1][0] if t + 1 < len(funcion) else math.inf
+        alfa = max((errores - erroresTramo) / (hojas - 1), inicio)
+        if alfa < fin:
+            tramos = funcion[:t + 1] if alfa > inicio else funcion[:t]
+            return tramos + [(alfa, 1, errores)], alfa
+
+def _analizarCostoComplejidad(nodo: "algoritmo.ArbolDecision", posicion: dict, alfas: dict) -> tuple[list, list]:
+    """
+    Recorre el subárbol de abajo hacia arriba con una pila. Devuelve los conteos de clase del nodo y su función de
+    costo, y guarda en 'alfas' el alfa a partir del cual conviene podar cada nodo interno.
+    """
+    resultados = []
+    pendientes = [(nodo, False)]
+    while pendientes:
+        nodo, listo = pendientes.pop()
+        if _esHoja(nodo):
+            conteos = [0] * len(posicion)
+            for clase, c in (nodo.resultados or {}).items():
+                conteos[posicion[clase]] = c
+            resultados.append((conteos, [(0.0, 1, sum(conteos) - max(conteos, default=0))]))
+        elif not listo:
+            pendientes += [(nodo, True), (nodo.ramaFalsa, False), (nodo.ramaVerdadera, False)]
+        else:
+            conteosF, funcionF = resultados.pop()
+            conteosV, funcionV = resultados.pop()
+            conteos = [v + f for v, f in zip(conteosV, conteosF)]
+            funcion, alfas[id(nodo)] = _minimoConHoja(_sumarFunciones(funcionV, funcionF), sum(conteos) - max(conteos, default=0))
+            resultados.append((conteos, funcion))
+    return resultados[0]
+
+def caminoCostoComplejidad(arbol: "algoritmo.ArbolDecision") -> list[tuple[float, int, float]]:
+    """
+    Calcula el camino completo de la poda por costo-complejidad en una pasada. Devuelve la lista de tramos
+    (alfa, cantidad de hojas, error de entrenamiento): para cada alfa desde ese valor hasta el siguiente, el árbol
+    óptimo (podarCostoComplejidad) tiene esas hojas y ese error. Alfa y error están en proporción de filas.
+    """
+    clases = clasesDelArbol(arbol)
+    conteos, funcion = _analizarCostoComplejidad(arbol, {clase: i for i, clase in enumerate(clases)}, {})
+    total = sum(conteos) or 1
+    return [(alfa / total, hojas, errores / total) for alfa, hojas, errores in funcion]
+
+def podarCostoComplejidad(arbol: "algoritmo.ArbolDecision", alfa: float) -> "algoritmo.ArbolDecision":
+    """
+    Devuelve el subárbol podado de menor R(T) + alfa * |hojas de T|, con alfa en proporción de filas como en
+    caminoCostoComplejidad. Con alfa = 0 solo se podan las divisiones que no reducen el error de entrenamiento.
+    """
+    clases = clasesDelArbol(arbol)
+    posicion = {clase: i for i, clase in enumerate(clases)}
+    alfas = {}
+    conteos, _ = _analizarCostoComplejidad(arbol, posicion, alfas)
+    umbral = alfa * sum(conteos)
+
+    def podar(nodo):
+        if not _esHoja(nodo) and alfas[id(nodo)] <= umbral:
+            return _hoja(_conteosNodo(nodo, posicion), clases)
+        return None
+    return arbol.mapear(podar)
+
+def _conteosNodo(nodo: "algoritmo.ArbolDecision", posicion: dict) -> list:
+    """
+    Suma los conteos de clase de las hojas del subárbol.
+    """
+    conteos = [0] * len(posicion)
+    pendientes = [nodo]
+    while pendientes:
+        nodo = pendientes.pop()
+        if _esHoja(nodo):
+            for clase, c in (nodo.resultados or {}).items():
+                conteos[posicion[clase]] += c
+        else:
+            pendientes.append(nodo.ramaFalsa)
+            pendientes.append(nodo.ramaVerdadera)
+    return conteos
+
+###### PODA POR ERROR REDUCIDO ######
+
+def podarErrorReducido(arbol: "algoritmo.ArbolDecision", filas_validacion: list[list[any]], clases: Optional[list] = None) -> "algoritmo.ArbolDecision":
+    """
+    Poda contra un conjunto de validación (filas con la clase en la última columna). Las filas se clasifican una
+    sola vez con el recorrido por lotes y de abajo hacia arriba cada nodo se convierte en hoja (con la clase
+    mayoritaria de entrenamiento) si así no comete más errores de validación que su subárbol.
+    """
+    if clases is None:
+        clases = clasesDelArbol(arbol)
+    posicion = {clase: i for i, clase in enumerate(clases)}
+    k = len(clases)
+
+    # Conteos de validación por hoja; las clases que el árbol no conoce van a una posición extra (siempre error)
+    validacion = {}
+    if filas_validacion:
+        columnas = list(zip(*filas_validacion))
+        objetivo = columnas[-1]
+        for hoja, indices in hojasLote(columnas, arbol, list(range(len(filas_validacion)))):
+            conteos = [0] * (k + 1)
+            for i in indices:
+                conteos[posicion.get(objetivo[i], k)] += 1
+            validacion[id(hoja)] = conteos
+
+    # De abajo hacia arriba con una pila; cada subárbol deja en 'resultados' (nodo podado, conteos de
+    # entrenamiento, conteos de validación, errores de validación). Las hojas y los subárboles sin podas se comparten.
+    resultados = []
+    pendientes = [(arbol, False)]
+    while pendientes:
+        nodo, listo = pendientes.pop()
+        if _esHoja(nodo):
+            entrenamiento = [0] * k
+            for clase, c in (nodo.resultados or {}).items():
+                entrenamiento[posicion[clase]] = c
+            enValidacion = validacion.get(id(nodo), [0] * (k + 1))
+            errores = sum(enValidacion) - (enValidacion[_mayoritaria(entrenamiento)] if k else 0)
+            resultados.append((nodo, entrenamiento, enValidacion, errores))
+            continue
+        if not listo:
+            pendientes += [(nodo, True), (nodo.ramaFalsa, False), (nodo.ramaVerdadera, False)]
+            continue
+        falsa, entrenamientoF, validacionF, erroresF = resultados.pop()
+        verdadera, entrenamientoV, validacionV, erroresV = resultados.pop()
+        entrenamiento = [v + f for v, f in zip(entrenamientoV, entrenamientoF)]
+        enValidacion = [v + f for v, f in zip(validacionV, validacionF)]
+        erroresHoja = sum(enValidacion) - (enValidacion[_mayoritaria(entrenamiento)] if k else 0)
+        if erroresHoja <= erroresV + erroresF:
+            resultados.append((_hoja(entrenamiento, clases), entrenamiento, enValidacion, erroresHoja))
+        else:
+            resultados.append((nodo.conHijos(verdadera, falsa), entrenamiento, enValidacion, erroresV + erroresF))
+    return resultados[0][0]
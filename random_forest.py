@@ -0,0 +1,256 @@
+"""
+Este módulo define la clase RandomForest, el ensamble de árboles de decisión de la librería.
+
+Cada árbol se entrena con una muestra bootstrap del conjunto de entrenamiento usando un generador aleatorio con
+semilla propia, derivada de la semilla del bosque. La muestra es un vector de multiplicidades por fila que el
+árbol usa como pesos, de modo que ningún árbol copia ni modifica las filas del Dataset. Por eso el resultado depende solo de la semilla y no de cuantos
+procesos se usen para entrenar.
+
+Con n_jobs > 1 los árboles se entrenan en un pool de procesos. Las columnas del Dataset se copian una sola vez a
+un bloque de memoria compartida que todos los procesos leen sin copiarlo (o, si el Dataset viene del cache binario
+de CargadorCsv, cada proceso mapea ese archivo); a cada tarea solo se le envia la semilla de su árbol.
+
+Las filas que quedan fuera de la muestra de un árbol (out-of-bag) se clasifican con ese árbol apenas termina; al
+final del entrenamiento el bosque tiene una precisión y una matriz de confusión out-of-bag sin entrenar de nuevo.
+
+podado(alfa) devuelve una copia podada del bosque que comparte con este los subárboles y los árboles que no cambian
+(ver poda), así que probar varias podas o fijar una versión para servir no copia el bosque entero.
+"""
+
+import copy
+import math
+import os
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+
+import algoritmo
+import clasificacion
+import muestreo
+import poda
+from arbol_compilado import ArbolCompilado, BosqueCompilado
+from conjuntos import FALTANTE, Dataset
+from entropia_ganancia import Criterio
+from votacion import AcumuladorVotos
+
+def _entrenarArbol(datos: Dataset, semilla: int, parametros: dict) -> tuple["algoritmo.ArbolDecision", array]:
+    """
+    Entrena un árbol con la muestra bootstrap que determina su semilla. Devuelve el árbol y los índices de las
+    filas que quedaron fuera de la muestra (out-of-bag).
+    """
+    rng = random.Random(semilla)
+    pesos = muestreo.bootstrap_multiplicidades(len(datos), len(datos), rng)
+    return algoritmo.crearArbolDecisionDesde(datos, pesos=pesos, rng=rng, **parametros), muestreo.fuera_de_bolsa(pesos)
+
+# Estado de cada proceso del pool: se inicializa una vez por proceso, no por árbol
+_datosTrabajador: Optional[Dataset] = None
+_memoriaTrabajador: Optional[shared_memory.SharedMemory] = None
+_parametrosTrabajador: dict = {}
+
+def _inicializarTrabajador(nombre: str, ubicaciones: list, categorias: list, clases: list, nombres: list, parametros: dict) -> None:
+    global _datosTrabajador, _memoriaTrabajador, _parametrosTrabajador
+    _memoriaTrabajador = shared_memory.SharedMemory(name=nombre)
+    _datosTrabajador = Dataset.desdeBuffer(_memoriaTrabajador.buf, ubicaciones, categorias, clases, nombres)
+    _parametrosTrabajador = parametros
+
+def _inicializarTrabajadorArchivo(ruta: str, parametros: dict) -> None:
+    global _datosTrabajador, _parametrosTrabajador
+    _datosTrabajador = Dataset.abrir(ruta)
+    _parametrosTrabajador = parametros
+
+def _entrenarArbolCompartido(semilla: int) -> tuple["algoritmo.ArbolDecision", array]:
+    return _entrenarArbol(_datosTrabajador, semilla, _parametrosTrabajador)
+
+class RandomForest:
+    def __init__(self, numero_arboles: int = 10, max_profundidad: Optional[int] = None, min_ganancia: float = 0.0, min_muestras_nodo: int = 1, semilla: Optional[int] = None, max_bins: Optional[int] = None, max_features: "str | int | float | None" = 'sqrt', regresion: bool = False, criterio: "str | Criterio" = 'entropia', max_hojas: Optional[int] = None):
+        """
+        Clase que representa un bosque aleatorio de árboles de decisión para clasificación o, con regresion=True,
+        para regresión (árboles por reducción de varianza; el bosque promedia las medias de las hojas).
+        max_features es la cantidad de atributos que se sortean en cada nodo ('sqrt', 'log2', entero, fracción o
+        None para usar todos); el sorteo usa el generador de cada árbol, así que también depende solo de la semilla.
+        criterio es el criterio de división en clasificación ('entropia', 'gini', 'ratio' o un
+        entropia_ganancia.Criterio). Con max_hojas cada árbol crece primero por las divisiones de mayor ganancia hasta
+        tener a lo sumo esa cantidad de hojas.
+        """
+        self.numero_arboles = numero_arboles
+        self.max_profundidad = max_profundidad
+        self.min_ganancia = min_ganancia
+        self.min_muestras_nodo = min_muestras_nodo
+        self.semilla = semilla
+        self.max_bins = max_bins
+        self.max_features = max_features
+        self.regresion = regresion
+        self.criterio = criterio
+        self.max_hojas = max_hojas
+        self.arboles: list[algoritmo.ArbolDecision] = []
+        self.clases: Optional[list] = []
+        self.compilado: Optional[BosqueCompilado] = None
+        self.cache: Optional[tuple[int, str]] = None  # (capacidad, politica) del cache de predicciones, si está activado
+        # Estimación out-of-bag, calculada durante fit
+        self.indices_oob: list[array] = []          # por árbol, filas que no vio
+        self.votos_oob: list[array] = []            # por fila, suma de conteos de los árboles que no la vieron
+        self.confusion_oob: list[list[int]] = []    # [clase real][clase predicha], en el orden de self.clases
+        self.precision_oob: Optional[float] = None
+        self.predicciones_oob: Optional[array] = None  # regresión: por fila, promedio de los árboles que no la vieron
+        self.error_cuadratico_oob: Optional[float] = None
+
+    def _parametros(self) -> dict:
+        return {'max_profundidad': self.max_profundidad, 'min_ganancia': self.min_ganancia, 'min_muestras_nodo': self.min_muestras_nodo, 'max_bins': self.max_bins, 'max_features': self.max_features, 'criterio': self.criterio, 'max_hojas': self.max_hojas}
+
+    def fit(self, datos: "list[list[any]] | Dataset", n_jobs: int = 1) -> "RandomForest":
+        """
+        Entrena los árboles del bosque. n_jobs es la cantidad de procesos (-1 usa todos los núcleos).
+        Con la misma semilla el bosque resultante es el mismo para cualquier valor de n_jobs.
+        """
+        if not isinstance(datos, Dataset):
+            datos = Dataset.desdeFilas(datos, regresion=self.regresion)
+
+        self.regresion = datos.regresion
+        self.clases = None if datos.regresion else list(datos.clases)
+        rng = random.Random(self.semilla)
+        semillas = [rng.getrandbits(64) for _ in range(self.numero_arboles)]
+
+        if n_jobs is not None and n_jobs < 0:
+            n_jobs = os.cpu_count() or 1
+        n_jobs = min(n_jobs or 1, self.numero_arboles)
+
+        if n_jobs <= 1:
+            entrenados = (_entrenarArbol(datos, semilla, self._parametros()) for semilla in semillas)
+            self._recibirArboles(datos, entrenados)
+        else:
+            self._entrenarEnParalelo(datos, semillas, n_jobs)
+
+        if self.cache is not None:
+            self.compilado.activarCache(*self.cache) # el cache del modelo anterior queda descartado
+        self.compilado.metadatos.update(self._parametros(), criterio=str(self.criterio), numero_arboles=self.numero_arboles, semilla=self.semilla, nombres=datos.nombres, precision_oob=self.precision_oob, error_cuadratico_oob=self.error_cuadratico_oob)
+        return self
+
+    def _recibirArboles(self, datos: Dataset, entrenados) -> None:
+        """
+        Compila cada árbol a medida que termina y suma sus votos sobre sus filas out-of-bag con el predictor por
+        lotes. Al final calcula la precisión y la matriz de confusión out-of-bag (en regresión, las predicciones
+        y el error cuadrático medio out-of-bag).
+        """
+        n = len(datos)
+        k = 2 if self.regresion else len(self.clases) # en regresión se acumula (suma de medias, cantidad de árboles)
+        codigos = [None if cats is None else {v: i for i, v in enumerate(cats)} for cats in datos.categorias]
+        votos = AcumuladorVotos(n, k)
+        # Los faltantes de las columnas categóricas pasan a NaN, como los codifica el bosque compilado
+        faltantes = {col for col in range(datos.n_columnas) if datos.tieneFaltantes(col)}
+        columnas = [array('d', (math.nan if c == FALTANTE else c for c in columna)) if col in faltantes and not datos.esNumerica(col) else columna for col, columna in enumerate(datos.columnas)]
+        self.arboles, self.indices_oob, compilados = [], [], []
+        for arbol, fuera in entrenados:
+            compilado = ArbolCompilado.compilar(arbol, self.clases, codigos)
+            for h, indices, pesos in compilado.hojasLotePonderado(columnas, list(fuera), faltantes) if fuera else ():
+                hoja = compilado.conteosHoja(h)
+                votos.sumar(indices, (hoja[0], 1.0) if self.regresion else hoja, pesos)
+            self.arboles.append(arbol)
+            self.indices_oob.append(fuera)
+            compilados.append(compilado)
+
+        # Los árboles de objetos quedan para graficar; la inferencia usa la versión compilada
+        self.compilado = BosqueCompilado(compilados, self.clases, codigos)
+
+        self.votos_oob = votos.votos()
+        if self.regresion:
+            self.predicciones_oob = array('d', (suma / cantidad if cantidad else math.nan for suma, cantidad in self.votos_oob))
+            errores = [(p - y) ** 2 for p, y in zip(self.predicciones_oob, datos.objetivo) if not math.isnan(p)]
+            self.error_cuadratico_oob = sum(errores) / len(errores) if errores else None
+            return
+        self.confusion_oob = [[0] * k for _ in range(k)]
+        evaluadas = aciertos = 0
+        for real, votos in zip(datos.objetivo, self.votos_oob):
+            if not any(votos):
+                continue # la fila quedó en la muestra de todos los árboles
+            predicha = max(range(k), key=votos.__getitem__)
+            self.confusion_oob[real][predicha] += 1
+            evaluadas += 1
+            aciertos += real == predicha
+        self.precision_oob = aciertos / evaluadas if evaluadas else None
+
+    def _entrenarEnParalelo(self, datos: Dataset, semillas: list[int], n_jobs: int) -> None:
+        """
+        Entrena los árboles en un pool de n_jobs procesos que comparten las columnas por memoria compartida.
+        Si el Dataset ya está mapeado desde un archivo binario, cada proceso mapea ese mismo archivo. Los árboles
+        se reciben (y se evalúan out-of-bag) en orden, a medida que terminan.
+        """
+        if datos.archivo is not None:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_inicializarTrabajadorArchivo, initargs=(datos.archivo, self._parametros())) as pool:
+                self._recibirArboles(datos, pool.map(_entrenarArbolCompartido, semillas))
+                return
+
+        ubicaciones, tamano = datos.disposicion()
+        memoria = shared_memory.SharedMemory(create=True, size=max(tamano, 1))
+        try:
+            datos.volcar(memoria.buf, ubicaciones)
+            inicializacion = (memoria.name, ubicaciones, datos.categorias, datos.clases, datos.nombres, self._parametros())
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_inicializarTrabajador, initargs=inicializacion) as pool:
+                self._recibirArboles(datos, pool.map(_entrenarArbolCompartido, semillas))
+        finally:
+            memoria.close()
+            memoria.unlink()
+
+    def activarCache(self, capacidad: int = 1024, politica: str = 'lru') -> None:
+        """
+        Activa el cache de predicciones del bosque ('lru' o 'tinylfu', ver cache_prediccion). Se mantiene activado
+        al volver a entrenar, vacío.
+        """
+        self.cache = (capacidad, politica)
+        if self.compilado is not None:
+            self.compilado.activarCache(capacidad, politica)
+
+    def desactivarCache(self) -> None:
+        self.cache = None
+        if self.compilado is not None:
+            self.compilado.desactivarCache()
+
+    def podado(self, alfa: float) -> "RandomForest":
+        """
+        Devuelve una copia del bosque con cada árbol podado por costo-complejidad con ese alfa (ver
+        poda.podarCostoComplejidad), sin modificar este. Cada árbol podado comparte con el original los subárboles
+        sin podar, y los árboles que la poda no cambia se comparten enteros junto con su versión compilada: solo se
+        crean y se compilan los nodos y los árboles que cambian. Las estimaciones out-of-bag siguen siendo las del
+        bosque sin podar.
+        """
+        if self.compilado is None:
+            raise ValueError('El modelo no está entrenado')
+        if self.regresion:
+            raise ValueError('La poda por costo-complejidad es solo para clasificación')
+        podado = copy.copy(self)
+        podado.arboles = [poda.podarCostoComplejidad(arbol, alfa) for arbol in self.arboles]
+        compilado = self.compilado
+        compilados = [anterior if nuevo is arbol else ArbolCompilado.compilar(nuevo, self.clases, compilado.codigos)
+                      for arbol, nuevo, anterior in zip(self.arboles, podado.arboles, compilado.arboles)]
+        podado.compilado = BosqueCompilado(compilados, self.clases, compilado.codigos, dict(compilado.metadatos, poda_alfa=alfa))
+        if self.cache is not None:
+            podado.compilado.activarCache(*self.cache)
+        return podado
+
+    def predict(self, observacion: list[any]) -> dict:
+        """
+        Clasifica una observación por votación mayoritaria de los árboles (en regresión, devuelve el promedio).
+        """
+        return self.compilado.predict(observacion)
+
+    def predict_batch(self, matriz: list[list[any]]) -> list[array]:
+        """
+        Clasifica muchas observaciones a la vez. Devuelve, para cada fila, el arreglo con la suma de los conteos de
+        las hojas alcanzadas en todos los árboles, ordenado segun self.clases. En regresión devuelve un arreglo con
+        el valor predicho para cada fila.
+        """
+        return self.compilado.predict_batch(matriz)
+
+    def predict_proba(self, matriz: list[list[any]]) -> list[array]:
+        """
+        Probabilidad de cada clase (ordenadas segun self.clases) por votación suave de los árboles.
+        """
+        return self.compilado.predict_proba(matriz)
+
+    def votar(self, matriz: list[list[any]], modo: str = 'mayoria', temprana: bool = False) -> AcumuladorVotos:
+        """
+        Acumula los votos de los árboles sobre muchas observaciones (ver votacion.AcumuladorVotos).
+        Con temprana=True deja de recorrer árboles para las filas cuya clase ganadora ya no puede cambiar.
+        """
+        return self.compilado.votar(matriz, modo, temprana)
@@ -0,0 +1,331 @@
+"""
+Este módulo sirve las predicciones de un bosque con asyncio, agrupando los pedidos de a una observación en
+micro-lotes.
+
+Cada pedido (ServidorPrediccion.predecir) se encola junto con un futuro. Un ciclo toma el primer pedido de la cola
+y sigue juntando pedidos hasta tener max_lote o hasta que pasen max_espera segundos desde el primero; el lote
+completo se clasifica con el predictor por lotes del bosque compilado (BosqueCompilado.predict_batch) en un
+executor, para no bloquear el ciclo de eventos, y cada futuro recibe la predicción de su fila. Así el costo fijo de
+Python de recorrer los árboles se reparte entre todas las filas del lote. Las observaciones mal formadas se rechazan
+antes de encolarse (BosqueCompilado.validar) y, si un lote falla igual, sus filas se clasifican de a una para que
+solo falle el pedido que causó el error.
+
+El servidor lleva métricas de latencia (p50 y p99, desde que llega el pedido hasta que se responde) y de
+rendimiento (pedidos y lotes por segundo, tamaño medio de lote) y, si el bosque tiene el cache de predicciones
+activado (BosqueCompilado.activarCache, o --cache desde la línea de comandos), la tasa de aciertos del cache.
+
+Se puede usar dentro del proceso con ClienteLocal, o por red con servir(): un servidor TCP que recibe una
+observación por línea en JSON (una lista) y responde una línea JSON con la predicción; la línea "metricas"
+devuelve las métricas. Desde la línea de comandos: python servidor.py modelo.bin --puerto 8765
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import Optional, Sequence
+
+from arbol_compilado import BosqueCompilado
+
+class Metricas:
+    def __init__(self, ventana: int = 10000):
+        """
+        Clase que acumula las métricas del servidor. Los percentiles se calculan sobre las últimas 'ventana'
+        latencias; los contadores son desde el inicio (o desde reiniciar()).
+        """
+        self.latencias: deque = deque(maxlen=ventana)
+        self.reiniciar()
+
+    def reiniciar(self) -> None:
+        self.latencias.clear()
+        self.pedidos = 0
+        self.lotes = 0
+        self.errores = 0
+        self.inicio = time.perf_counter()
+
+    def registrarLote(self, latencias: Sequence[float], errores: int = 0) -> None:
+        """
+        Registra un lote respondido con la latencia (en segundos) de cada uno de sus pedidos, de los cuales 'errores'
+        se respondieron con una excepción.
+        """
+        self.lotes += 1
+        self.pedidos += len(latencias)
+        self.errores += errores
+        self.latencias.extend(latencias)
+
+    def percentil(self, q: float) -> Optional[float]:
+        """
+        Percentil q (entre 0 y 100) de las latencias de la ventana, en segundos (None si no hubo pedidos).
+        """
+        if not self.latencias:
+            return None
+        ordenadas = sorted(self.latencias)
+        return ordenadas[min(len(ordenadas) - 1, max(0, math.ceil(q / 100 * len(ordenadas)) - 1))]
+
+    def resumen(self) -> dict:
+        """
+        Devuelve las métricas como diccionario serializable en JSON.
+        """
+        transcurrido = time.perf_counter() - self.inicio
+        return {'pedidos': self.pedidos, 'lotes': self.lotes, 'errores': self.errores,
+                'lote_medio': self.pedidos / self.lotes if self.lotes else None,
+                'latencia_p50': self.percentil(50), 'latencia_p99': self.percentil(99),
+                'pedidos_por_segundo': self.pedidos / transcurrido if transcurrido > 0 else None,
+                'lotes_por_segundo': self.lotes / transcurrido if transcurrido > 0 else None}
+
+class ServidorPrediccion:
+    def __init__(self, modelo, max_lote: int = 64, max_espera: float = 0.002, executor: Optional[Executor] = None):
+        """
+        Clase que sirve las predicciones de un bosque (random_forest.RandomForest o arbol_compilado.BosqueCompilado)
+        en micro-lotes de a lo sumo max_lote pedidos, esperando a lo sumo max_espera segundos desde el primer pedido
+        del lote. Los lotes se clasifican en 'executor' (por defecto, el executor de hilos del ciclo de eventos).
+        """
+        if max_lote < 1:
+            raise ValueError('max_lote debe ser al menos 1')
+        self.bosque = self._compilado(modelo)
+        self.max_lote = max_lote
+        self.max_espera = max_espera
+        self.executor = executor
+        self.metricas = Metricas()
+        self._cola: Optional[asyncio.Queue] = None
+        self._tarea: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _compilado(modelo) -> BosqueCompilado:
+        bosque = getattr(modelo, 'compilado', modelo)
+        if bosque is None:
+            raise ValueError('El modelo no está entrenado')
+        return bosque
+
+    def recargar(self, modelo) -> None:
+        """
+        Reemplaza el modelo servido. Los lotes que ya se están clasificando terminan con el modelo anterior.
+        Si el modelo anterior tenía el cache de predicciones activado, el nuevo lo tiene activado y vacío. El cache
+        no se vacía en el lugar (un lote lo puede estar usando en el executor): se reemplaza por uno nuevo.
+        """
+        anterior, bosque = self.bosque, self._compilado(modelo)
+        if bosque is anterior:
+            if bosque.cache is not None:
+                bosque.activarCache(bosque.cache.capacidad, bosque.cache.politica)
+        elif anterior.cache is not None and bosque.cache is None:
+            bosque.activarCache(anterior.cache.capacidad, anterior.cache.politica)
+        self.bosque = bosque
+
+    def resumen(self) -> dict:
+        """
+        Métricas del servidor y, si está activado, del cache de predicciones del modelo servido.
+        """
+        resumen = self.metricas.resumen()
+        if self.bosque.cache is not None:
+            resumen['cache'] = self.bosque.cache.metricas()
+        return resumen
+
+    async def iniciar(self) -> "ServidorPrediccion":
+        """
+        Arranca el ciclo que arma y clasifica los lotes (en el ciclo de eventos actual).
+        """
+        if self._tarea is None:
+            self._cola = asyncio.Queue()
+            self._tarea = asyncio.get_running_loop().create_task(self._atenderLotes())
+        return self
+
+    async def detener(self) -> None:
+        """
+        Detiene el ciclo de lotes; los pedidos que quedaron en la cola se cancelan.
+        """
+        if self._tarea is None:
+            return
+        self._tarea.cancel()
+        try:
+            await self._tarea
+        except asyncio.CancelledError:
+            pass
+        self._tarea = None
+        while not self._cola.empty():
+            _, futuro, _ = self._cola.get_nowait()
+            futuro.cancel()
+
+    async def __aenter__(self) -> "ServidorPrediccion":
+        return await self.iniciar()
+
+    async def __aexit__(self, *excepcion) -> None:
+        await self.detener()
+
+    async def predecir(self, observacion: Sequence[any]) -> any:
+        """
+        Predice una observación (lista de atributos, sin la clase) y devuelve lo mismo que BosqueCompilado.predict:
+        {clase ganadora: suma de conteos}, o el valor predicho en regresión. Una observación mal formada (ver
+        BosqueCompilado.validar) se rechaza acá, antes de entrar a un lote.
+        """
+        if self._tarea is None:
+            raise RuntimeError('el servidor no está iniciado (usar await servidor.iniciar())')
+        self.bosque.validar(observacion)
+        futuro = asyncio.get_running_loop().create_future()
+        self._cola.put_nowait((observacion, futuro, time.perf_counter()))
+        return await futuro
+
+    async def _armarLote(self) -> list[tuple]:
+        """
+        Espera el primer pedido y junta los que lleguen hasta completar max_lote o vencer max_espera.
+        """
+        cola = self._cola
+        lote = [await cola.get()]
+        limite = asyncio.get_running_loop().time() + self.max_espera
+        while len(lote) < self.max_lote:
+            if not cola.empty():
+                lote.append(cola.get_nowait())
+                continue
+            restante = limite - asyncio.get_running_loop().time()
+            if restante <= 0:
+                break
+            try:
+                lote.append(await asyncio.wait_for(cola.get(), restante))
+            except asyncio.TimeoutError:
+                break
+        return lote
+
+    async def _atenderLotes(self) -> None:
+        bucle = asyncio.get_running_loop()
+        while True:
+            lote = await self._armarLote()
+            lote = [pedido for pedido in lote if not pedido[1].done()] # pedidos cancelados por el cliente
+            if not lote:
+                continue
+            matriz = [observacion for observacion, _, _ in lote]
+            try:
+                resultados = await bucle.run_in_executor(self.executor, predecirLoteAislado, self.bosque, matriz)
+            except Exception as error:
+                resultados = [error] * len(lote)
+            fin = time.perf_counter()
+            errores = 0
+            for (_, futuro, _), resultado in zip(lote, resultados):
+                if isinstance(resultado, Exception):
+                    errores += 1
+                    if not futuro.done():
+                        futuro.set_exception(resultado)
+                elif not futuro.done():
+                    futuro.set_result(resultado)
+            self.metricas.registrarLote([fin - llegada for _, _, llegada in lote], errores)
+
+def predecirLote(bosque: BosqueCompilado, matriz: list[Sequence[any]]) -> list:
+    """
+    Clasifica un lote con el predictor por lotes (que usa el cache de predicciones del bosque, si está activado) y
+    devuelve, para cada fila, lo mismo que BosqueCompilado.predict.
+    """
+    votos = bosque.predict_batch(matriz)
+    if bosque.regresion:
+        return list(votos)
+    clases = range(len(bosque.clases))
+    resultados = []
+    for fila in votos:
+        ganadora = max(clases, key=fila.__getitem__)
+        total = fila[ganadora]
+        resultados.append({bosque.clases[ganadora]: int(total) if total.is_integer() else total})
+    return resultados
+
+def predecirLoteAislado(bosque: BosqueCompilado, matriz: list[Sequence[any]]) -> list:
+    """
+    Como predecirLote, pero si el lote falla vuelve a clasificar las filas de a una: cada fila que falla devuelve su
+    excepción en lugar de la predicción, así un pedido mal formado no hace fallar a los otros pedidos de su lote.
+    """
+    try:
+        return predecirLote(bosque, matriz)
+    except Exception:
+        if len(matriz) == 1:
+            raise
+    resultados = []
+    for observacion in matriz:
+        try:
+            resultados.extend(predecirLote(bosque, [observacion]))
+        except Exception as error:
+            resultados.append(error)
+    return resultados
+
+class ClienteLocal:
+    def __init__(self, servidor: ServidorPrediccion):
+        """
+        Clase cliente que le habla al servidor dentro del mismo proceso (sin red), para pruebas y benchmarks.
+        """
+        self.servidor = servidor
+
+    async def predecir(self, observacion: Sequence[any]) -> any:
+        return await self.servidor.predecir(observacion)
+
+    async def predecirMuchas(self, observaciones: Sequence[Sequence[any]]) -> list:
+        """
+        Manda todas las observaciones a la vez, como pedidos concurrentes, y devuelve las predicciones en orden.
+        """
+        return await asyncio.gather(*(self.servidor.predecir(observacion) for observacion in observaciones))
+
+###### SERVIDOR TCP ######
+
+async def _responder(servidor: ServidorPrediccion, linea: bytes) -> dict:
+    try:
+        if linea.strip() == b'metricas':
+            return servidor.resumen()
+        return {'prediccion': await servidor.predecir(json.loads(linea))}
+    except Exception as error:
+        return {'error': str(error)}
+
+async def _atenderConexion(servidor: ServidorPrediccion, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> None:
+    """
+    Atiende una conexión: los pedidos se atienden concurrentemente (así los de una misma conexión pueden entrar
+    al mismo lote) y se responden en el orden en que llegaron.
+    """
+    respuestas = asyncio.Queue()
+
+    async def escribir():
+        while True:
+            tarea = await respuestas.get()
+            if tarea is None:
+                return
+            escritor.write(json.dumps(await tarea).encode('utf-8') + b'\n')
+            await escritor.drain()
+
+    escritura = asyncio.ensure_future(escribir())
+    try:
+        while True:
+            linea = await lector.readline()
+            if not linea:
+                break
+            respuestas.put_nowait(asyncio.ensure_future(_responder(servidor, linea)))
+        respuestas.put_nowait(None)
+        await escritura
+    finally:
+        escritura.cancel()
+        escritor.close()
+
+async def servir(modelo, host: str = '127.0.0.1', puerto: int = 8765, max_lote: int = 64, max_espera: float = 0.002) -> None:
+    """
+    Sirve el modelo por TCP hasta que se cancele la tarea.
+    """
+    async with ServidorPrediccion(modelo, max_lote, max_espera) as servidor:
+        tcp = await asyncio.start_server(lambda lector, escritor: _atenderConexion(servidor, lector, escritor), host, puerto)
+        async with tcp:
+            await tcp.serve_forever()
+
+def main(argv: Optional[list[str]] = None) -> None:
+    from persistencia import cargar_modelo
+
+    parser = argparse.ArgumentParser(description='Sirve las predicciones de un bosque guardado con persistencia.guardar_modelo.')
+    parser.add_argument('modelo')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--max-lote', type=int, default=64)
+    parser.add_argument('--max-espera', type=float, default=0.002, help='segundos que se espera para completar un lote')
+    parser.add_argument('--cache', type=int, default=0, help='capacidad del cache de predicciones (0 lo desactiva)')
+    parser.add_argument('--politica-cache', choices=('lru', 'tinylfu'), default='lru')
+    args = parser.parse_args(argv)
+    modelo = cargar_modelo(args.modelo)
+    if args.cache:
+        modelo.activarCache(args.cache, args.politica_cache)
+    try:
+        asyncio.run(servir(modelo, args.host, args.puerto, args.max_lote, args.max_espera))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
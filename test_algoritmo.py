@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+import algoritmo
+import construccion_arbol
+from construccion_arbol import entropia
+from conjuntos import esNumerico
+from entropia_ganancia import TOLERANCIA
+
+def forma(nodo: algoritmo.ArbolDecision):
+    '''La forma de un árbol como tuplas anidadas: ((columna, valor), verdadera, falsa) o ('hoja', conteos).'''
+    if nodo.resultados is not None or nodo.ramaVerdadera is None:
+        return ('hoja', nodo.resultados)
+    return ((nodo.col, nodo.valor), forma(nodo.ramaVerdadera), forma(nodo.ramaFalsa))
+
+def hayEmpates(filas: list[list[any]]) -> bool:
+    '''
+    Indica si en algún nodo del árbol de base hay dos pruebas distintas con la mejor ganancia. Ahí el constructor de
+    base elige según el redondeo de entropia(), así que solo se compara con él en datos sin empates.
+    '''
+    puntuacion = entropia(filas)
+    ganancias = {}
+    for col in range(len(filas[0]) - 1):
+        for valor in dict.fromkeys(fila[col] for fila in filas):
+            set1, set2 = construccion_arbol.dividirConjunto(filas, col, valor)
+            if set1 and set2:
+                p = len(set1) / len(filas)
+                ganancias[(col, valor)] = (puntuacion - p * entropia(set1) - (1 - p) * entropia(set2), set1, set2)
+    mejor = max((ganancia for ganancia, _, _ in ganancias.values()), default=0.0)
+    if mejor <= 0:
+        return False
+    mejores = [ramas for ganancia, *ramas in ganancias.values() if ganancia > mejor - 1e-9]
+    return len(mejores) > 1 or any(hayEmpates(rama) for rama in mejores[0])
+
+def datosSinEmpates(cantidad: int) -> list[list[list[any]]]:
+    conjuntos, semilla = [], 0
+    while len(conjuntos) < cantidad:
+        rng = random.Random(semilla)
+        filas = [[rng.choice('abcde'), rng.choice('vwxyz'), rng.choice(['si', 'no'])] for _ in range(rng.randint(10, 30))]
+        if not hayEmpates(filas):
+            conjuntos.append(filas)
+        semilla += 1
+    return conjuntos
+
+@pytest.mark.parametrize('filas', datosSinEmpates(8))
+def test_barrido_igual_al_constructor_de_base(filas):
+    assert forma(algoritmo.crearArbolDecisionDesde(filas)) == forma(construccion_arbol.crearArbolDecisionDesde(filas))
+
+def porValores(filas: list[list[any]]):
+    '''
+    Constructor de comparación con el desempate de mejorDivision: prueba cada valor de cada columna dividiendo las
+    filas de nuevo, en el orden de los candidatos (columnas en orden, valores por primera aparición), y solo cambia de
+    prueba si la nueva supera a la mejor por más de TOLERANCIA. Devuelve la forma del árbol (ver forma).
+    '''
+    puntuacion = entropia(filas)
+    mejor, prueba, conjuntos = 0.0, None, None
+    for col in range(len(filas[0]) - 1):
+        valores = list(dict.fromkeys(fila[col] for fila in filas))
+        numerica = all(esNumerico(v) for v in valores)
+        for valor in valores:
+            if numerica:
+                set1 = [fila for fila in filas if fila[col] >= valor]
+                set2 = [fila for fila in filas if fila[col] < valor]
+            else:
+                set1, set2 = construccion_arbol.dividirConjunto(filas, col, valor)
+            if not set1 or not set2:
+                continue
+            p = len(set1) / len(filas)
+            ganancia = puntuacion - p * entropia(set1) - (1 - p) * entropia(set2)
+            if ganancia > mejor + TOLERANCIA:
+                mejor, prueba, conjuntos = ganancia, (col, valor), (set1, set2)
+    if prueba is None:
+        return ('hoja', construccion_arbol.conteosUnicos(filas))
+    return (prueba, porValores(conjuntos[0]), porValores(conjuntos[1]))
+
+def filasCategoricas(rng: random.Random) -> list[list[any]]:
+    return [[rng.choice('abc'), rng.choice('xyzw'), rng.choice('pq'), rng.choice(['si', 'no'])]
+            for _ in range(rng.randint(20, 120))]
+
+def filasMixtas(rng: random.Random) -> list[list[any]]:
+    return [[rng.randint(0, 9), rng.choice('xyz'), round(rng.random(), 2), rng.choice(['si', 'no', 'tal'])]
+            for _ in range(rng.randint(20, 120))]
+
+@pytest.mark.parametrize('semilla', range(5))
+@pytest.mark.parametrize('generar', [filasCategoricas, filasMixtas])
+def test_empates_por_orden_de_candidatos(generar, semilla):
+    filas = generar(random.Random(semilla))
+    assert forma(algoritmo.crearArbolDecisionDesde(filas)) == porValores(filas)
+
+def test_empate_entre_columnas_elige_la_primera():
+    rng = random.Random(0)
+    filas = []
+    for _ in range(40):
+        valor = rng.choice('ab')
+        filas.append([valor, valor, 'si' if valor == 'a' else 'no'])
+    assert algoritmo.crearArbolDecisionDesde(filas).col == 0
+
+@pytest.mark.parametrize('filas, valor', [
+    ([['q', 'si'], ['p', 'no'], ['q', 'si'], ['p', 'no'], ['q', 'no']], 'q'),
+    ([['p', 'no'], ['q', 'si'], ['q', 'si'], ['p', 'no'], ['q', 'no']], 'p'),
+    ([[3, 'a'], [1, 'a'], [2, 'b']], 3),
+    ([[2, 'b'], [1, 'a'], [3, 'a']], 2),
+])
+def test_empate_en_una_columna_elige_el_primer_valor(filas, valor):
+    assert algoritmo.crearArbolDecisionDesde(filas).valor == valor
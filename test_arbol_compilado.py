@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+import clasificacion
+from random_forest import RandomForest
+
+def datos(semilla: int) -> tuple[list[list[any]], list[list[any]]]:
+    rng = random.Random(semilla)
+    def fila():
+        return [rng.randint(0, 9), rng.choice('xyz'), round(rng.random(), 2), rng.choice(['si', 'no', 'tal'])]
+    entrenamiento = [fila() for _ in range(80)]
+    prueba = [f[:-1] for f in (fila() for _ in range(40))]
+    return entrenamiento, prueba
+
+def conteosBase(bosque: RandomForest, observacion: list[any]) -> list[float]:
+    '''Suma de los conteos de las hojas que alcanza la observación en los árboles sin compilar.'''
+    totales = [0.0] * len(bosque.clases)
+    for arbol in bosque.arboles:
+        for clase, conteo in clasificacion.clasificar(observacion, arbol).items():
+            totales[bosque.clases.index(clase)] += conteo
+    return totales
+
+@pytest.mark.parametrize('semilla', range(3))
+def test_compilado_igual_a_los_arboles(semilla):
+    entrenamiento, prueba = datos(semilla)
+    bosque = RandomForest(5, semilla=semilla).fit(entrenamiento)
+    lote = bosque.predict_batch(prueba)
+    for observacion, votos in zip(prueba, lote):
+        assert list(votos) == conteosBase(bosque, observacion)
+        assert list(bosque.predict(observacion).values())[0] == max(votos)
+
+def test_columna_mixta_se_compila_como_categorica():
+    # Con números y cadenas la columna es categórica: la prueba del nodo es 'x == 2', no 'x >= 2'
+    rng = random.Random(0)
+    clase = {1: 'si', 2: 'si', 3: 'no', 'a': 'si', 'b': 'no'}
+    entrenamiento = [[v, clase[v]] for v in (rng.choice(list(clase)) for _ in range(200))]
+    bosque = RandomForest(1, max_features=None, semilla=0).fit(entrenamiento)
+    for valor, esperada in clase.items():
+        assert list(bosque.predict([valor])) == [esperada]
+        votos = bosque.predict_batch([[valor]])[0]
+        assert bosque.clases[max(range(len(votos)), key=votos.__getitem__)] == esperada
@@ -0,0 +1,50 @@
+import random
+
+import algoritmo
+from arbol_decision import ArbolBinario, NodoAB
+
+def contar(nodo) -> tuple[int, int]:
+    if nodo is None:
+        return 0, 0
+    tamanoI, alturaI = contar(nodo.izquierdo)
+    tamanoD, alturaD = contar(nodo.derecho)
+    return 1 + tamanoI + tamanoD, 1 + max(alturaI, alturaD)
+
+def test_medidas_al_dia_despues_de_modificar():
+    rng = random.Random(0)
+    arbol = ArbolBinario()
+    arbol.set_raiz(NodoAB(0))
+    for i in range(1, 200):
+        vista = arbol
+        while True:
+            izquierdo = rng.random() < 0.5
+            hijo = vista.si() if izquierdo else vista.sd()
+            if hijo.es_vacio():
+                if izquierdo:
+                    vista.insertar_si(ArbolBinario.de(NodoAB(i)))
+                else:
+                    vista.insertar_sd(ArbolBinario.de(NodoAB(i)))
+                break
+            vista = hijo
+        assert (len(arbol), arbol.altura()) == contar(arbol.raiz)
+    arbol.sin_hojas()
+    assert (len(arbol), arbol.altura()) == contar(arbol.raiz)
+
+def test_reemplazar_no_modifica_el_original():
+    arbol = ArbolBinario.de(NodoAB(1, NodoAB(2), NodoAB(3)))
+    antes = arbol.instantanea()
+    nuevo = arbol.reemplazar([True], NodoAB(4, NodoAB(5)))
+    assert len(antes) == 3 and len(nuevo) == 4
+    assert nuevo.raiz.derecho is arbol.raiz.derecho
+
+def test_arbol_de_decision_como_arbol_binario():
+    filas = [[v, c, 'si' if (v + (c == 'x')) % 3 else 'no'] for v in range(6) for c in 'xy']
+    raiz = algoritmo.crearArbolDecisionDesde(filas)
+    arbol = ArbolBinario.de(raiz)
+    assert (len(arbol), arbol.altura()) == contar(raiz)
+
+    # mapear copia solo el camino hasta el reemplazo; el resto se comparte con el original
+    hoja = algoritmo.ArbolDecision(resultados={'si': 1})
+    nuevo = raiz.mapear(lambda nodo: hoja if nodo is raiz.ramaVerdadera else None)
+    assert nuevo is not raiz and nuevo.ramaVerdadera is hoja and nuevo.ramaFalsa is raiz.ramaFalsa
+    assert raiz.mapear(lambda nodo: None) is raiz
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+import servidor
+from cache_prediccion import CachePrediccion
+from random_forest import RandomForest
+
+def datos(semilla: int) -> tuple[list[list[any]], list[list[any]]]:
+    rng = random.Random(semilla)
+    def fila():
+        return [rng.choice('abc'), rng.choice('xyz'), rng.choice(['si', 'no', 'tal'])]
+    entrenamiento = [fila() for _ in range(80)]
+    prueba = [f[:-1] for f in (fila() for _ in range(40))]
+    return entrenamiento, prueba
+
+def test_lru_desaloja_la_menos_usada():
+    cache = CachePrediccion(2)
+    cache.guardar('a', 1)
+    cache.guardar('b', 2)
+    assert cache.obtener('a') == 1
+    cache.guardar('c', 3)
+    assert cache.obtener('b') is None
+    assert (cache.obtener('a'), cache.obtener('c')) == (1, 3)
+
+@pytest.mark.parametrize('politica', ['lru', 'tinylfu'])
+@pytest.mark.parametrize('semilla', range(3))
+def test_cache_no_cambia_las_predicciones(semilla, politica):
+    entrenamiento, prueba = datos(semilla)
+    bosque = RandomForest(5, semilla=semilla).fit(entrenamiento)
+    sinCache = bosque.predict_batch(prueba)
+    unaPorUna = [bosque.predict(o) for o in prueba]
+    bosque.activarCache(4, politica)
+    assert bosque.predict_batch(prueba + prueba) == sinCache + sinCache
+    assert [bosque.predict(o) for o in prueba] == unaPorUna
+
+def test_recargar_reemplaza_el_cache_sin_vaciarlo():
+    entrenamiento, prueba = datos(0)
+    bosque = RandomForest(3, semilla=0).fit(entrenamiento)
+    bosque.activarCache(16)
+    servidorPrediccion = servidor.ServidorPrediccion(bosque)
+    anterior = servidorPrediccion.bosque.cache
+    servidorPrediccion.bosque.predict_batch(prueba)
+    llenas = len(anterior)
+    servidorPrediccion.recargar(bosque)
+    assert servidorPrediccion.bosque.cache is not anterior
+    assert len(servidorPrediccion.bosque.cache) == 0 and len(anterior) == llenas > 0
@@ -0,0 +1,15 @@
+from cargadoraCSV import CargadorCsv
+
+def escribir(tmp_path, texto: str) -> str:
+    ruta = tmp_path / 'datos.csv'
+    ruta.write_text(texto)
+    return str(ruta)
+
+def test_faltante_con_espacios_en_columna_numerica(tmp_path):
+    cargador = CargadorCsv(escribir(tmp_path, 'a,b,c\n1,2.5,x\nNA ,3.5,y\n'))
+    assert cargador.cargarCSV() == [[1, 2.5, 'x'], [None, 3.5, 'y']]
+    assert cargador.esquema == [int, float, str]
+
+def test_columna_int_con_float_fuera_de_la_muestra(tmp_path):
+    cargador = CargadorCsv(escribir(tmp_path, 'a,b\n1,x\n\n2,y\n2.5,z\n'), tamano_bloque=2, filas_muestra=2)
+    assert cargador.cargarCSV() == [[1, 'x'], [2, 'y'], [2.5, 'z']]
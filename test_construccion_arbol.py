@@ -0,0 +1,8 @@
+import construccion_arbol
+
+def test_imputacion_no_modifica_las_filas():
+    filas = [['a', 1, 'si'], [None, 2, 'no'], ['a', None, 'si']]
+    copia = [list(fila) for fila in filas]
+    imputadas = construccion_arbol.imputacionValoresFaltantes(filas)
+    assert filas == copia
+    assert imputadas[2][1] == 1.5
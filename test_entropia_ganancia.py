@@ -0,0 +1,21 @@
+import pytest
+
+from entropia_ganancia import Barrido, Criterio, Gini
+
+def test_criterio_incompleto_no_se_instancia():
+    class SoloImpureza(Criterio):
+        def impureza(self, conteos, total):
+            return 0.0
+
+    with pytest.raises(TypeError):
+        SoloImpureza()
+    with pytest.raises(TypeError):
+        Barrido()
+
+def test_barrido_gini_igual_a_la_ganancia_directa():
+    gini, totales = Gini(), [3, 5, 2]
+    barrido = gini.barrido(totales)
+    barrido.mover(0, 2)
+    barrido.mover(1, 1)
+    directa = gini.ganancia(gini.impureza(totales, 10), [2, 1, 0], 3, [1, 4, 2], 7)
+    assert barrido.ganancia() == pytest.approx(directa)
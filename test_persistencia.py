@@ -0,0 +1,26 @@
+import random
+
+import pytest
+
+import persistencia
+from random_forest import RandomForest
+
+def datos(semilla: int) -> tuple[list[list[any]], list[list[any]]]:
+    rng = random.Random(semilla)
+    def fila():
+        return [rng.randint(0, 9), rng.choice('xyz'), round(rng.random(), 2), rng.choice(['si', 'no', 'tal'])]
+    entrenamiento = [fila() for _ in range(80)]
+    prueba = [f[:-1] for f in (fila() for _ in range(40))]
+    return entrenamiento, prueba
+
+@pytest.mark.parametrize('semilla', range(3))
+def test_guardar_y_cargar_da_las_mismas_predicciones(tmp_path, semilla):
+    entrenamiento, prueba = datos(semilla)
+    bosque = RandomForest(5, semilla=semilla).fit(entrenamiento)
+    ruta = str(tmp_path / 'modelo.bin')
+    persistencia.guardar_modelo(bosque, ruta, {'semilla': semilla})
+    cargado = persistencia.cargar_modelo(ruta)
+    assert cargado.clases == bosque.clases
+    assert cargado.metadatos['semilla'] == semilla
+    assert cargado.predict_batch(prueba) == bosque.predict_batch(prueba)
+    assert [cargado.predict(o) for o in prueba] == [bosque.predict(o) for o in prueba]
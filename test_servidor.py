@@ -0,0 +1,40 @@
+import asyncio
+import random
+
+import pytest
+
+import servidor
+from random_forest import RandomForest
+
+def bosqueEntrenado(semilla: int = 0) -> RandomForest:
+    rng = random.Random(semilla)
+    filas = [[rng.randint(0, 9), rng.choice('xyz'), rng.choice(['si', 'no'])] for _ in range(60)]
+    return RandomForest(3, semilla=semilla).fit(filas)
+
+def test_validar_rechaza_observaciones_malformadas():
+    bosque = bosqueEntrenado().compilado
+    bosque.validar([3, 'x'])
+    with pytest.raises(ValueError):
+        bosque.validar([3])
+    with pytest.raises(TypeError):
+        bosque.validar(['tres', 'x'])
+
+def test_lote_aislado_devuelve_el_error_solo_en_su_fila():
+    bosque = bosqueEntrenado().compilado
+    resultados = servidor.predecirLoteAislado(bosque, [[3, 'x'], [3], [7, 'z']])
+    assert resultados[0] == bosque.predict([3, 'x'])
+    assert isinstance(resultados[1], Exception)
+    assert resultados[2] == bosque.predict([7, 'z'])
+
+def test_pedidos_concurrentes_igual_a_predict():
+    modelo = bosqueEntrenado()
+    observaciones = [[v, c] for v in range(10) for c in 'xyz']
+
+    async def pedir():
+        async with servidor.ServidorPrediccion(modelo, max_lote=8) as servidorPrediccion:
+            cliente = servidor.ClienteLocal(servidorPrediccion)
+            with pytest.raises(ValueError):
+                await cliente.predecir([1])
+            return await cliente.predecirMuchas(observaciones)
+
+    assert asyncio.run(pedir()) == [modelo.predict(o) for o in observaciones]
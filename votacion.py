@@ -0,0 +1,135 @@
+"""
+Este módulo acumula los votos de los árboles de un bosque para muchas observaciones a la vez.
+
+AcumuladorVotos guarda una matriz filas x clases (un arreglo por clase, una entrada por fila) y recibe los árboles
+de a uno: cada árbol suma el voto de la hoja a la que llega cada fila, sin guardar las predicciones de cada árbol.
+Hay tres formas de votar:
+
+- 'conteos': se suman los conteos de clase de la hoja (lo que hacía combinar_predicciones).
+- 'mayoria': cada árbol da un voto a la clase mayoritaria de su hoja.
+- 'suave': cada árbol suma la distribución de probabilidades de su hoja (los conteos normalizados).
+
+Con temprana=True (solo para 'mayoria' y 'suave', donde cada árbol aporta a lo sumo 1 voto) una fila deja de
+recorrerse en cuanto la ventaja de la clase ganadora supera a la cantidad de árboles que faltan, porque ya no
+puede cambiar el resultado.
+
+Este módulo no depende de los demás módulos de la librería.
+"""
+
+from array import array
+from typing import Optional, Sequence
+
+MODOS = ('conteos', 'mayoria', 'suave')
+
+def votoHoja(conteos: Sequence[float], modo: str) -> Sequence[float]:
+    """
+    Convierte los conteos de clase de una hoja en el voto de su árbol según el modo.
+    """
+    if modo == 'conteos':
+        return conteos
+    total = sum(conteos)
+    if not total:
+        return ()
+    if modo == 'suave':
+        return [c / total for c in conteos]
+    ganadora = max(range(len(conteos)), key=conteos.__getitem__)
+    return [1.0 if c == ganadora else 0.0 for c in range(len(conteos))]
+
+class AcumuladorVotos:
+    def __init__(self, n_filas: int, n_clases: int, modo: str = 'conteos', n_arboles: Optional[int] = None, temprana: bool = False):
+        """
+        Clase que acumula los votos de los árboles para n_filas observaciones y n_clases clases.
+        n_arboles (el total de árboles que van a votar) es obligatorio con temprana=True.
+        """
+        if modo not in MODOS:
+            raise ValueError(f"modo de votacion invalido: {modo!r} (se espera uno de {MODOS})")
+        if temprana and (modo == 'conteos' or n_arboles is None):
+            raise ValueError("la detencion temprana requiere modo 'mayoria' o 'suave' y la cantidad de arboles")
+        self.n_filas = n_filas
+        self.n_clases = n_clases
+        self.modo = modo
+        self.n_arboles = n_arboles
+        self.temprana = temprana
+        self.porClase = [array('d', bytes(8 * n_filas)) for _ in range(n_clases)]
+        self.activas: list[int] = list(range(n_filas)) # filas que todavía pueden cambiar de ganadora
+        self.arboles_vistos = 0
+        self.recorridos = 0 # cantidad de pares (fila, árbol) evaluados
+
+    def sumar(self, indices: Sequence[int], conteos: Sequence[float], pesos: Optional[Sequence[float]] = None) -> None:
+        """
+        Suma a las filas indicadas el voto de una hoja con esos conteos de clase, multiplicado por el peso de cada
+        fila si se indican 'pesos' (filas que llegan a la hoja con una fracción por tener faltantes).
+        """
+        for c, valor in enumerate(votoHoja(conteos, self.modo)):
+            if valor:
+                acumulado = self.porClase[c]
+                if pesos is None:
+                    for i in indices:
+                        acumulado[i] += valor
+                else:
+                    for i, peso in zip(indices, pesos):
+                        acumulado[i] += valor * peso
+
+    def agregarArbol(self, arbol, columnas: list[Sequence[float]], faltantes: Optional[set[int]] = None) -> None:
+        """
+        Recorre un árbol compilado (arbol_compilado.ArbolCompilado) con las filas activas, ya codificadas por
+        columnas, y suma sus votos. 'faltantes' son los atributos con algún faltante (NaN), cuyas filas se reparten
+        entre las ramas. Con detención temprana, después descarta las filas ya decididas.
+        """
+        if self.activas:
+            self.recorridos += len(self.activas)
+            if faltantes:
+                for h, indices, pesos in arbol.hojasLotePonderado(columnas, self.activas, faltantes):
+                    self.sumar(indices, arbol.conteosHoja(h), pesos)
+            else:
+                for h, indices in arbol.hojasLote(columnas, self.activas):
+                    self.sumar(indices, arbol.conteosHoja(h))
+        self.arboles_vistos += 1
+        if self.temprana:
+            self._descartarDecididas()
+
+    def _descartarDecididas(self) -> None:
+        restantes = self.n_arboles - self.arboles_vistos
+        if restantes <= 0:
+            self.activas = []
+            return
+        if self.arboles_vistos <= restantes:
+            return # la ventaja de una fila no puede superar a los votos ya emitidos
+        porClase = self.porClase
+        activas = []
+        for i in self.activas:
+            primero = segundo = 0.0
+            for acumulado in porClase:
+                v = acumulado[i]
+                if v > primero:
+                    primero, segundo = v, primero
+                elif v > segundo:
+                    segundo = v
+            if primero - segundo <= restantes:
+                activas.append(i)
+        self.activas = activas
+
+    def votos(self) -> list[array]:
+        """
+        Devuelve, para cada fila, el arreglo de votos acumulados por clase.
+        """
+        if not self.n_clases:
+            return [array('d') for _ in range(self.n_filas)]
+        return [array('d', fila) for fila in zip(*self.porClase)]
+
+    def probabilidades(self) -> list[array]:
+        """
+        Devuelve, para cada fila, los votos normalizados para que sumen 1 (ceros si la fila no recibió votos).
+        """
+        resultado = []
+        for fila in self.votos():
+            total = sum(fila)
+            resultado.append(array('d', (v / total for v in fila)) if total else fila)
+        return resultado
+
+    def ganadoras(self) -> list[int]:
+        """
+        Devuelve, para cada fila, la posición de la clase con más votos (la primera en caso de empate).
+        """
+        clases = range(self.n_clases)
+        return [max(clases, key=fila.__getitem__) for fila in self.votos()]